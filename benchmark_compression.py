@@ -0,0 +1,116 @@
+"""
+  Comparación de la compresión de una carpeta en un tar:
+  - tarfile en modo "w:gz" (un solo núcleo, el método anterior de compress_to_tar_gz) frente a gzip por
+    bloques en paralelo (ParallelGzipWriter) con distintas cantidades de hilos.
+  - Cada codec de compress_pending_folders (gzip, zstd, lz4 y tar sin comprimir) con los niveles indicados,
+    y el codec que elegiría el modo "auto" para la carpeta.
+  Informa tiempo, MB/s (sobre el tamaño del tar sin comprimir) y relación de compresión, y verifica que
+  cada archivo generado se pueda leer completo.
+"""
+import gzip
+import os
+import tarfile
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from compress_pending_folders import ARCHIVE_EXTENSIONS, GZIP_COMPRESS_LEVEL, choose_codec, write_tar_archive
+
+
+def write_tar_gz_single_thread(output_path, path_folder, level=GZIP_COMPRESS_LEVEL):
+    """Método anterior: tarfile con compresión gzip en el hilo principal."""
+    with tarfile.open(output_path, "w:gz", compresslevel=level) as tar:
+        tar.add(path_folder, arcname=os.path.basename(path_folder))
+
+
+def get_uncompressed_tar_size(path_folder):
+    """Tamaño del tar sin comprimir de una carpeta (sin escribirlo a disco)."""
+    class CountingFile:
+        size = 0
+
+        def write(self, data):
+            self.size += len(data)
+            return len(data)
+
+    counter = CountingFile()
+    with tarfile.open(fileobj=counter, mode="w|") as tar:
+        tar.add(path_folder, arcname=os.path.basename(path_folder))
+    return counter.size
+
+
+def open_archive_reader(output_path, codec):
+    """Abre un archivo generado con write_tar_archive para leerlo descomprimido."""
+    if codec == "gzip":
+        return gzip.open(output_path, "rb")
+    if codec == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().stream_reader(open(output_path, "rb"), closefd=True)
+    if codec == "lz4":
+        import lz4.frame
+
+        return lz4.frame.open(output_path, "rb")
+    return open(output_path, "rb")
+
+
+def verify_archive(output_path, codec):
+    """Lee el archivo completo (el codec verifica su checksum) y devuelve la cantidad de miembros del tar."""
+    with open_archive_reader(output_path, codec) as reader:
+        with tarfile.open(fileobj=reader, mode="r|") as tar:
+            return sum(1 for _ in tar)
+
+
+def benchmark(name, compress_function, output_path, tar_size, codec="gzip"):
+    """Ejecuta una compresión y muestra tiempo, MB/s, relación de compresión y cantidad de miembros."""
+    start = time.perf_counter()
+    compress_function(output_path)
+    seconds = time.perf_counter() - start
+
+    compressed_size = os.path.getsize(output_path)
+    members = verify_archive(output_path, codec)
+    print(f"{name}: {seconds:.2f} s | {tar_size / seconds / 2**20:.1f} MB/s | "
+          f"relación {tar_size / compressed_size:.3f} ({compressed_size / 2**20:.1f} MB) | miembros {members}")
+    os.remove(output_path)
+    return seconds
+
+
+def parse_codec(codec_spec):
+    """Convierte 'codec' o 'codec:nivel' (p. ej. 'zstd:9') en (codec, nivel)."""
+    codec, _, level = codec_spec.partition(":")
+    if codec not in ARCHIVE_EXTENSIONS:
+        raise ValueError(f"Unknown codec: {codec}")
+    return codec, int(level) if level else None
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 benchmark_compression.py --folder /ruta/a/carpeta/1_real --threads 1 2 4 8
+    # python3 benchmark_compression.py --folder /ruta/a/carpeta/1_real --threads --codecs gzip:6 zstd:1 zstd:3 zstd:9 zstd:19 lz4 none
+    parser = ArgumentParser(description="Compara la compresión tar.gz en un hilo con la compresión en paralelo y con otros codecs.")
+    parser.add_argument("--folder", type=str, required=True, help="Carpeta a comprimir (p. ej. una carpeta 1_real)")
+    parser.add_argument("--threads", type=int, nargs="*", default=[1, 2, 4, os.cpu_count() or 1], help="Cantidades de hilos a medir con gzip (vacío para omitir)")
+    parser.add_argument("--level", type=int, default=GZIP_COMPRESS_LEVEL, help="Nivel de compresión gzip")
+    parser.add_argument("--codecs", nargs="*", default=[], help="Codecs a medir, como codec o codec:nivel (gzip, zstd, lz4, none)")
+    parser.add_argument("--codec-threads", type=int, default=None, help="Hilos para gzip y zstd en la comparación de codecs (por defecto, uno por CPU)")
+    parser.add_argument("--output-dir", type=str, default=None, help="Carpeta para los archivos temporales (por defecto, la del sistema)")
+    args = parser.parse_args()
+    codecs = [parse_codec(codec_spec) for codec_spec in args.codecs]
+
+    tar_size = get_uncompressed_tar_size(args.folder)
+    print(f"Tar sin comprimir: {tar_size / 2**20:.1f} MB")
+
+    with tempfile.TemporaryDirectory(dir=args.output_dir) as temporary_dir:
+        output = os.path.join(temporary_dir, "benchmark.tar.gz")
+        if args.threads:
+            baseline = benchmark("tarfile w:gz", lambda path: write_tar_gz_single_thread(path, args.folder, args.level), output, tar_size)
+            for threads in sorted(set(args.threads)):
+                seconds = benchmark(f"paralelo ({threads} hilos)", lambda path: write_tar_archive(path, args.folder, threads, args.level), output, tar_size)
+                print(f"  aceleración: {baseline / seconds:.2f}x")
+
+        for codec, level in codecs:
+            output = os.path.join(temporary_dir, f"benchmark{ARCHIVE_EXTENSIONS[codec]}")
+            benchmark(f"{codec} (nivel {level if level is not None else 'por defecto'})",
+                      lambda path: write_tar_archive(path, args.folder, args.codec_threads, level, codec=codec), output, tar_size, codec)
+
+    codec, level, ratio = choose_codec(args.folder)
+    print(f"auto: {codec} (nivel {level if level is not None else 'por defecto'}), relación de la muestra {ratio:.3f}")
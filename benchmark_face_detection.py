@@ -0,0 +1,512 @@
+"""
+  Benchmarks de face_detection_v1 (sólo CPU, sin conexión):
+  - pipeline: por método (dlib y mediapipe), imágenes/segundo, latencias p50/p95/p99, tiempo de carga del modelo,
+    pico de memoria y tiempo por etapa (decode, detect, landmarks, pose, move/write). Resultados en JSON.
+  - model-cache: velocidad (imágenes/segundo) con dlib cargando el modelo en cada imagen contra el modelo cacheado.
+  - pyramid: precisión y velocidad de la detección sobre imágenes reducidas en una carpeta etiquetada (True/ y False/).
+  - pose: concordancia y velocidad de get_face_angles_batch frente a get_face_angles sobre rostros sintéticos.
+"""
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import tempfile
+import time
+from argparse import ArgumentParser
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+import face_detection_v1
+from face_detection_v1 import (
+    FACE_MODEL_LANDMARK_ORDER, FACE_MODEL_POINTS, IMAGE_EXTENSIONS, analyze_mediapipe_result,
+    detect_frontal_face_dlib, detect_frontal_face_mediapipe, get_camera_intrinsics, get_face_angles,
+    get_face_angles_batch, get_mediapipe_landmarker, is_frontal_batch, limit_process_threads,
+    load_dlib_models, process_image
+)
+from utils import download_json
+
+# Índices de los landmarks de dlib usados en la estimación de pose (mismo orden que get_face_angles)
+DLIB_POSE_LANDMARKS = (36, 45, 30, 48, 54, 8)
+
+
+def list_images(folder_path, limit=None):
+    """
+    Lista las imágenes de una carpeta y sus subcarpetas, en orden.
+
+    Args:
+        folder_path (str): Ruta de la carpeta con imágenes.
+        limit (int, optional): Cantidad máxima de imágenes a devolver.
+
+    Returns:
+        list of str: Rutas de las imágenes encontradas.
+    """
+    image_paths = []
+    for root_dir, _, file_names in os.walk(folder_path):
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                image_paths.append(os.path.join(root_dir, file_name))
+    image_paths.sort()
+    return image_paths[:limit] if limit else image_paths
+
+
+def generate_synthetic_images(folder_path, count, width=1920, height=1080, seed=0):
+    """
+    Genera un conjunto fijo y reproducible de imágenes JPEG (ruido suavizado) para medir decodificación
+    y detección sin depender de datos externos.
+
+    Args:
+        folder_path (str): Carpeta donde se guardan las imágenes.
+        count (int): Cantidad de imágenes.
+        width (int): Ancho de las imágenes.
+        height (int): Alto de las imágenes.
+        seed (int): Semilla del generador aleatorio.
+
+    Returns:
+        list of str: Rutas de las imágenes generadas.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    image_paths = []
+    for index in range(count):
+        noise = rng.integers(0, 256, size=(height // 8, width // 8, 3), dtype=np.uint8)
+        image = cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+        image_path = os.path.join(folder_path, f"synthetic_{index:05d}.jpg")
+        cv2.imwrite(image_path, image)
+        image_paths.append(image_path)
+
+    return image_paths
+
+
+@contextmanager
+def timed_stage(stage_times, stage):
+    """Acumula en stage_times[stage] el tiempo, en segundos, del bloque."""
+    start = time.perf_counter()
+    yield
+    stage_times[stage].append(time.perf_counter() - start)
+
+
+def summarize_times(times):
+    """Devuelve total, media y percentiles p50/p95/p99 (en ms) de una lista de tiempos en segundos."""
+    times_ms = np.array(times) * 1000 if times else np.zeros(1)
+    return {
+        "count": len(times),
+        "total_ms": float(times_ms.sum()),
+        "mean_ms": float(times_ms.mean()),
+        "p50_ms": float(np.percentile(times_ms, 50)),
+        "p95_ms": float(np.percentile(times_ms, 95)),
+        "p99_ms": float(np.percentile(times_ms, 99)),
+    }
+
+
+def run_staged_image(image_path, detection_method, model_path, stage_times):
+    """
+    Procesa una imagen reproduciendo las etapas de detect_frontal_face_dlib / detect_frontal_face_mediapipe
+    por separado, para medir cada una. En MediaPipe la detección y los landmarks son un único grafo y se
+    miden juntos como 'detect'.
+
+    Returns:
+        tuple: Indicador de rostro frontal y ángulos detectados.
+    """
+    if detection_method == "dlib":
+        face_detector, landmark_predictor = load_dlib_models(model_path)
+
+        with timed_stage(stage_times, "decode"):
+            image = cv2.imread(image_path)
+            grayscale_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+        with timed_stage(stage_times, "detect"):
+            detected_faces = face_detector(grayscale_image, 1)
+
+        with timed_stage(stage_times, "landmarks"):
+            faces_landmarks = []
+            for face in detected_faces:
+                facial_landmarks = landmark_predictor(grayscale_image, face)
+                faces_landmarks.append([(facial_landmarks.part(index).x - face.left(), facial_landmarks.part(index).y - face.top()) for index in DLIB_POSE_LANDMARKS])
+
+        with timed_stage(stage_times, "pose"):
+            is_frontal, angle_data = False, {}
+            if faces_landmarks:
+                face_sizes = [face_detection_v1.crop_face(image, face).shape[:2] for face in detected_faces]
+                roll_angles, pitch_angles, yaw_angles = get_face_angles_batch(faces_landmarks, face_sizes)
+                frontal_faces = is_frontal_batch(roll_angles, pitch_angles, yaw_angles)
+                index = int(np.argmax(frontal_faces)) if frontal_faces.any() else len(faces_landmarks) - 1
+                is_frontal = bool(frontal_faces[index])
+                angle_data = {"roll": float(roll_angles[index]), "pitch": float(pitch_angles[index]), "yaw": float(yaw_angles[index])}
+
+    else:
+        face_landmarker = get_mediapipe_landmarker(model_path)
+
+        with timed_stage(stage_times, "decode"):
+            image = cv2.imread(image_path)
+            cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+
+        with timed_stage(stage_times, "detect"):
+            face_landmarker_result = face_landmarker.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=image))
+
+        with timed_stage(stage_times, "pose"):
+            is_frontal, angle_data = analyze_mediapipe_result(face_landmarker_result, image.shape[:2])
+
+    return is_frontal, angle_data
+
+
+def benchmark_pipeline(detection_method, model_path, image_paths, threads=None):
+    """
+    Mide el pipeline completo de un método. Se ejecuta en un proceso propio para que el tiempo de carga
+    del modelo y el pico de memoria no se mezclen con los del otro método.
+
+    Args:
+        detection_method (str): Método de detección ('dlib' o 'mediapipe').
+        model_path (str): Ruta al modelo.
+        image_paths (list of str): Rutas de las imágenes.
+        threads (int, optional): Hilos a utilizar (ver face_detection_v1.limit_process_threads).
+
+    Returns:
+        dict: Métricas del método.
+    """
+    if threads:
+        limit_process_threads(threads)
+
+    start = time.perf_counter()
+    if detection_method == "dlib":
+        load_dlib_models(model_path)
+    else:
+        get_mediapipe_landmarker(model_path)
+    model_load_seconds = time.perf_counter() - start
+
+    detect_frontal_face = detect_frontal_face_dlib if detection_method == "dlib" else detect_frontal_face_mediapipe
+
+    latencies = []
+    frontal_count = 0
+    start = time.perf_counter()
+    for image_path in image_paths:
+        image_start = time.perf_counter()
+        is_frontal, _ = detect_frontal_face(image_path, model_path)
+        latencies.append(time.perf_counter() - image_start)
+        frontal_count += bool(is_frontal)
+    elapsed = time.perf_counter() - start
+
+    stage_times = defaultdict(list)
+    work_folder = tempfile.mkdtemp(prefix="face_detection_benchmark_")
+    try:
+        destination_folder = os.path.join(work_folder, "True")
+        os.makedirs(destination_folder)
+
+        for image_path in image_paths:
+            is_frontal, angle_data = run_staged_image(image_path, detection_method, model_path, stage_times)
+
+            staged_image_path = os.path.join(work_folder, os.path.basename(image_path))
+            shutil.copyfile(image_path, staged_image_path)
+            with timed_stage(stage_times, "move_write"):
+                shutil.move(staged_image_path, os.path.join(destination_folder, os.path.basename(image_path)))
+                download_json(angle_data, destination_folder, os.path.splitext(os.path.basename(image_path))[0] + ".json")
+    finally:
+        shutil.rmtree(work_folder, ignore_errors=True)
+
+    return {
+        "method": detection_method,
+        "images": len(image_paths),
+        "frontal_images": frontal_count,
+        "images_per_second": len(image_paths) / elapsed if elapsed else 0.0,
+        "latency": summarize_times(latencies),
+        "model_load_ms": model_load_seconds * 1000,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": {stage: summarize_times(times) for stage, times in stage_times.items()},
+    }
+
+
+def run_pipeline_benchmarks(methods, image_paths, threads=None):
+    """
+    Ejecuta benchmark_pipeline para cada método en un proceso nuevo ('spawn').
+
+    Args:
+        methods (dict): Método de detección -> ruta al modelo.
+        image_paths (list of str): Rutas de las imágenes.
+        threads (int, optional): Hilos a utilizar en cada proceso.
+
+    Returns:
+        dict: Metadatos de la ejecución y métricas por método.
+    """
+    context = multiprocessing.get_context("spawn")
+    results = []
+    for detection_method, model_path in methods.items():
+        with context.Pool(1) as pool:
+            results.append(pool.apply(benchmark_pipeline, (detection_method, model_path, image_paths, threads)))
+
+    return {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "machine": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+        },
+        "parameters": {
+            "threads": threads,
+            "thresholds": {
+                "high": {"roll": face_detection_v1.HIGH_ROLL_THRESHOLD, "pitch": face_detection_v1.HIGH_PITCH_THRESHOLD, "yaw": face_detection_v1.HIGH_YAW_THRESHOLD},
+                "medium": {"roll": face_detection_v1.MEDIUM_ROLL_THRESHOLD, "pitch": face_detection_v1.MEDIUM_PITCH_THRESHOLD, "yaw": face_detection_v1.MEDIUM_YAW_THRESHOLD},
+                "low": {"roll": face_detection_v1.LOW_ROLL_THRESHOLD, "pitch": face_detection_v1.LOW_PITCH_THRESHOLD, "yaw": face_detection_v1.LOW_YAW_THRESHOLD},
+            },
+            "models": methods,
+        },
+        "results": results,
+    }
+
+
+def benchmark_dlib(image_paths, model_path, reload_models):
+    """
+    Ejecuta detect_frontal_face_dlib sobre las imágenes y devuelve las imágenes procesadas por segundo.
+
+    Args:
+        image_paths (list of str): Rutas de las imágenes.
+        model_path (str): Ruta al modelo de dlib.
+        reload_models (bool): Si True, descarta el modelo cacheado antes de cada imagen.
+
+    Returns:
+        float: Imágenes procesadas por segundo.
+    """
+    face_detection_v1._dlib_models_cache.clear()
+
+    start = time.perf_counter()
+    for image_path in image_paths:
+        if reload_models:
+            face_detection_v1._dlib_models_cache.clear()
+        detect_frontal_face_dlib(image_path, model_path)
+    elapsed = time.perf_counter() - start
+
+    return len(image_paths) / elapsed if elapsed else 0.0
+
+
+def list_labelled_images(folder_path, limit=None):
+    """
+    Lista las imágenes de una carpeta etiquetada con subcarpetas True/ y False/, como las que genera
+    face_detection_v1.process_folder.
+
+    Args:
+        folder_path (str): Ruta de la carpeta etiquetada.
+        limit (int, optional): Cantidad máxima de imágenes por etiqueta.
+
+    Returns:
+        list of tuple: Pares (ruta de la imagen, etiqueta).
+    """
+    labelled_images = []
+    for label in (True, False):
+        label_folder = os.path.join(folder_path, str(label))
+        labelled_images.extend((image_path, label) for image_path in list_images(label_folder, limit))
+    return labelled_images
+
+
+def benchmark_pyramid(labelled_images, model_path, detection_sizes):
+    """
+    Evalúa detect_frontal_face_dlib con distintos tamaños máximos de detección sobre imágenes etiquetadas
+    e imprime, para cada tamaño, la velocidad, la exactitud respecto de las etiquetas y la concordancia
+    con la detección en resolución original.
+
+    Args:
+        labelled_images (list of tuple): Pares (ruta de la imagen, etiqueta).
+        model_path (str): Ruta al modelo de dlib.
+        detection_sizes (list of int): Tamaños máximos del lado mayor a evaluar. 0 es resolución original.
+
+    Returns:
+        list of dict: Resultados por tamaño.
+    """
+    load_dlib_models(model_path)
+    labels = np.array([label for _, label in labelled_images])
+    reference = None
+    report = []
+
+    for detection_size in [0] + [size for size in detection_sizes if size]:
+        predictions = []
+        start = time.perf_counter()
+        for image_path, _ in labelled_images:
+            is_frontal, _ = process_image(image_path, "dlib", model_path, detection_size or None)
+            predictions.append(bool(is_frontal))
+        elapsed = time.perf_counter() - start
+
+        predictions = np.array(predictions)
+        if reference is None:
+            reference = predictions
+
+        true_positives = int((predictions & labels).sum())
+        result = {
+            "max_detection_size": detection_size or "original",
+            "images_per_second": len(labelled_images) / elapsed if elapsed else 0.0,
+            "accuracy": float((predictions == labels).mean()),
+            "precision": true_positives / predictions.sum() if predictions.sum() else 0.0,
+            "recall": true_positives / labels.sum() if labels.sum() else 0.0,
+            "agreement_with_original": float((predictions == reference).mean()),
+        }
+        report.append(result)
+
+        print(f"{str(result['max_detection_size']):>10} | {result['images_per_second']:8.2f} img/s | "
+              f"exactitud {result['accuracy']:.3f} | precisión {result['precision']:.3f} | "
+              f"recall {result['recall']:.3f} | concordancia {result['agreement_with_original']:.3f}")
+
+    return report
+
+
+def generate_synthetic_faces(count, seed=0, noise=1.5):
+    """
+    Genera landmarks de rostros sintéticos proyectando FACE_MODEL_POINTS con poses aleatorias
+    cercanas a la frontal, redondeados a píxeles enteros como los que devuelve dlib.
+
+    Args:
+        count (int): Cantidad de rostros.
+        seed (int): Semilla del generador aleatorio.
+        noise (float): Desvío estándar, en píxeles, del ruido agregado a los landmarks.
+
+    Returns:
+        landmarks (numpy.ndarray): Array (count, 6, 2) en el orden de get_face_angles.
+        image_sizes (numpy.ndarray): Array (count, 2) con el alto y ancho de cada recorte.
+    """
+    rng = np.random.default_rng(seed)
+    frontal_rotation = np.array([np.pi, 0.0, 0.0])
+
+    landmarks = np.empty((count, 6, 2))
+    image_sizes = rng.integers(80, 400, size=(count, 2))
+
+    for index, (height, width) in enumerate(image_sizes):
+        focal_length, center_x, center_y = get_camera_intrinsics(int(height), int(width))
+        camera_matrix = np.array([[focal_length, 0, center_x], [0, focal_length, center_y], [0, 0, 1]])
+
+        rotation = cv2.Rodrigues(rng.uniform(-0.6, 0.6, 3))[0] @ cv2.Rodrigues(frontal_rotation)[0]
+        translation = np.array([rng.uniform(-30, 30), rng.uniform(-30, 30), rng.uniform(1.5, 3) * focal_length * 500 / width])
+
+        projected = cv2.projectPoints(FACE_MODEL_POINTS, cv2.Rodrigues(rotation)[0], translation, camera_matrix, None)[0][:, 0]
+        landmarks[index, FACE_MODEL_LANDMARK_ORDER] = np.round(projected + rng.normal(0, noise, projected.shape))
+
+    return landmarks, image_sizes
+
+
+def benchmark_pose(count, seed=0):
+    """
+    Compara get_face_angles_batch con get_face_angles en rostros sintéticos e imprime
+    la diferencia máxima de ángulos y la velocidad de ambos.
+
+    Args:
+        count (int): Cantidad de rostros.
+        seed (int): Semilla del generador aleatorio.
+
+    Returns:
+        float: Diferencia máxima, en grados, entre ambos métodos.
+    """
+    landmarks, image_sizes = generate_synthetic_faces(count, seed)
+
+    start = time.perf_counter()
+    reference = np.array([get_face_angles(None, face.ravel(), tuple(size)) for face, size in zip(landmarks, image_sizes)])
+    scalar_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = np.stack(get_face_angles_batch(landmarks, image_sizes), axis=1)
+    batch_elapsed = time.perf_counter() - start
+
+    differences = np.abs(reference - batch).max(axis=1)
+    p50, p99, p100 = np.percentile(differences, [50, 99, 100])
+
+    print(f"Rostros: {count}")
+    print(f"get_face_angles: {count / scalar_elapsed:.0f} rostros/s")
+    print(f"get_face_angles_batch: {count / batch_elapsed:.0f} rostros/s")
+    print(f"Diferencia máxima por rostro (grados): p50={p50:.2e} p99={p99:.2e} max={p100:.2e}")
+    print(f"Rostros con diferencia > 0.1 grados: {int((differences > 0.1).sum())}")
+    return float(p100)
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 benchmark_face_detection.py pipeline --dlib-model shape_predictor_68_face_landmarks_dlib.dat --mediapipe-model face_landmarker_mediapipe.task --synthetic 200 --output benchmark.json
+    # python3 benchmark_face_detection.py pipeline --dlib-model shape_predictor_68_face_landmarks_dlib.dat --folder /ruta/a/imagenes --limit 500 --output benchmark.json
+    # python3 benchmark_face_detection.py model-cache --model shape_predictor_68_face_landmarks_dlib.dat --folder /ruta/a/imagenes --limit 200
+    # python3 benchmark_face_detection.py pyramid --model shape_predictor_68_face_landmarks_dlib.dat --folder /ruta/etiquetada --sizes 640 1024 1600
+    # python3 benchmark_face_detection.py pose --faces 5000
+
+    parser = ArgumentParser(description="Benchmarks de la detección de rostros frontales.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    pipeline_parser = subparsers.add_parser("pipeline", help="Métricas del pipeline completo por método y por etapa")
+    pipeline_parser.add_argument("--dlib-model", type=str, default=None, help="Ruta al modelo de dlib")
+    pipeline_parser.add_argument("--mediapipe-model", type=str, default=None, help="Ruta al modelo de MediaPipe")
+    pipeline_parser.add_argument("--folder", type=str, default=None, help="Carpeta con las imágenes a medir")
+    pipeline_parser.add_argument("--limit", type=int, default=None, help="Cantidad máxima de imágenes de la carpeta")
+    pipeline_parser.add_argument("--synthetic", type=int, default=100, help="Cantidad de imágenes sintéticas si no se indica --folder")
+    pipeline_parser.add_argument("--threads", type=int, default=None, help="Hilos a utilizar")
+    pipeline_parser.add_argument("--output", type=str, default="face_detection_benchmark.json", help="Archivo JSON de resultados")
+
+    model_cache_parser = subparsers.add_parser("model-cache", help="Carga del modelo de dlib por imagen contra modelo cacheado")
+    model_cache_parser.add_argument("--folder", type=str, required=True, help="Ruta a la carpeta que contiene las imágenes")
+    model_cache_parser.add_argument("--model", type=str, required=True, help="Ruta al modelo de dlib")
+    model_cache_parser.add_argument("--limit", type=int, default=100, help="Cantidad máxima de imágenes a medir")
+
+    pyramid_parser = subparsers.add_parser("pyramid", help="Precisión y velocidad según el tamaño máximo de detección")
+    pyramid_parser.add_argument("--folder", type=str, required=True, help="Carpeta etiquetada con subcarpetas True/ y False/")
+    pyramid_parser.add_argument("--model", type=str, required=True, help="Ruta al modelo de dlib")
+    pyramid_parser.add_argument("--sizes", type=int, nargs="+", default=[640, 1024, 1600], help="Tamaños máximos del lado mayor a evaluar")
+    pyramid_parser.add_argument("--limit", type=int, default=None, help="Cantidad máxima de imágenes por etiqueta")
+
+    pose_parser = subparsers.add_parser("pose", help="get_face_angles_batch contra get_face_angles")
+    pose_parser.add_argument("--faces", type=int, default=2000, help="Cantidad de rostros sintéticos")
+    pose_parser.add_argument("--seed", type=int, default=0, help="Semilla del generador aleatorio")
+    pose_parser.add_argument("--max-difference", type=float, default=0.1, help="Diferencia máxima admitida, en grados (si se supera, termina con código 1)")
+
+    args = parser.parse_args()
+
+    if args.benchmark == "pipeline":
+        methods = {method: model for method, model in (("dlib", args.dlib_model), ("mediapipe", args.mediapipe_model)) if model}
+        if not methods:
+            parser.error("Indique --dlib-model y/o --mediapipe-model")
+
+        synthetic_folder = None
+        if args.folder:
+            images = list_images(args.folder, args.limit)
+        else:
+            synthetic_folder = tempfile.mkdtemp(prefix="face_detection_synthetic_")
+            images = generate_synthetic_images(synthetic_folder, args.synthetic)
+
+        try:
+            report = run_pipeline_benchmarks(methods, images, args.threads)
+        finally:
+            if synthetic_folder:
+                shutil.rmtree(synthetic_folder, ignore_errors=True)
+
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+
+        for result in report["results"]:
+            print(f"{result['method']}: {result['images_per_second']:.2f} img/s | p50 {result['latency']['p50_ms']:.1f} ms | "
+                  f"p95 {result['latency']['p95_ms']:.1f} ms | p99 {result['latency']['p99_ms']:.1f} ms | "
+                  f"carga modelo {result['model_load_ms']:.0f} ms | RSS pico {result['peak_rss_mb']:.0f} MB")
+            for stage, stage_summary in result["stages"].items():
+                print(f"    {stage}: media {stage_summary['mean_ms']:.2f} ms | p95 {stage_summary['p95_ms']:.2f} ms")
+        print(f"Resultados guardados en {args.output}")
+
+    elif args.benchmark == "model-cache":
+        images = list_images(args.folder, args.limit)
+        if not images:
+            raise SystemExit(f"No se encontraron imágenes en {args.folder}")
+
+        before = benchmark_dlib(images, args.model, reload_models=True)
+        after = benchmark_dlib(images, args.model, reload_models=False)
+
+        print(f"Imágenes medidas: {len(images)}")
+        print(f"Antes (modelo cargado por imagen): {before:.2f} img/s")
+        print(f"Después (modelo cacheado): {after:.2f} img/s")
+        print(f"Mejora: x{after / before:.2f}" if before else "Mejora: n/a")
+
+    elif args.benchmark == "pyramid":
+        images = list_labelled_images(args.folder, args.limit)
+        if not images:
+            raise SystemExit(f"No se encontraron imágenes en {args.folder}/True ni {args.folder}/False")
+
+        benchmark_pyramid(images, args.model, args.sizes)
+
+    elif args.benchmark == "pose":
+        max_difference = benchmark_pose(args.faces, args.seed)
+        if max_difference > args.max_difference:
+            raise SystemExit(f"get_face_angles_batch no coincide con get_face_angles: {max_difference:.2f} > {args.max_difference} grados")
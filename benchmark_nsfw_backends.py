@@ -0,0 +1,222 @@
+"""
+  Comparación de los backends de is_nsfw_image (sólo CPU):
+  - parity: diferencia de probabilidades y de veredictos de ONNX (fp32 e int8) frente a transformers.
+    Termina con código 1 si alguna diferencia supera la tolerancia. Además informa, como referencia, la
+    diferencia de cada backend frente a transformers.pipeline sobre la imagen completa (el comportamiento
+    original del módulo), que mide el efecto del preprocesamiento con Image.draft.
+  - latency: tiempo de importación y carga, latencia por lote (p50/p95) e imágenes/segundo de cada backend.
+"""
+import multiprocessing
+import os
+import sys
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from PIL import Image
+
+from is_nsfw_image import IMAGE_EXTENSIONS, NSFW_MODEL_NAME, NSFW_THRESHOLD, ONNX_QUANTIZED_MODEL_FILENAME, NsfwClassifier
+
+# Diferencia máxima de probabilidad NSFW aceptada frente a transformers
+PARITY_TOLERANCES = {"onnx": 1e-3, "onnx-int8": 5e-2}
+
+
+def list_images(folder_path, limit=None):
+    """
+    Lista las imágenes de una carpeta y sus subcarpetas, en orden.
+
+    Args:
+        folder_path (str): Ruta de la carpeta con imágenes.
+        limit (int, optional): Cantidad máxima de imágenes a devolver.
+
+    Returns:
+        list of str: Rutas de las imágenes encontradas.
+    """
+    image_paths = []
+    for root_dir, _, file_names in os.walk(folder_path):
+        for file_name in sorted(file_names):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                image_paths.append(os.path.join(root_dir, file_name))
+    image_paths.sort()
+    return image_paths[:limit] if limit else image_paths
+
+
+def get_backend_configurations(model_name, onnx_dir):
+    """
+    Devuelve los backends a comparar: transformers y, si se indica onnx_dir, ONNX fp32 y (si existe) int8.
+
+    Returns:
+        dict: Nombre del backend -> argumentos de NsfwClassifier.
+    """
+    configurations = {"transformers": {"model_name": model_name, "backend": "transformers"}}
+    if onnx_dir:
+        configurations["onnx"] = {"model_name": onnx_dir, "backend": "onnx"}
+        if os.path.exists(os.path.join(onnx_dir, ONNX_QUANTIZED_MODEL_FILENAME)):
+            configurations["onnx-int8"] = {"model_name": onnx_dir, "backend": "onnx", "quantized": True}
+    return configurations
+
+
+def classify_with_pipeline(image_paths, model_name):
+    """
+    Clasifica las imágenes como lo hacía originalmente is_nsfw_image: transformers.pipeline sobre la
+    imagen abierta con PIL, sin decodificación reducida.
+
+    Returns:
+        dict: Ruta -> (probabilidad NSFW, es NSFW) de las imágenes que se pudieron clasificar.
+    """
+    from transformers import pipeline
+
+    classifier = pipeline("image-classification", model=model_name)
+    scores = {}
+    for image_path in image_paths:
+        try:
+            with Image.open(image_path) as img:
+                results = classifier(img)
+        except Exception as e:
+            print(f"pipeline: no se pudo clasificar {image_path}: {e}")
+            continue
+        nsfw_score = next((result["score"] for result in results if result["label"].lower() == "nsfw"), 0.0)
+        scores[image_path] = (nsfw_score, nsfw_score > NSFW_THRESHOLD)
+    return scores
+
+
+def compare_scores(scores, reference):
+    """
+    Compara las probabilidades de un backend con las de una referencia, sobre las imágenes que ambos clasificaron.
+
+    Returns:
+        tuple: Cantidad de imágenes, diferencia máxima, diferencia media y cantidad de veredictos distintos.
+    """
+    paths = [path for path in reference if path in scores]
+    differences = np.abs(np.array([scores[path][0] - reference[path][0] for path in paths]))
+    disagreements = sum(scores[path][1] != reference[path][1] for path in paths)
+    if not len(differences):
+        return len(paths), 0.0, 0.0, disagreements
+    return len(paths), float(differences.max()), float(differences.mean()), disagreements
+
+
+def check_parity(image_paths, model_name, onnx_dir, batch_size=16):
+    """
+    Clasifica las imágenes con cada backend y compara las probabilidades con las de transformers.
+    También informa la diferencia de cada backend con transformers.pipeline (sin tolerancia: la
+    decodificación reducida de NsfwClassifier cambia levemente las probabilidades).
+
+    Args:
+        image_paths (list of str): Rutas de las imágenes.
+        model_name (str): Nombre o ruta del modelo de transformers.
+        onnx_dir (str): Carpeta generada por export_onnx_model.
+        batch_size (int): Cantidad de imágenes por inferencia.
+
+    Returns:
+        bool: True si todos los backends están dentro de su tolerancia.
+    """
+    scores = {}
+    for name, configuration in get_backend_configurations(model_name, onnx_dir).items():
+        classifier = NsfwClassifier(batch_size=batch_size, **configuration)
+        results = [result for result in classifier.classify_images(image_paths) if result["error"] is None]
+        scores[name] = {result["path"]: (result["nsfw_score"], result["is_nsfw"]) for result in results}
+
+    pipeline_scores = classify_with_pipeline(image_paths, model_name)
+    reference = scores["transformers"]
+    passed = True
+    for name, backend_scores in scores.items():
+        count, max_difference, mean_difference, disagreements = compare_scores(backend_scores, pipeline_scores)
+        line = (f"{name}: {count} imágenes | vs pipeline: diferencia máx {max_difference:.2e} | media {mean_difference:.2e} | "
+                f"veredictos distintos {disagreements}")
+
+        if name != "transformers":
+            count, max_difference, mean_difference, disagreements = compare_scores(backend_scores, reference)
+            backend_passed = max_difference <= PARITY_TOLERANCES[name]
+            passed &= backend_passed
+            line += (f" | vs transformers: diferencia máx {max_difference:.2e} | media {mean_difference:.2e} | "
+                     f"veredictos distintos {disagreements} | {'OK' if backend_passed else 'FALLA'} (tolerancia {PARITY_TOLERANCES[name]:.0e})")
+        print(line)
+
+    return passed
+
+
+def benchmark_backend(configuration, image_paths, batch_size, threads, inter_op_threads, batches):
+    """
+    Mide un backend. Se ejecuta en un proceso propio para incluir el tiempo de importación de sus dependencias.
+
+    Args:
+        configuration (dict): Argumentos de NsfwClassifier (ver get_backend_configurations).
+        image_paths (list of str): Rutas de las imágenes. Si está vacía, sólo se mide la inferencia sobre datos aleatorios.
+        batch_size (int): Cantidad de imágenes por inferencia.
+        threads (int): Hilos intra-op.
+        inter_op_threads (int): Hilos inter-op.
+        batches (int): Lotes a medir en la prueba de latencia.
+
+    Returns:
+        dict: Tiempo de carga, latencias por lote e imágenes/segundo.
+    """
+    start = time.perf_counter()
+    classifier = NsfwClassifier(batch_size=batch_size, threads=threads, inter_op_threads=inter_op_threads, **configuration)
+    load_seconds = time.perf_counter() - start
+
+    width, height = classifier.image_size
+    pixel_values = list(np.random.default_rng(0).standard_normal((batch_size, 3, height, width)).astype(np.float32))
+    classifier.classify_batch(pixel_values)
+
+    latencies = []
+    for _ in range(batches):
+        batch_start = time.perf_counter()
+        classifier.classify_batch(pixel_values)
+        latencies.append(time.perf_counter() - batch_start)
+
+    end_to_end = None
+    if image_paths:
+        start = time.perf_counter()
+        for _ in classifier.classify_images(image_paths):
+            pass
+        end_to_end = len(image_paths) / (time.perf_counter() - start)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "load_seconds": load_seconds,
+        "batch_p50_ms": float(np.percentile(latencies_ms, 50)),
+        "batch_p95_ms": float(np.percentile(latencies_ms, 95)),
+        "inference_images_per_second": float(batch_size * len(latencies) / (latencies_ms.sum() / 1000)),
+        "end_to_end_images_per_second": end_to_end,
+    }
+
+
+if __name__ == "__main__":
+    # Ejecución (después de: python3 is_nsfw_image.py --export-onnx nsfw_onnx):
+    # python3 benchmark_nsfw_backends.py parity --onnx-dir nsfw_onnx --folder /ruta/a/imagenes --limit 500
+    # python3 benchmark_nsfw_backends.py latency --onnx-dir nsfw_onnx --folder /ruta/a/imagenes --limit 500 --batch-size 16 --threads 4
+    parser = ArgumentParser(description="Compara los backends transformers y ONNX del clasificador NSFW.")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    parity_parser = subparsers.add_parser("parity", help="Concordancia de ONNX (fp32 e int8) con transformers y de todos con transformers.pipeline")
+    parity_parser.add_argument("--folder", type=str, required=True, help="Carpeta con imágenes")
+    parity_parser.add_argument("--limit", type=int, default=None, help="Cantidad máxima de imágenes")
+
+    latency_parser = subparsers.add_parser("latency", help="Carga, latencia y velocidad de cada backend")
+    latency_parser.add_argument("--folder", type=str, default=None, help="Carpeta con imágenes para medir el proceso completo")
+    latency_parser.add_argument("--limit", type=int, default=None, help="Cantidad máxima de imágenes")
+    latency_parser.add_argument("--threads", type=int, default=None, help="Hilos intra-op")
+    latency_parser.add_argument("--inter-op-threads", type=int, default=None, help="Hilos inter-op")
+    latency_parser.add_argument("--batches", type=int, default=20, help="Lotes a medir en la prueba de latencia")
+
+    for subparser in (parity_parser, latency_parser):
+        subparser.add_argument("--model", type=str, default=NSFW_MODEL_NAME, help="Nombre o ruta del modelo de transformers")
+        subparser.add_argument("--onnx-dir", type=str, required=True, help="Carpeta generada por is_nsfw_image.py --export-onnx")
+        subparser.add_argument("--batch-size", type=int, default=16, help="Cantidad de imágenes por inferencia")
+
+    args = parser.parse_args()
+    images = list_images(args.folder, args.limit) if args.folder else []
+
+    if args.benchmark == "parity":
+        sys.exit(0 if check_parity(images, args.model, args.onnx_dir, args.batch_size) else 1)
+
+    elif args.benchmark == "latency":
+        context = multiprocessing.get_context("spawn")
+        for name, configuration in get_backend_configurations(args.model, args.onnx_dir).items():
+            with context.Pool(1) as pool:
+                result = pool.apply(benchmark_backend, (configuration, images, args.batch_size, args.threads, args.inter_op_threads, args.batches))
+
+            end_to_end = f"{result['end_to_end_images_per_second']:.1f} img/s" if result["end_to_end_images_per_second"] else "-"
+            print(f"{name}: carga {result['load_seconds']:.2f} s | lote p50 {result['batch_p50_ms']:.1f} ms | p95 {result['batch_p95_ms']:.1f} ms | "
+                  f"inferencia {result['inference_images_per_second']:.1f} img/s | completo {end_to_end}")
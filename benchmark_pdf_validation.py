@@ -0,0 +1,106 @@
+"""
+  Comparación de la validación estructural de PDF (is_corrupt_pdf) con la validación completa de PyPDF2
+  sobre un corpus: tiempo por archivo (p50/p95), archivos/segundo, aceleración, porcentaje de archivos
+  delegados a PyPDF2 y archivos en los que ambos métodos no coinciden (veredicto o cantidad de páginas).
+"""
+import os
+import time
+from argparse import ArgumentParser
+
+import numpy as np
+
+from is_corrupt_pdf import PdfValidationError, validate_pdf, validate_pdf_with_pypdf2
+
+
+def list_pdfs(folder_path, limit=None):
+    """
+    Lista los PDF de una carpeta y sus subcarpetas, en orden.
+
+    Args:
+        folder_path (str): Ruta de la carpeta con PDF.
+        limit (int, optional): Cantidad máxima de archivos a devolver.
+
+    Returns:
+        list of str: Rutas de los PDF encontrados.
+    """
+    pdf_paths = []
+    for root_dir, _, file_names in os.walk(folder_path):
+        for file_name in file_names:
+            if file_name.lower().endswith(".pdf"):
+                pdf_paths.append(os.path.join(root_dir, file_name))
+    pdf_paths.sort()
+    return pdf_paths[:limit] if limit else pdf_paths
+
+
+def run_pypdf2(pdf_path):
+    """Validación de referencia con PyPDF2: (corrupto, cantidad de páginas)."""
+    try:
+        page_count, _ = validate_pdf_with_pypdf2(pdf_path)
+        return False, page_count
+    except PdfValidationError:
+        return True, None
+
+
+def run_structure(pdf_path):
+    """Validación estructural con fallback a PyPDF2: (corrupto, cantidad de páginas, método usado)."""
+    result = validate_pdf(pdf_path)
+    return result["corrupt"], result["page_count"], result["method"]
+
+
+def time_validation(pdf_paths, validation_function):
+    """
+    Ejecuta una validación sobre todos los archivos, midiendo cada uno.
+
+    Returns:
+        tuple: Resultados por archivo y tiempos en milisegundos.
+    """
+    results, times_ms = [], []
+    for pdf_path in pdf_paths:
+        start = time.perf_counter()
+        results.append(validation_function(pdf_path))
+        times_ms.append((time.perf_counter() - start) * 1000)
+    return results, np.array(times_ms)
+
+
+def format_times(name, times_ms):
+    """Resume los tiempos de un método en una línea."""
+    return (f"{name}: total {times_ms.sum() / 1000:.2f} s | {len(times_ms) / (times_ms.sum() / 1000):.1f} archivos/s | "
+            f"p50 {np.percentile(times_ms, 50):.2f} ms | p95 {np.percentile(times_ms, 95):.2f} ms")
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 benchmark_pdf_validation.py --folder /ruta/a/pdfs --limit 2000
+    parser = ArgumentParser(description="Compara la validación estructural de PDF con PyPDF2.")
+    parser.add_argument("--folder", type=str, required=True, help="Carpeta con PDF")
+    parser.add_argument("--limit", type=int, default=None, help="Cantidad máxima de archivos")
+    parser.add_argument("--show-mismatches", type=int, default=20, help="Cantidad de diferencias a mostrar")
+    args = parser.parse_args()
+
+    pdfs = list_pdfs(args.folder, args.limit)
+    if not pdfs:
+        raise SystemExit(f"No se encontraron PDF en {args.folder}")
+
+    # Una lectura previa de todos los archivos para que ambos métodos los encuentren en la caché del sistema
+    for path in pdfs:
+        with open(path, "rb") as f:
+            while f.read(1 << 20):
+                pass
+
+    reference_results, reference_times = time_validation(pdfs, run_pypdf2)
+    structure_results, structure_times = time_validation(pdfs, run_structure)
+
+    fallbacks = sum(method == "pypdf2" for _, _, method in structure_results)
+    mismatches = [
+        (path, reference, structure[:2])
+        for path, reference, structure in zip(pdfs, reference_results, structure_results)
+        if reference != structure[:2]
+    ]
+
+    print(f"Archivos: {len(pdfs)}")
+    print(format_times("PyPDF2", reference_times))
+    print(format_times("Estructural", structure_times))
+    print(f"Aceleración: {reference_times.sum() / structure_times.sum():.1f}x | "
+          f"delegados a PyPDF2: {fallbacks} ({fallbacks / len(pdfs):.1%}) | diferencias: {len(mismatches)}")
+    for path, reference, structure in mismatches[:args.show_mismatches]:
+        print(f"  {path}: PyPDF2 (corrupto, páginas) = {reference} | estructural = {structure}")
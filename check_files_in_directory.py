@@ -1,9 +1,17 @@
+import io
 import os
 import mimetypes
-from PyPDF2 import PdfReader
+import sqlite3
+import threading
+import time
+from collections import deque
+from contextlib import redirect_stdout
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from PIL import Image
+from is_corrupt_image import validate_image
+from is_corrupt_pdf import validate_pdf
 
-def check_files_in_directory(directory, check_content=False, delete_errors=False):
+def check_files_in_directory(directory, check_content=False, delete_errors=False, max_memory=None, workers=None, io_threads=None, cache=None):
     """
     Verifica archivos en un directorio y sus subdirectorios, detectando posibles errores.
     
@@ -11,6 +19,11 @@ def check_files_in_directory(directory, check_content=False, delete_errors=False
         directory (str): Ruta del directorio a escanear
         check_content (bool): Si True, realiza una verificación profunda del contenido
         delete_errors (bool): Si True, elimina los archivos con errores detectados
+        max_memory (int, optional): Si se indica, las imágenes se decodifican completas por partes sin superar este límite en bytes
+        workers (int, optional): Si se indica, recorre y lee los archivos con un pool de hilos y verifica el contenido
+            con un pool de este número de procesos. Las estadísticas y la salida son idénticas a las de la ejecución serie
+        io_threads (int, optional): Hilos para el recorrido y la lectura de cabeceras (por defecto, 4 por worker)
+        cache (VerificationCache, optional): Caché de veredictos; los archivos sin cambios no se vuelven a verificar
     
     Returns:
         dict: Estadísticas de los archivos verificados y carpetas abuelas con errores
@@ -23,71 +36,32 @@ def check_files_in_directory(directory, check_content=False, delete_errors=False
         'image_files': 0,
         'other_files': 0,
         'error_details': [],
-        'grandparent_folders_with_errors': set()
+        'grandparent_folders_with_errors': set(),
+        'unverified_files': 0,
+        'peak_decode_memory': 0,
+        'peak_decode_memory_file': None
     }
 
     # Configurar mimetypes para mayor precisión
     mimetypes.init()
-    
-    for root, _, files in os.walk(directory):
-        for filename in files:
-            file_path = os.path.join(root, filename)
-            stats['total_files'] += 1
-            
-            try:
-                # Verificación básica del archivo
-                with open(file_path, 'rb') as f:
-                    header = f.read(1024)  # Leer cabecera para verificación básica
-                    
-                    if not header:
-                        raise IOError("Archivo vacío o corrupto")
-                
-                # Detección del tipo de archivo
-                mime_type, _ = mimetypes.guess_type(file_path)
-                
-                # Verificación específica según tipo de archivo
-                if mime_type:
-                    if mime_type == 'application/pdf':
-                        stats['pdf_files'] += 1
-                        if check_content:
-                            verify_pdf(file_path)
-                    elif mime_type.startswith('image/'):
-                        stats['image_files'] += 1
-                        if check_content:
-                            verify_image(file_path)
-                    else:
-                        stats['other_files'] += 1
-                else:
-                    stats['other_files'] += 1
-                    
-            except Exception as e:
-                stats['errors'] += 1
-                error_info = {
-                    'path': file_path,
-                    'error': str(e),
-                    'type': mime_type if mime_type else 'unknown'
-                }
-                stats['error_details'].append(error_info)
-                
-                # Extraer y almacenar la carpeta abuela
-                path_parts = os.path.normpath(file_path).split(os.sep)
-                if len(path_parts) >= 3:
-                    grandparent_folder = path_parts[-3]
-                    stats['grandparent_folders_with_errors'].add(grandparent_folder)
-                
-                print(f"Error en archivo: {file_path}")
-                print(f"  Tipo: {mime_type if mime_type else 'Desconocido'}")
-                print(f"  Error: {e}")
-                
-                # Eliminar archivo si se solicita
-                if delete_errors:
-                    try:
-                        os.remove(file_path)
-                        stats['deleted_files'] += 1
-                        print("  -> Archivo eliminado")
-                    except Exception as delete_error:
-                        print(f"  -> Error al eliminar archivo: {delete_error}")
-                print()
+
+    if workers:
+        results = check_files_parallel(directory, check_content, max_memory, workers, io_threads or workers * 4, cache)
+    else:
+        results = (
+            check_file(os.path.join(root, filename), check_content, max_memory, cache)
+            for root, _, files in os.walk(directory)
+            for filename in files
+        )
+
+    # Los resultados llegan en el orden de os.walk, también en modo paralelo
+    for result in results:
+        if cache:
+            cache.record(result, get_check_mode(check_content, max_memory))
+        record_file_result(stats, result, delete_errors)
+
+    if cache:
+        cache.commit()
     
     print("\nResumen de verificación:")
     print(f"Total de archivos procesados: {stats['total_files']}")
@@ -95,8 +69,14 @@ def check_files_in_directory(directory, check_content=False, delete_errors=False
     print(f"Archivos de imagen: {stats['image_files']}")
     print(f"Otros archivos: {stats['other_files']}")
     print(f"Archivos con errores: {stats['errors']}")
+    if stats['unverified_files']:
+        print(f"Imágenes sin verificar por el límite de memoria: {stats['unverified_files']}")
     if delete_errors:
         print(f"Archivos eliminados: {stats['deleted_files']}")
+    if cache:
+        print(f"Caché de verificación: {cache.hits} aciertos, {cache.misses} fallos")
+    if stats['peak_decode_memory_file']:
+        print(f"Pico de memoria de decodificación: {stats['peak_decode_memory'] / 2**20:.1f} MB ({stats['peak_decode_memory_file']})")
     
     # Mostrar carpetas abuelas con errores
     if stats['grandparent_folders_with_errors']:
@@ -106,26 +86,444 @@ def check_files_in_directory(directory, check_content=False, delete_errors=False
     
     return stats
 
-def verify_pdf(file_path):
-    """Verifica la integridad de un archivo PDF"""
+class FileReadError(OSError):
+    """El archivo no se pudo leer durante la verificación de contenido (E/S, permisos, timeouts)."""
+
+def is_read_error(error):
+    """
+    Indica si un error es una falla al leer el archivo y no un veredicto sobre su contenido: FileReadError
+    u OSError con errno (EIO, EACCES, ETIMEDOUT...). Los OSError de PIL por datos inválidos no tienen errno.
+    """
+    return isinstance(error, FileReadError) or (isinstance(error, OSError) and error.errno is not None)
+
+class ContentNotVerified(Exception):
+    """El contenido no se pudo verificar por completo (p. ej. la imagen no entra en max_memory); no es un error del archivo."""
+
+class VerificationCache:
+    """
+    Caché en SQLite del último veredicto de cada archivo, indexada por dispositivo e inodo y validada
+    por tamaño, fecha de modificación y modo de verificación. Permite que una ejecución periódica sólo
+    verifique los archivos nuevos o modificados.
+
+    Las consultas se hacen desde los hilos de lectura (una conexión por hilo); las escrituras, desde el
+    hilo principal, confirmándose por lotes.
+
+    Attributes:
+        hits (int): Archivos resueltos desde la caché.
+        misses (int): Archivos verificados.
+    """
+
+    COMMIT_INTERVAL = 1000
+
+    def __init__(self, cache_path, revalidate_older_than=None):
+        """
+        Args:
+            cache_path (str): Ruta al archivo SQLite.
+            revalidate_older_than (float, optional): Segundos tras los cuales un veredicto se vuelve a verificar
+                aunque el archivo no haya cambiado.
+        """
+        self.cache_path = cache_path
+        self.min_verified_at = time.time() - revalidate_older_than if revalidate_older_than else 0
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(cache_path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS verifications (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                check_mode TEXT NOT NULL,
+                path TEXT NOT NULL,
+                mime_type TEXT,
+                category TEXT,
+                error TEXT,
+                peak_memory INTEGER,
+                verified_at REAL NOT NULL,
+                PRIMARY KEY (device, inode)
+            )
+            """
+        )
+        self.connection.commit()
+
+        self._pending_writes = 0
+        self._local = threading.local()
+        self._reader_connections = []
+        self._reader_connections_lock = threading.Lock()
+
+    def _get_reader_connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = sqlite3.connect(self.cache_path, timeout=60, check_same_thread=False)
+            with self._reader_connections_lock:
+                self._reader_connections.append(connection)
+        return connection
+
+    def lookup(self, file_path, file_stat, check_mode):
+        """
+        Devuelve el veredicto guardado si el archivo no cambió, se verificó con el mismo modo y no es
+        más antiguo que revalidate_older_than. Puede llamarse desde cualquier hilo.
+
+        Returns:
+            dict: Resultado con el formato de check_file (con 'cached' en True), o None.
+        """
+        row = self._get_reader_connection().execute(
+            "SELECT size, mtime_ns, check_mode, mime_type, category, error, peak_memory, verified_at "
+            "FROM verifications WHERE device = ? AND inode = ?",
+            (file_stat.st_dev, file_stat.st_ino)
+        ).fetchone()
+
+        if (
+            row is None
+            or (row[0], row[1], row[2]) != (file_stat.st_size, file_stat.st_mtime_ns, check_mode)
+            or row[7] < self.min_verified_at
+        ):
+            return None
+
+        return {
+            'path': file_path, 'mime_type': row[3], 'category': row[4], 'error': row[5],
+            'peak_memory': row[6], 'stat': file_stat, 'cached': True
+        }
+
+    def record(self, result, check_mode):
+        """
+        Cuenta el acierto o fallo y guarda el veredicto de un archivo verificado. Sólo desde el hilo principal.
+        Los errores de lectura (ver is_read_error) y las verificaciones incompletas (ContentNotVerified, p. ej. por
+        el límite de memoria) no se guardan, para volver a verificar el archivo en la próxima ejecución.
+        """
+        if result['cached']:
+            self.hits += 1
+            return
+
+        self.misses += 1
+        file_stat = result['stat']
+        if file_stat is None or is_read_error(result['error']) or isinstance(result['error'], ContentNotVerified):
+            # Sin veredicto: el archivo no se pudo leer o su contenido no se verificó por completo
+            return
+
+        self.connection.execute(
+            "INSERT OR REPLACE INTO verifications "
+            "(device, inode, size, mtime_ns, check_mode, path, mime_type, category, error, peak_memory, verified_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                file_stat.st_dev, file_stat.st_ino, file_stat.st_size, file_stat.st_mtime_ns, check_mode, result['path'],
+                result['mime_type'], result['category'], None if result['error'] is None else str(result['error']),
+                result['peak_memory'], time.time()
+            )
+        )
+        self._pending_writes += 1
+        if self._pending_writes >= self.COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """Confirma las escrituras pendientes."""
+        self.connection.commit()
+        self._pending_writes = 0
+
+    def close(self):
+        """Confirma las escrituras pendientes y cierra las conexiones."""
+        self.commit()
+        for connection in self._reader_connections:
+            connection.close()
+        self.connection.close()
+
+def get_check_mode(check_content, max_memory=None):
+    """Identifica el tipo de verificación realizada, para no reutilizar veredictos de otro tipo."""
+    if not check_content:
+        return 'basic'
+    return f'content:{max_memory}' if max_memory else 'content'
+
+def get_file_category(mime_type):
+    """Devuelve la categoría de estadística ('pdf_files', 'image_files' u 'other_files') según el tipo MIME."""
+    if mime_type == 'application/pdf':
+        return 'pdf_files'
+    if mime_type and mime_type.startswith('image/'):
+        return 'image_files'
+    return 'other_files'
+
+def read_file_header(file_path):
+    """
+    Verificación básica de un archivo: lectura de la cabecera y detección del tipo.
+
+    Returns:
+        tuple: Tipo MIME (o None) y categoría del archivo
+    """
+    mime_type, _ = mimetypes.guess_type(file_path)
+
     with open(file_path, 'rb') as f:
+        header = f.read(1024)  # Leer cabecera para verificación básica
+
+        if not header:
+            raise IOError("Archivo vacío o corrupto")
+
+    return mime_type, get_file_category(mime_type)
+
+def verify_file_content(file_path, category, max_memory=None):
+    """
+    Verificación específica del contenido según la categoría del archivo.
+
+    Returns:
+        int: Pico de memoria de decodificación (sólo imágenes con max_memory), o None
+    """
+    if category == 'pdf_files':
+        verify_pdf(file_path)
+    elif category == 'image_files':
+        return verify_image(file_path, max_memory)
+    return None
+
+def verify_file_content_in_pool(file_path, category, max_memory=None):
+    """
+    verify_file_content para el pool de procesos: captura lo que imprime (advertencias) para que el
+    proceso principal lo muestre en orden.
+
+    Returns:
+        tuple: Pico de memoria de decodificación y salida capturada
+    """
+    output = io.StringIO()
+    with redirect_stdout(output):
+        peak_memory = verify_file_content(file_path, category, max_memory)
+    return peak_memory, output.getvalue()
+
+def get_cached_result(file_path, check_content, max_memory, cache):
+    """
+    Obtiene los datos del archivo y, si hay caché, su veredicto guardado.
+
+    Returns:
+        tuple: os.stat_result del archivo (None si no se pudo obtener) y resultado cacheado (o None)
+    """
+    if cache is None:
+        return None, None
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        return None, None
+    return file_stat, cache.lookup(file_path, file_stat, get_check_mode(check_content, max_memory))
+
+def check_file(file_path, check_content=False, max_memory=None, cache=None):
+    """
+    Verifica un archivo.
+
+    Returns:
+        dict: Ruta ('path'), tipo MIME ('mime_type'), categoría ('category', None si falló la lectura básica),
+        error ('error', None si no hubo), pico de memoria ('peak_memory'), os.stat_result ('stat', sólo con
+        caché) y si el resultado vino de la caché ('cached')
+    """
+    file_stat, cached_result = get_cached_result(file_path, check_content, max_memory, cache)
+    if cached_result:
+        return cached_result
+
+    result = {
+        'path': file_path, 'mime_type': mimetypes.guess_type(file_path)[0], 'category': None, 'error': None,
+        'peak_memory': None, 'stat': file_stat, 'cached': False
+    }
+    try:
+        result['mime_type'], result['category'] = read_file_header(file_path)
+        if check_content:
+            result['peak_memory'] = verify_file_content(file_path, result['category'], max_memory)
+    except Exception as e:
+        result['error'] = e
+    return result
+
+def scan_directory(path):
+    """
+    Lista un directorio con os.scandir. Replica el criterio de os.walk: los errores de listado se ignoran
+    y los enlaces simbólicos a directorios no se recorren.
+
+    Returns:
+        tuple: Rutas de los archivos del directorio y rutas de sus subdirectorios, en orden
+    """
+    try:
+        with os.scandir(path) as iterator:
+            entries = list(iterator)
+    except OSError:
+        return [], []
+
+    files, subdirectories = [], []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+
+        if not is_dir:
+            files.append(entry.path)
+            continue
+
+        try:
+            is_symlink = entry.is_symlink()
+        except OSError:
+            is_symlink = False
+        if not is_symlink:
+            subdirectories.append(entry.path)
+
+    return files, subdirectories
+
+def iter_files_parallel(directory, executor, max_in_flight=64):
+    """
+    Devuelve las rutas de los archivos en el mismo orden que os.walk, listando en paralelo los próximos
+    directorios del recorrido. Como mucho max_in_flight listados están en vuelo o sin consumir a la vez.
+    """
+    stack, listings = [directory], {}
+    while stack:
+        # Se anticipa el listado de los próximos directorios a recorrer (el tope de la pila)
+        for path in reversed(stack[-max_in_flight:]):
+            if len(listings) >= max_in_flight:
+                break
+            if path not in listings:
+                listings[path] = executor.submit(scan_directory, path)
+
+        files, subdirectories = listings.pop(stack.pop()).result()
+        yield from files
+        stack.extend(reversed(subdirectories))
+
+def check_file_header_in_pool(file_path, check_content, max_memory, process_pool, cache=None):
+    """
+    Consulta de caché y lectura básica en el pool de hilos; la verificación de contenido se envía al pool de procesos.
+
+    Returns:
+        tuple: Resultado parcial (formato de check_file) y future de la verificación de contenido (o None)
+    """
+    file_stat, cached_result = get_cached_result(file_path, check_content, max_memory, cache)
+    if cached_result:
+        return cached_result, None
+
+    result = {
+        'path': file_path, 'mime_type': mimetypes.guess_type(file_path)[0], 'category': None, 'error': None,
+        'peak_memory': None, 'stat': file_stat, 'cached': False
+    }
+    try:
+        result['mime_type'], result['category'] = read_file_header(file_path)
+    except Exception as e:
+        result['error'] = e
+        return result, None
+
+    content_future = None
+    if check_content and result['category'] != 'other_files':
+        content_future = process_pool.submit(verify_file_content_in_pool, file_path, result['category'], max_memory)
+    return result, content_future
+
+def check_files_parallel(directory, check_content, max_memory, workers, io_threads, cache=None):
+    """
+    Verifica los archivos con un pool de hilos (recorrido y lectura de cabeceras) y un pool de procesos
+    (verificación de contenido). Los resultados se devuelven en el orden de os.walk, con un número
+    acotado de archivos en vuelo.
+
+    Yields:
+        dict: Mismo formato que check_file
+    """
+    max_in_flight = io_threads * 16
+
+    with ThreadPoolExecutor(io_threads) as io_pool, ProcessPoolExecutor(workers) as process_pool:
+        pending = deque()
+
+        def next_result():
+            result, content_future = pending.popleft().result()
+            if content_future is not None:
+                try:
+                    result['peak_memory'], output = content_future.result()
+                    print(output, end='')
+                except Exception as e:
+                    result['error'] = e
+            return result
+
+        for file_path in iter_files_parallel(directory, io_pool, max_in_flight):
+            pending.append(io_pool.submit(check_file_header_in_pool, file_path, check_content, max_memory, process_pool, cache))
+            if len(pending) >= max_in_flight:
+                yield next_result()
+
+        while pending:
+            yield next_result()
+
+def record_file_result(stats, result, delete_errors=False):
+    """Acumula en stats el resultado de un archivo, informando y, si se pide, eliminando los archivos con errores."""
+    file_path, mime_type, category, error, peak_memory = (
+        result['path'], result['mime_type'], result['category'], result['error'], result['peak_memory']
+    )
+    stats['total_files'] += 1
+    if category:
+        stats[category] += 1
+    if peak_memory and peak_memory > stats['peak_decode_memory']:
+        stats['peak_decode_memory'] = peak_memory
+        stats['peak_decode_memory_file'] = file_path
+
+    if error is None:
+        return
+
+    if isinstance(error, ContentNotVerified):
+        # Sin veredicto: no se cuenta como error ni se elimina
+        stats['unverified_files'] += 1
+        print(f"Sin verificar: {file_path} ({error})")
+        return
+
+    stats['errors'] += 1
+    error_info = {
+        'path': file_path,
+        'error': str(error),
+        'type': mime_type if mime_type else 'unknown'
+    }
+    stats['error_details'].append(error_info)
+    
+    # Extraer y almacenar la carpeta abuela
+    path_parts = os.path.normpath(file_path).split(os.sep)
+    if len(path_parts) >= 3:
+        grandparent_folder = path_parts[-3]
+        stats['grandparent_folders_with_errors'].add(grandparent_folder)
+    
+    print(f"Error en archivo: {file_path}")
+    print(f"  Tipo: {mime_type if mime_type else 'Desconocido'}")
+    print(f"  Error: {error}")
+    
+    # Eliminar archivo si se solicita
+    if delete_errors:
         try:
-            reader = PdfReader(f)
-            if len(reader.pages) == 0:
-                raise ValueError("PDF no contiene páginas")
-            if not reader.metadata:
-                print(f"Advertencia: PDF sin metadatos - {file_path}")
-        except Exception as e:
-            raise Exception(f"Error en PDF: {str(e)}")
-
-def verify_image(file_path):
-    """Verifica la integridad de un archivo de imagen"""
+            os.remove(file_path)
+            stats['deleted_files'] += 1
+            print("  -> Archivo eliminado")
+        except Exception as delete_error:
+            print(f"  -> Error al eliminar archivo: {delete_error}")
+    print()
+
+def verify_pdf(file_path):
+    """
+    Verifica la integridad de un archivo PDF leyendo sólo su estructura (xref, trailer y /Pages /Count);
+    los casos ambiguos se verifican con PyPDF2 (ver is_corrupt_pdf.validate_pdf).
+    """
+    result = validate_pdf(file_path)
+    if result['reason'] == 'io_error':
+        raise FileReadError(f"Error de lectura en PDF: {result['details']}")
+    if result['corrupt']:
+        raise Exception(f"Error en PDF: {result['details'] or result['reason']}")
+    if not result['has_metadata']:
+        print(f"Advertencia: PDF sin metadatos - {file_path}")
+
+def verify_image(file_path, max_memory=None):
+    """
+    Verifica la integridad de un archivo de imagen. Con max_memory, decodifica la imagen completa por
+    partes (filas, strips o tiles) sin superar ese límite y devuelve el pico de memoria usado; si la
+    decodificación no entra en el límite (sólo se verificaron estructura y truncamiento), lanza ContentNotVerified.
+    """
+    if max_memory:
+        result = validate_image(file_path, "decode", max_memory)
+        if result['reason'] == 'io_error':
+            raise FileReadError(f"Error de lectura en imagen: {result['details']}")
+        if result['reason'] == 'unverified_over_limit':
+            raise ContentNotVerified(f"supera el límite de memoria: {result['details']}")
+        if result['corrupt']:
+            raise Exception(f"Error en imagen: {result['reason']}: {result['details']}")
+        return result['peak_memory']
+
     try:
         with Image.open(file_path) as img:
             img.verify()
             if img.size[0] == 0 or img.size[1] == 0:
                 raise ValueError("Dimensiones de imagen inválidas")
     except Exception as e:
+        if is_read_error(e):
+            raise
         raise Exception(f"Error en imagen: {str(e)}")
 
 # Ejemplo de uso
@@ -136,8 +534,17 @@ if __name__ == "__main__":
     parser.add_argument('ruta', help='Ruta del directorio a verificar')
     parser.add_argument('--check-content', action='store_true', help='Realizar verificación profunda del contenido')
     parser.add_argument('--delete-errors', action='store_true', help='Eliminar archivos con errores detectados')
+    parser.add_argument('--max-memory-mb', type=int, default=None, help='Decodificar las imágenes por partes sin superar este límite de memoria (MB)')
+    parser.add_argument('--workers', type=int, default=None, help='Procesos para la verificación de contenido (activa el modo paralelo)')
+    parser.add_argument('--io-threads', type=int, default=None, help='Hilos para el recorrido y la lectura de archivos en modo paralelo (por defecto, 4 por worker)')
+    parser.add_argument('--cache', default=None, help='Archivo SQLite con los veredictos de ejecuciones anteriores (los archivos sin cambios no se vuelven a verificar)')
+    parser.add_argument('--revalidate-older-than', type=float, default=None, help='Con --cache, volver a verificar los veredictos con más de estos días')
     args = parser.parse_args()
     
+    cache = None
+    if args.cache:
+        cache = VerificationCache(args.cache, args.revalidate_older_than * 86400 if args.revalidate_older_than else None)
+
     print(f"Iniciando verificación en: {args.ruta}")
     if args.delete_errors:
         print("MODO ELIMINACIÓN ACTIVADO - Los archivos con errores serán eliminados")
@@ -145,8 +552,14 @@ if __name__ == "__main__":
     resultados = check_files_in_directory(
         directory=args.ruta,
         check_content=args.check_content,
-        delete_errors=args.delete_errors
+        delete_errors=args.delete_errors,
+        max_memory=args.max_memory_mb * 2**20 if args.max_memory_mb else None,
+        workers=args.workers,
+        io_threads=args.io_threads,
+        cache=cache
     )
+    if cache:
+        cache.close()
     
     # Guardar resultados en un archivo
     with open("verificacion_archivos.log", "w") as log_file:
@@ -154,8 +567,12 @@ if __name__ == "__main__":
         log_file.write(f"Directorio verificado: {args.ruta}\n")
         log_file.write(f"Total archivos: {resultados['total_files']}\n")
         log_file.write(f"Archivos con errores: {resultados['errors']}\n")
+        if resultados['unverified_files']:
+            log_file.write(f"Imágenes sin verificar por el límite de memoria: {resultados['unverified_files']}\n")
         if args.delete_errors:
             log_file.write(f"Archivos eliminados: {resultados['deleted_files']}\n")
+        if cache:
+            log_file.write(f"Caché de verificación: {cache.hits} aciertos, {cache.misses} fallos\n")
         log_file.write("\nDetalles por tipo:\n")
         log_file.write(f"PDF: {resultados['pdf_files']}\n")
         log_file.write(f"Imágenes: {resultados['image_files']}\n")
@@ -182,6 +599,15 @@ python3 script.py /ruta/a/verificar --check-content
 Eliminar archivos con errores:
 python3 script.py /ruta/a/verificar --delete-errors
 
+Verificación de contenido con memoria acotada (imágenes grandes, decodificadas por partes):
+python3 check_files_in_directory.py /ruta/a/verificar --check-content --max-memory-mb 256
+
+Verificación en paralelo (8 procesos para el contenido, hilos para la lectura):
+python3 check_files_in_directory.py /ruta/a/verificar --check-content --workers 8
+
+Verificación nocturna incremental (sólo archivos nuevos o modificados; todo se revalida cada 30 días):
+python3 check_files_in_directory.py /ruta/a/verificar --check-content --cache verificacion.sqlite --revalidate-older-than 30
+
 Combinación de opciones:
 python3 check_files_in_directory.py /mnt/HDD2/Medic-app/prospectos_v3 --check-content --delete-errors
 """
@@ -1,24 +1,227 @@
+"""
+  Extracción de metadatos de PDF a escala de carpeta: de cada archivo se leen sólo el trailer, el
+  diccionario /Info y, si existe, el paquete XMP del catálogo (/Metadata), resolviendo esos objetos
+  por su offset en la tabla xref (ver is_corrupt_pdf.PdfStructureReader) en lugar de parsear el
+  documento completo. Los archivos cuya estructura no se puede leer así (p. ej. cifrados o con la
+  tabla xref dañada) se leen con PyPDF2.
+
+  Los archivos se procesan en lotes sobre un pool de procesos y se escribe una fila por PDF (JSONL o
+  CSV) a medida que se obtienen, en el orden del recorrido.
+"""
+import csv
+import json
+import mmap
+import os
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
 import PyPDF2
 
+from is_corrupt_pdf import AmbiguousPdfStructure, PdfStructureReader
+from utils import BackgroundJsonlWriter
+
+# Claves estándar de /Info (columnas del CSV; en JSONL se guardan todas)
+STANDARD_INFO_KEYS = ("Title", "Author", "Subject", "Keywords", "Creator", "Producer", "CreationDate", "ModDate", "Trapped")
+CSV_FIELDS = ("path", "method", "version", "encrypted", *STANDARD_INFO_KEYS, "other_info", "xmp", "error")
+
+
+def decode_text_string(value):
+    """
+    Convierte un valor de /Info en texto: strings con BOM UTF-16BE o UTF-8 y, si no, PDFDocEncoding
+    (aproximado con latin-1). Los nombres y números se devuelven tal cual.
+    """
+    if isinstance(value, bytes):
+        if value.startswith(b"\xfe\xff"):
+            return value[2:].decode("utf-16-be", errors="replace")
+        if value.startswith(b"\xef\xbb\xbf"):
+            return value[3:].decode("utf-8", errors="replace")
+        return value.decode("latin-1")
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def decode_structure_value(value):
+    """
+    decode_text_string para los valores leídos con PdfStructureReader, que devuelve los nombres como str
+    sin '/': se les agrega el prefijo, como en los NameObject de PyPDF2 (p. ej. /Trapped /False).
+    """
+    if isinstance(value, str):
+        return "/" + value
+    if isinstance(value, list):
+        return str([decode_structure_value(item) for item in value])
+    return decode_text_string(value)
+
+
+def read_structure_metadata(data, reader_result):
+    """Completa reader_result con la versión, /Info y XMP leídos con PdfStructureReader."""
+    reader = PdfStructureReader(data)
+    if "Encrypt" in reader.trailer:
+        # Los strings de /Info y el XMP están cifrados
+        raise AmbiguousPdfStructure("encrypted", "encrypted documents are read with PyPDF2")
+
+    info = reader.get_info() or {}
+    xmp = reader.get_xmp()
+    reader_result.update(
+        version=reader.get_version(),
+        encrypted=False,
+        info={key: decode_structure_value(reader.resolve(value)) for key, value in info.items()},
+        xmp=xmp.decode("utf-8", errors="replace") if xmp else None,
+    )
+
+
+def read_pypdf2_metadata(pdf_path, reader_result):
+    """Completa reader_result con la versión, /Info y XMP leídos con PyPDF2."""
+    with open(pdf_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        file.seek(0)
+        header = file.read(16)
+        version = header[5:8].decode("latin-1") if header.startswith(b"%PDF-") else None
+
+        encrypted = reader.is_encrypted
+        if encrypted:
+            reader.decrypt("")
+
+        metadata = reader.metadata or {}
+        catalog_metadata = reader.trailer["/Root"].get("/Metadata")
+        reader_result.update(
+            version=version,
+            encrypted=encrypted,
+            info={key.lstrip("/"): decode_text_string(value) for key, value in metadata.items()},
+            xmp=catalog_metadata.get_object().get_data().decode("utf-8", errors="replace") if catalog_metadata else None,
+        )
+
+
+def extract_pdf_metadata(pdf_path):
+    """
+    Extrae la versión, el diccionario /Info y el XMP de un PDF.
+
+    Args:
+        pdf_path (str): Ruta del PDF.
+
+    Returns:
+        dict: 'path', 'method' ('structure' o 'pypdf2'), 'version', 'encrypted', 'info' (dict con las
+        claves sin '/'), 'xmp' (texto del paquete XMP o None) y 'error' (None si se pudo leer).
+    """
+    result = {"path": pdf_path, "method": "structure", "version": None, "encrypted": None, "info": {}, "xmp": None, "error": None}
+    try:
+        try:
+            with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                read_structure_metadata(data, result)
+            return result
+        except Exception:
+            # Estructura ambigua, sintaxis inesperada o archivo vacío (mmap falla): PyPDF2 decide e informa el error
+            pass
+
+        result["method"] = "pypdf2"
+        read_pypdf2_metadata(pdf_path, result)
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+
+def extract_metadata_batch(pdf_paths):
+    """Extrae los metadatos de un lote de PDF (se ejecuta en el pool de procesos)."""
+    return [extract_pdf_metadata(pdf_path) for pdf_path in pdf_paths]
+
+
+def iter_pdf_paths(directory):
+    """Recorre directory y devuelve las rutas con extensión .pdf (sin distinguir mayúsculas)."""
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            if file_name.lower().endswith(".pdf"):
+                yield os.path.join(root, file_name)
+
+
+def extract_folder_metadata(directory, workers=None, batch_size=64):
+    """
+    Extrae los metadatos de todos los PDF de una carpeta y sus subcarpetas.
+
+    Args:
+        directory (str): Carpeta a recorrer.
+        workers (int, optional): Procesos del pool (por defecto, uno por CPU).
+        batch_size (int): PDF por tarea del pool.
+
+    Yields:
+        dict: Resultado de extract_pdf_metadata para cada PDF, en el orden del recorrido.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = workers * 4
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending, batch = deque(), []
+        for pdf_path in iter_pdf_paths(directory):
+            batch.append(pdf_path)
+            if len(batch) == batch_size:
+                pending.append(executor.submit(extract_metadata_batch, batch))
+                batch = []
+                if len(pending) >= max_in_flight:
+                    yield from pending.popleft().result()
+        if batch:
+            pending.append(executor.submit(extract_metadata_batch, batch))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def to_csv_row(result):
+    """Aplana un resultado de extract_pdf_metadata en una fila con las columnas CSV_FIELDS."""
+    info = result["info"]
+    row = {field: result.get(field) for field in ("path", "method", "version", "encrypted", "xmp", "error")}
+    row.update({key: info.get(key) for key in STANDARD_INFO_KEYS})
+    other_info = {key: value for key, value in info.items() if key not in STANDARD_INFO_KEYS}
+    row["other_info"] = json.dumps(other_info, ensure_ascii=False) if other_info else None
+    return row
+
+
 def check_pdf_metadata(pdf_path):
     """
     Comprueba si un archivo PDF contiene metadatos y los imprime si están disponibles.
-    
+
     Args:
         pdf_path (str): Ruta del archivo PDF para comprobar los metadatos.
     """
-    try:
-        with open(pdf_path, "rb") as file:
-            reader = PyPDF2.PdfReader(file)
-            metadata = reader.metadata
-
-            if metadata:
-                print("The PDF has the following metadata:")
-                for key, value in metadata.items():
-                    print(f"{key}: {value}")
-            else:
-                print("The PDF does not have any metadata.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+    result = extract_pdf_metadata(pdf_path)
+    if result["error"]:
+        print(f"An error occurred: {result['error']}")
+    elif result["info"]:
+        print("The PDF has the following metadata:")
+        for key, value in result["info"].items():
+            print(f"/{key}: {value}")
+    else:
+        print("The PDF does not have any metadata.")
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 check_pdf_metadata.py path/to/your/file.pdf
+    # python3 check_pdf_metadata.py /ruta/a/pdfs --output metadatos.jsonl --workers 8
+    # python3 check_pdf_metadata.py /ruta/a/pdfs --output metadatos.csv
+    parser = ArgumentParser(description="Extrae los metadatos (/Info y XMP) de un PDF o de todos los PDF de una carpeta.")
+    parser.add_argument("path", help="PDF o carpeta con PDF")
+    parser.add_argument("--output", default=None, help="Archivo de salida para carpetas: .csv o .jsonl (una fila por PDF)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto, uno por CPU)")
+    parser.add_argument("--batch-size", type=int, default=64, help="PDF por tarea")
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.path):
+        check_pdf_metadata(args.path)
+    elif not args.output:
+        parser.error("--output es obligatorio para carpetas")
+    else:
+        total, errors = 0, 0
+        results = extract_folder_metadata(args.path, args.workers, args.batch_size)
+        if args.output.lower().endswith(".csv"):
+            with open(args.output, "w", newline="", encoding="utf-8") as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=CSV_FIELDS)
+                writer.writeheader()
+                for result in results:
+                    writer.writerow(to_csv_row(result))
+                    total, errors = total + 1, errors + bool(result["error"])
+        else:
+            with BackgroundJsonlWriter(args.output) as writer:
+                for result in results:
+                    writer.write(result)
+                    total, errors = total + 1, errors + bool(result["error"])
 
-check_pdf_metadata("path/to/your/file.pdf")
+        print(f"PDF procesados: {total} | con errores: {errors} | resultados en {args.output}")
@@ -1,41 +1,307 @@
 """
  Recibe una ruta principal y busca carpetas 1_real sin comprimir y las comprime. Diviendo estos comprimidos en caso de superar el tamaño máximo y límite de imágenes.
+ La compresión gzip se hace por bloques en paralelo (ParallelGzipWriter); el resultado es un .tar.gz estándar.
+ También se puede comprimir con zstd o lz4 (dependencias opcionales: zstandard, lz4), guardar un tar sin
+ comprimir, o elegir por carpeta según la compresibilidad de una muestra de archivos (codec "auto").
 """
 import os, re
 import logging
 import tarfile
 import errno
 import select
+import struct
 import sys
 import time
 import traceback
 import shutil
+import zlib
+import json
+import random
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 logging.basicConfig(level=logging.INFO)
 
-def compress_to_tar_gz(filename, path_folder):
+# Tamaño de los bloques sin comprimir que se comprimen en paralelo
+GZIP_BLOCK_SIZE = 1 << 20
+# Ventana de deflate: cada bloque usa los últimos 32 KiB del anterior como diccionario
+GZIP_WINDOW_SIZE = 1 << 15
+# Nivel por defecto, el mismo que usa tarfile en modo "w:gz"
+GZIP_COMPRESS_LEVEL = 9
+# Extensión de los archivos generados con cada codec
+ARCHIVE_EXTENSIONS = {"gzip": ".tar.gz", "zstd": ".tar.zst", "lz4": ".tar.lz4", "none": ".tar"}
+CODECS = (*ARCHIVE_EXTENSIONS, "auto")
+ZSTD_COMPRESS_LEVEL = 3
+ZSTD_HIGH_COMPRESS_LEVEL = 9
+LZ4_COMPRESS_LEVEL = 0
+# Niveles válidos de cada codec (mínimo, máximo); "none" no admite nivel
+CODEC_LEVEL_RANGES = {"gzip": (1, 9), "zstd": (1, 22), "lz4": (0, 16)}
+# Muestra del codec "auto": archivos y bytes leídos del inicio de cada uno
+AUTO_SAMPLE_FILES = 32
+AUTO_SAMPLE_BYTES = 1 << 18
+# Relación de compresión mínima de la muestra para comprimir, y a partir de la cual conviene un nivel más alto
+AUTO_MIN_RATIO = 1.05
+AUTO_HIGH_RATIO = 1.5
+# Los archivos relacionados comparten el prefijo hasta el primer "-origin" y van siempre en la misma parte
+FILE_GROUP_PATTERN = re.compile(r'(.+?-origin).*')
+
+def compress_gzip_block(block, dictionary, level, final):
+    """
+    Comprime un bloque como deflate crudo. Los bloques intermedios terminan con Z_SYNC_FLUSH (alineados a
+    byte y sin marca de fin), de modo que la concatenación de todos forma un único stream deflate.
+
+    Args:
+        block (bytes): Datos sin comprimir.
+        dictionary (bytes): Últimos bytes del bloque anterior (hasta 32 KiB), para no perder referencias entre bloques.
+        level (int): Nivel de compresión (1-9).
+        final (bool): Si es el último bloque del stream.
+
+    Returns:
+        bytes: Datos comprimidos.
+    """
+    if dictionary:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS, zdict=dictionary)
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return compressor.compress(block) + compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class ParallelGzipWriter:
+    """
+    Archivo de escritura que comprime en gzip por bloques independientes en un pool de hilos (zlib libera
+    el GIL al comprimir). Los bloques se escriben en orden y el resultado es un único miembro gzip
+    estándar, legible con gzip, tarfile o zcat.
+
+    Se usa como destino de tarfile en modo stream: tarfile.open(fileobj=writer, mode="w|").
+    """
+
+    def __init__(self, output_path, threads=None, level=GZIP_COMPRESS_LEVEL, block_size=GZIP_BLOCK_SIZE):
+        """
+        Args:
+            output_path (str): Ruta del archivo .gz a crear.
+            threads (int, optional): Hilos de compresión (por defecto, uno por CPU).
+            level (int): Nivel de compresión (1-9).
+            block_size (int): Tamaño de los bloques sin comprimir.
+        """
+        self.threads = threads or os.cpu_count() or 1
+        self.level = level
+        self.block_size = max(block_size, GZIP_WINDOW_SIZE)
+
+        self._file = open(output_path, "wb")
+        self._executor = ThreadPoolExecutor(max_workers=self.threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._dictionary = b""
+        self._crc = 0
+        self._size = 0
+
+        # Cabecera gzip: método deflate, sin flags, fecha de modificación y sistema operativo Unix
+        self._file.write(struct.pack("<BBBBIBB", 0x1F, 0x8B, 8, 0, int(time.time()), 0, 3))
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self.block_size:
+            block = bytes(self._buffer[:self.block_size])
+            del self._buffer[:self.block_size]
+            self._submit_block(block, final=False)
+        return len(data)
+
+    def _submit_block(self, block, final):
+        self._crc = zlib.crc32(block, self._crc)
+        self._size += len(block)
+        self._pending.append(self._executor.submit(compress_gzip_block, block, self._dictionary, self.level, final))
+        self._dictionary = block[-GZIP_WINDOW_SIZE:]
+
+        # Limita la memoria: como máximo dos bloques por hilo esperando a escribirse
+        while len(self._pending) > self.threads * 2:
+            self._file.write(self._pending.popleft().result())
+
+    def close(self):
+        """Comprime el último bloque, escribe los pendientes y el trailer gzip (CRC32 y tamaño) y cierra el archivo."""
+        if self._file.closed:
+            return
+        try:
+            self._submit_block(bytes(self._buffer), final=True)
+            self._buffer = bytearray()
+            while self._pending:
+                self._file.write(self._pending.popleft().result())
+            self._file.write(struct.pack("<II", self._crc, self._size & 0xFFFFFFFF))
+        finally:
+            self.abort()
+
+    def abort(self):
+        """Descarta los bloques pendientes y cierra el archivo (queda incompleto)."""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        self._pending.clear()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type:
+            self.abort()
+        else:
+            self.close()
+
+def validate_codec_level(codec, level):
+    """
+    Verifica que el nivel de compresión sea válido para el codec (ver CODEC_LEVEL_RANGES). Con 'auto' no
+    se admite un nivel explícito, porque el nivel lo elige choose_codec junto con el codec de cada carpeta.
+
+    Raises:
+        ValueError: Si el codec no existe o el nivel no es válido para él.
+    """
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec}")
+    if level is None:
+        return
+    if codec == "auto":
+        raise ValueError("Codec 'auto' chooses the compression level itself; do not pass a level")
+    if codec not in CODEC_LEVEL_RANGES:
+        raise ValueError(f"Codec {codec} does not accept a compression level")
+    min_level, max_level = CODEC_LEVEL_RANGES[codec]
+    if not min_level <= level <= max_level:
+        raise ValueError(f"Invalid {codec} compression level {level} (valid: {min_level}-{max_level})")
+
+def open_compressed_writer(output_path, codec="gzip", level=None, threads=None):
+    """
+    Abre un archivo de escritura que comprime con el codec indicado. Se usa como context manager.
+
+    Args:
+        output_path (str): Ruta del archivo a crear.
+        codec (str): 'gzip' (por bloques en paralelo), 'zstd' (multihilo), 'lz4' o 'none'.
+        level (int, optional): Nivel de compresión (por defecto, el del codec; ver CODEC_LEVEL_RANGES).
+        threads (int, optional): Hilos de compresión para gzip y zstd (por defecto, uno por CPU).
+    """
+    if codec == "auto":
+        raise ValueError("Codec 'auto' must be resolved with choose_codec before writing")
+    validate_codec_level(codec, level)
+
+    if codec == "gzip":
+        return ParallelGzipWriter(output_path, threads, GZIP_COMPRESS_LEVEL if level is None else level)
+    if codec == "zstd":
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL if level is None else level, threads=threads or -1)
+        return compressor.stream_writer(open(output_path, "wb"), closefd=True)
+    if codec == "lz4":
+        import lz4.frame
+
+        return lz4.frame.open(output_path, "wb", compression_level=LZ4_COMPRESS_LEVEL if level is None else level)
+    return open(output_path, "wb")
+
+def choose_codec(source_folder, sample_files=AUTO_SAMPLE_FILES, sample_bytes=AUTO_SAMPLE_BYTES):
+    """
+    Elige codec y nivel para una carpeta comprimiendo una muestra de sus archivos (el inicio de hasta
+    sample_files archivos): sin compresión si la muestra casi no se reduce (p. ej. JPEG/PNG), zstd con
+    un nivel más alto si se reduce mucho, o zstd rápido en otro caso. Sin zstandard instalado, usa gzip.
+
+    Args:
+        source_folder (str): Ruta de la carpeta a comprimir.
+        sample_files (int): Cantidad máxima de archivos de la muestra.
+        sample_bytes (int): Bytes leídos de cada archivo de la muestra.
+
+    Returns:
+        tuple: Codec, nivel (None para el nivel por defecto) y relación de compresión de la muestra.
+    """
+    with os.scandir(source_folder) as entries:
+        file_names = sorted(entry.name for entry in entries if entry.is_file())
+    if not file_names:
+        return "none", None, 1.0
+
+    sample = bytearray()
+    for file_name in random.Random(0).sample(file_names, min(sample_files, len(file_names))):
+        with open(os.path.join(source_folder, file_name), "rb") as f:
+            sample += f.read(sample_bytes)
+    if not sample:
+        return "none", None, 1.0
+
+    try:
+        import zstandard
+    except ImportError:
+        zstandard = None
+
+    if zstandard:
+        ratio = len(sample) / len(zstandard.ZstdCompressor(level=ZSTD_COMPRESS_LEVEL).compress(bytes(sample)))
+    else:
+        ratio = len(sample) / len(zlib.compress(bytes(sample), 6))
+
+    if ratio < AUTO_MIN_RATIO:
+        return "none", None, ratio
+    if not zstandard:
+        return "gzip", None, ratio
+    return "zstd", ZSTD_HIGH_COMPRESS_LEVEL if ratio >= AUTO_HIGH_RATIO else ZSTD_COMPRESS_LEVEL, ratio
+
+def write_tar_archive(output_path, path_folder, threads=None, level=None, files=None, codec="gzip"):
+    """
+    Escribe una carpeta en un tar comprimido con el codec indicado.
+
+    Args:
+        output_path (str): Ruta del archivo a crear
+        path_folder (str): Ruta de la carpeta a comprimir (se guarda con su nombre como raíz)
+        threads (int, optional): Hilos de compresión (por defecto, uno por CPU)
+        level (int, optional): Nivel de compresión (por defecto, el del codec)
+        files (list of tuple, optional): Si se indica, sólo se guardan estos archivos, como pares (ruta, nombre
+            dentro del tar), después de la entrada de la carpeta raíz
+        codec (str): 'gzip', 'zstd', 'lz4' o 'none'
+    """
+    with open_compressed_writer(output_path, codec, level, threads) as compressed_writer:
+        with tarfile.open(fileobj=compressed_writer, mode="w|") as tar:
+            if files is None:
+                tar.add(path_folder, arcname=os.path.basename(path_folder))
+            else:
+                tar.add(path_folder, arcname=os.path.basename(path_folder), recursive=False)
+                for file_path, arcname in files:
+                    tar.add(file_path, arcname=arcname)
+
+def compress_to_tar_gz(filename, path_folder, threads=None, files=None, codec="gzip", level=None):
     """
     Comprime una carpeta en un archivo tar.gz y lo guarda en la carpeta padre de la carpeta comprimida.
+    El archivo se escribe primero con extensión .partial y se renombra al terminar; si la escritura falla
+    o se interrumpe, el .partial se elimina, por lo que nunca queda un archivo incompleto.
 
     Args:
-        filename (str): Nombre del archivo .tar.gz de salida
+        filename (str): Nombre del archivo .tar.gz de salida (con otro codec se usa su extensión, p. ej. .tar.zst)
         path_folder (str): Ruta de la carpeta a comprimir
+        threads (int, optional): Hilos de compresión (por defecto, uno por CPU)
+        files (list of tuple, optional): Subconjunto de archivos a guardar, como pares (ruta, nombre dentro del tar)
+        codec (str): 'gzip', 'zstd', 'lz4', 'none' o 'auto' (ver choose_codec)
+        level (int, optional): Nivel de compresión (por defecto, el del codec; no se admite con 'auto')
+
+    Returns:
+        str: Ruta del archivo creado, o None si no se pudo comprimir.
+
+    Raises:
+        ValueError: Si el nivel no es válido para el codec (ver validate_codec_level).
     """
-    logging.info(f"Compressing {filename}...")
+    validate_codec_level(codec, level)
+    if codec == "auto":
+        codec, level, _ = choose_codec(path_folder)
 
-    if not filename.endswith(".tar.gz"):
-        filename += ".tar.gz"
+    extension = ARCHIVE_EXTENSIONS[codec]
+    if not filename.endswith(extension):
+        filename = (filename[:-len(".tar.gz")] if filename.endswith(".tar.gz") else filename) + extension
+
+    logging.info(f"Compressing {filename}...")
 
     output_path = os.path.join(os.path.dirname(path_folder), filename)
+    partial_path = f"{output_path}.partial"
 
     no_space_message_shown = False
 
     while True:
         try:
-            with tarfile.open(output_path, "w:gz") as tar:
-                tar.add(path_folder, arcname=os.path.basename(path_folder))
+            try:
+                write_tar_archive(partial_path, path_folder, threads, level, files, codec)
+                os.replace(partial_path, output_path)
+            except BaseException:
+                # También libera el espacio ocupado antes de reintentar por falta de espacio
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+                raise
             logging.info(f"{filename} has been compressed!")
-            break
+            return output_path
         
         except OSError as ose:
             if ose.errno == errno.ENOSPC:
@@ -58,64 +324,63 @@ def compress_to_tar_gz(filename, path_folder):
         
         time.sleep(5)
 
-def split_targz_folder(source_folder, targz_basename, max_size_gb, max_images):
+def split_targz_folder(source_folder, targz_basename, max_size_gb, max_images, threads=None, move_files=False, dry_run=False, codec="gzip", level=None):
     """
     Divide una carpeta en subpartes menores a un tamaño en GB y opcionalmente a un número máximo de archivos,
     manteniendo los archivos relacionados en las mismas subcarpetas.
 
+    Por defecto las partes son virtuales: cada tar.gz se escribe directamente desde las rutas originales,
+    con la misma estructura (<carpeta>/<archivo>) que tendría al comprimir una carpeta por parte, sin
+    mover ni modificar nada en source_folder. También con una sola parte se guardan sólo los archivos del
+    plan (los de primer nivel, ver build_file_groups), por lo que el plan coincide con lo que se escribe.
+
     Args:
         source_folder (str): Ruta de la carpeta fuente a dividir.
         targz_basename (str): Nombre base de cada tar.gz a crear.
         max_size_gb (int): Tamaño máximo en GB para cada subparte.
         max_images (int, optional): Número máximo de imágenes en cada tar.gz. Default es None, lo que significa sin límite.
-    """
-    max_size = float(max_size_gb) * (2**30)
-    part = 1
-    total_size = sum(os.path.getsize(os.path.join(source_folder, f)) for f in os.listdir(source_folder) if os.path.isfile(os.path.join(source_folder, f)))
-    
-    max_images = None if not max_images else int(max_images)
-    
-    parts_by_size = -(-total_size // max_size)
-    parts_by_images = -(-len(os.listdir(source_folder)) // (max_images * 2)) if max_images else parts_by_size
-    
-    total_parts = int(max(parts_by_size, parts_by_images))
-    
-    
-    if total_parts == 1:
-        compress_to_tar_gz(f"{targz_basename}.tar.gz", source_folder)
-        return
-    elif total_parts == 0:
-        return
-    
+        threads (int, optional): Hilos de compresión (por defecto, uno por CPU).
+        move_files (bool): Modo anterior: mueve los archivos de cada parte a una carpeta temporal
+            <base>-part_i_of_N/<carpeta>, la comprime y devuelve los archivos a source_folder.
+        dry_run (bool): Sólo calcula el plan, sin escribir ni mover nada.
+        codec (str): 'gzip', 'zstd', 'lz4', 'none' o 'auto' (elegido una vez para toda la carpeta, ver choose_codec).
+        level (int, optional): Nivel de compresión (por defecto, el del codec).
 
-    current_folder_size = 0
-    current_file_count = 0
-    logging.info(f"Max size {max_size_gb} GB and image limit {max_images}, split into {total_parts} parts.")
+    Returns:
+        dict: Plan de la división (ver build_archive_plan), con los mismos nombres y cantidades que se escriben,
+        y 'failed': nombres de los archivos que no se pudieron comprimir.
+    """
+    plan = build_archive_plan(source_folder, targz_basename, max_size_gb, max_images, codec, level)
+    parts, codec, level = plan["parts"], plan["codec"], plan["level"]
+    plan["failed"] = []
+    if dry_run or not parts:
+        return plan
 
-    for file_name in sorted(os.listdir(source_folder)):
-        file_path = os.path.join(source_folder, file_name)
-        if os.path.isfile(file_path):
-            related_files = get_related_files(file_name, os.listdir(source_folder))
-            total_related_size = sum(os.path.getsize(os.path.join(source_folder, f)) for f in related_files)
+    if len(parts) == 1:
+        # Sólo los archivos del plan (los de primer nivel), igual que en las partes virtuales
+        if compress_to_tar_gz(parts[0]["archive"], source_folder, threads, get_part_files(source_folder, parts[0]), codec, level) is None:
+            plan["failed"].append(parts[0]["archive"])
+        return plan
 
-            if (current_folder_size + total_related_size > max_size or (max_images is not None and current_file_count + len(related_files) > max_images * 2)):
-                part += 1
-                current_folder_size = 0
-                current_file_count = 0
+    logging.info(f"Max size {max_size_gb} GB and image limit {max_images}, split into {len(parts)} parts.")
 
-            dest_folder = os.path.join(os.path.dirname(source_folder), f"{targz_basename}-part_{part}_of_{total_parts}", os.path.basename(source_folder))
-            os.makedirs(dest_folder, exist_ok=True)
+    if not move_files:
+        for part in parts:
+            if compress_to_tar_gz(part["archive"], source_folder, threads, get_part_files(source_folder, part), codec, level) is None:
+                plan["failed"].append(part["archive"])
+        return plan
 
-            for related_file in related_files:
-                shutil.move(os.path.join(source_folder, related_file), os.path.join(dest_folder, related_file))
+    for part in parts:
+        dest_folder = os.path.join(os.path.dirname(source_folder), part["archive"][:-len(ARCHIVE_EXTENSIONS[codec])], os.path.basename(source_folder))
+        os.makedirs(dest_folder, exist_ok=True)
 
-            current_folder_size += total_related_size
-            current_file_count += len(related_files)
+        for file_name in part["file_names"]:
+            shutil.move(os.path.join(source_folder, file_name), os.path.join(dest_folder, file_name))
     
-    for i in range(1, part + 1):
-        folder_to_compress = os.path.join(os.path.dirname(source_folder), f"{targz_basename}-part_{i}_of_{total_parts}", os.path.basename(source_folder))
-        tar_filename = os.path.join(os.path.dirname(source_folder), f"{targz_basename}-part_{i}_of_{part}.tar.gz")
-        compress_to_tar_gz(tar_filename, folder_to_compress)
+    for part in parts:
+        folder_to_compress = os.path.join(os.path.dirname(source_folder), part["archive"][:-len(ARCHIVE_EXTENSIONS[codec])], os.path.basename(source_folder))
+        if compress_to_tar_gz(os.path.abspath(os.path.join(os.path.dirname(source_folder), part["archive"])), folder_to_compress, threads, codec=codec, level=level) is None:
+            plan["failed"].append(part["archive"])
 
         for file_name in os.listdir(folder_to_compress):
             file_path = os.path.join(folder_to_compress, file_name)
@@ -123,44 +388,196 @@ def split_targz_folder(source_folder, targz_basename, max_size_gb, max_images):
                 shutil.move(file_path, os.path.join(source_folder, file_name))
         
         shutil.rmtree(os.path.dirname(folder_to_compress))
+    return plan
 
-def get_related_files(main_file, all_files_in_directory):
+def get_part_files(source_folder, part):
+    """Archivos de una parte del plan como pares (ruta, nombre dentro del tar), con la forma <carpeta>/<archivo>."""
+    folder_name = os.path.basename(source_folder)
+    return [(os.path.join(source_folder, file_name), f"{folder_name}/{file_name}") for file_name in part["file_names"]]
+
+def build_archive_plan(source_folder, targz_basename, max_size_gb, max_images, codec="gzip", level=None):
     """
-    Encuentra y devuelve una lista de archivos relacionados con un archivo principal dado en un directorio.
+    Calcula cómo se divide una carpeta: qué archivos van en cada tar.gz y con qué nombre. Los nombres usan
+    la cantidad real de partes del plan (<base>-part_i_of_N.tar.gz, o <base>.tar.gz si es una sola) y la
+    extensión del codec (.tar.gz, .tar.zst, .tar.lz4 o .tar).
 
     Args:
-        main_file (str): El nombre del archivo principal para el cual buscar archivos relacionados.
-        all_files_in_directory (list of str): Una lista de nombres de archivos presentes en el directorio.
+        source_folder (str): Ruta de la carpeta fuente a dividir.
+        targz_basename (str): Nombre base de cada tar.gz a crear.
+        max_size_gb (float): Tamaño máximo en GB para cada parte.
+        max_images (int, optional): Número máximo de imágenes por parte (cada imagen cuenta como 2 archivos).
+        codec (str): Codec de compresión; 'auto' se resuelve aquí con choose_codec.
+        level (int, optional): Nivel de compresión (por defecto, el del codec; no se admite con 'auto').
 
     Returns:
-        list of str: Una lista que contiene el archivo principal y todos los archivos relacionados encontrados en el directorio.
+        dict: 'source_folder', 'codec', 'level', 'sample_ratio' (relación de compresión de la muestra, sólo
+        con 'auto'), 'max_size_bytes', 'max_files' y 'parts': lista con 'archive', 'files', 'size_bytes' y
+        'file_names' (ordenados) de cada parte.
     """
+    validate_codec_level(codec, level)
+    sample_ratio = None
+    if codec == "auto":
+        codec, level, sample_ratio = choose_codec(source_folder)
+        logging.info(f"Codec {codec} (level {level or 'default'}), sample compression ratio {sample_ratio:.3f}")
+    extension = ARCHIVE_EXTENSIONS[codec]
 
-    prefix_pattern = re.compile(r'(.+?-origin).*')
-    match = prefix_pattern.match(main_file)
-    
-    if not match:
-        return [main_file]
-    
-    prefix = match.group(1)
-    related_files = [file for file in all_files_in_directory if file.startswith(prefix)]
-    return related_files
+    max_size = float(max_size_gb) * (2**30)
+    max_files = int(max_images) * 2 if max_images else None
+
+    parts = []
+    for part_groups in plan_parts(build_file_groups(source_folder), max_size, max_files):
+        file_names = sorted(file_name for group_files, _ in part_groups for file_name in group_files)
+        parts.append({"files": len(file_names), "size_bytes": sum(group_size for _, group_size in part_groups), "file_names": file_names})
+
+    # Orden estable de las partes: por su primer archivo
+    parts.sort(key=lambda part: part["file_names"][0])
+    for i, part in enumerate(parts, start=1):
+        part["archive"] = f"{targz_basename}{extension}" if len(parts) == 1 else f"{targz_basename}-part_{i}_of_{len(parts)}{extension}"
+
+    return {
+        "source_folder": source_folder,
+        "codec": codec,
+        "level": level,
+        "sample_ratio": sample_ratio,
+        "max_size_bytes": int(max_size),
+        "max_files": max_files,
+        "parts": [{key: part[key] for key in ("archive", "files", "size_bytes", "file_names")} for part in parts],
+    }
+
+def plan_parts(file_groups, max_size, max_files=None):
+    """
+    Reparte los grupos de archivos relacionados en la menor cantidad de partes que respeta ambos límites
+    (first-fit decreasing) y luego equilibra esa cantidad de partes asignando cada grupo, de mayor a menor,
+    a la parte menos cargada donde entra. Si el equilibrado no logra ubicar todos los grupos, se usa el
+    reparto first-fit. Un grupo que por sí solo supera un límite va en una parte propia.
+
+    Args:
+        file_groups (list of tuple): Grupos devueltos por build_file_groups.
+        max_size (float): Tamaño máximo en bytes de cada parte.
+        max_files (int, optional): Número máximo de archivos por parte, o None si no hay límite.
+
+    Returns:
+        list of list of tuple: Grupos de cada parte.
+    """
+    max_files = max_files or float("inf")
+    groups = sorted(file_groups, key=lambda group: (-group[1], -len(group[0]), group[0][0]))
+
+    def fits(part, group):
+        return part[1] + group[1] <= max_size and part[2] + len(group[0]) <= max_files
+
+    def add(part, group):
+        part[0].append(group)
+        part[1] += group[1]
+        part[2] += len(group[0])
+
+    # First-fit decreasing: cantidad de partes
+    first_fit = []
+    for group in groups:
+        part = next((part for part in first_fit if fits(part, group)), None)
+        if part is None:
+            part = [[], 0, 0]
+            first_fit.append(part)
+        add(part, group)
+
+    # Equilibrado con la misma cantidad de partes (carga: el mayor de ambos límites usados; desempate: la suma)
+    balanced = [[[], 0, 0] for _ in first_fit]
+    for group in groups:
+        candidates = [part for part in balanced if fits(part, group) or not part[0]]
+        if not candidates:
+            return [part[0] for part in first_fit]
+        add(min(candidates, key=lambda part: (max(part[1] / max_size, part[2] / max_files), part[1] / max_size + part[2] / max_files)), group)
+
+    return [part[0] for part in balanced]
+
+def get_group_key(file_name):
+    """
+    Devuelve la clave del grupo de archivos relacionados de un archivo: el prefijo hasta el primer
+    "-origin", o el propio nombre si no lo tiene.
+    """
+    match = FILE_GROUP_PATTERN.match(file_name)
+    return match.group(1) if match else file_name
 
-def process_folder(root_path):
+def build_file_groups(source_folder):
+    """
+    Indexa los archivos de una carpeta en grupos de archivos relacionados (mismo prefijo "-origin"),
+    con una única lectura del directorio y el tamaño de cada archivo obtenido una sola vez.
+
+    Args:
+        source_folder (str): Ruta de la carpeta a indexar.
+
+    Returns:
+        list of tuple: (nombres de los archivos del grupo, tamaño total en bytes), en el orden del primer
+        archivo de cada grupo; dentro de cada grupo los nombres están ordenados.
+    """
+    with os.scandir(source_folder) as entries:
+        files = sorted((entry.name, entry.stat().st_size) for entry in entries if entry.is_file())
+
+    groups = {}
+    for file_name, file_size in files:
+        group = groups.setdefault(get_group_key(file_name), [[], 0])
+        group[0].append(file_name)
+        group[1] += file_size
+    return [(group_files, group_size) for group_files, group_size in groups.values()]
+
+def process_folder(root_path, threads=None, move_files=False, dry_run=False, codec="gzip", level=None):
     """
     Recorre todas las subcarpetas en busca de una carpeta '1_real' y, si la encuentra,
     aplica el proceso de división y compresión especificado.
+
+    Args:
+        root_path (str): Ruta principal a recorrer.
+        threads (int, optional): Hilos de compresión (por defecto, uno por CPU).
+        move_files (bool): Divide moviendo los archivos a carpetas temporales (modo anterior) en lugar de partes virtuales.
+        dry_run (bool): Sólo calcula los planes de división, sin comprimir.
+        codec (str): 'gzip', 'zstd', 'lz4', 'none' o 'auto' (elegido por carpeta).
+        level (int, optional): Nivel de compresión (por defecto, el del codec).
+
+    Returns:
+        list of dict: Plan de cada carpeta procesada (ver build_archive_plan).
     """
+    plans = []
     for subdir, dirs, files in os.walk(root_path):
         if '1_real' in dirs:
             full_path = os.path.join(subdir, '1_real')
             logging.info(f"Procesando: {full_path}")
             
             targz_basename = os.path.basename(os.path.dirname(full_path))
-            split_targz_folder(full_path, targz_basename, 1, 20000)
+            plan = split_targz_folder(full_path, targz_basename, 1, 20000, threads, move_files, dry_run, codec, level)
+            for part in plan["parts"]:
+                logging.info(f"{part['archive']}: {part['files']} files, {part['size_bytes'] / 2**30:.2f} GB")
+            plans.append(plan)
             logging.info("-------")
+    return plans
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 compress_pending_folders.py /ruta/principal --threads 8
+    # python3 compress_pending_folders.py /ruta/principal --dry-run --plan-output plan.json
+    # python3 compress_pending_folders.py /ruta/principal --codec auto
+    parser = ArgumentParser(description="Comprime las carpetas 1_real pendientes, dividiéndolas en partes si es necesario.")
+    parser.add_argument("root_path", help="Ruta principal a recorrer")
+    parser.add_argument("--threads", type=int, default=None, help="Hilos de compresión (por defecto, uno por CPU)")
+    parser.add_argument("--move-files", action="store_true", help="Mover los archivos a carpetas por parte antes de comprimir (modo anterior)")
+    parser.add_argument("--codec", choices=CODECS, default="gzip", help="Compresión: gzip, zstd, lz4, none (tar sin comprimir) o auto (según una muestra de cada carpeta)")
+    parser.add_argument("--level", type=int, default=None, help="Nivel de compresión (por defecto, el del codec): gzip 1-9, zstd 1-22, lz4 0-16; no se admite con none ni auto")
+    parser.add_argument("--dry-run", action="store_true", help="Sólo calcular y mostrar el plan de división, sin comprimir")
+    parser.add_argument("--plan-output", default=None, help="Archivo JSON donde guardar el plan de división")
+    args = parser.parse_args()
+    try:
+        validate_codec_level(args.codec, args.level)
+    except ValueError as e:
+        parser.error(str(e))
 
+    plans = process_folder(args.root_path, args.threads, args.move_files, args.dry_run, args.codec, args.level)
+    if args.plan_output:
+        with open(args.plan_output, "w", encoding="utf-8") as plan_file:
+            json.dump(plans, plan_file, indent=2, ensure_ascii=False)
+    elif args.dry_run:
+        print(json.dumps(plans, indent=2, ensure_ascii=False))
 
-root_path = ""
-process_folder(root_path)
-logging.info("Final de la ejecución.")
+    failed = [archive for plan in plans for archive in plan["failed"]]
+    if failed:
+        logging.error(f"No se pudieron comprimir {len(failed)} archivos: {', '.join(failed)}")
+        sys.exit(1)
+    logging.info("Final de la ejecución.")
@@ -1,7 +1,14 @@
+import json
 import logging
+import multiprocessing
 import os
+import queue
 import shutil
+import sqlite3
 from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import lru_cache, partial
 import cv2
 import dlib
 import math
@@ -9,7 +16,8 @@ import mediapipe as mp
 import numpy as np
 from mediapipe.tasks import python
 from mediapipe.tasks.python import vision
-from utils import setup_logging, download_json
+from PIL import Image
+from utils import BackgroundJsonlWriter, download_json, read_jsonl_records, setup_logging
 
 # Actualmente el Roll no es importante para la posición de rostro que se pretende evitar 
 HIGH_ROLL_THRESHOLD = 100000
@@ -24,6 +32,55 @@ LOW_ROLL_THRESHOLD = 100000
 LOW_YAW_THRESHOLD = 12
 LOW_PITCH_THRESHOLD = 19
 
+# Modelo 3D de referencia usado en la estimación de pose
+FACE_MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),             # Punta de la nariz
+    (0.0, -330.0, -65.0),        # Barbilla
+    (-165.0, 170.0, -135.0),     # Esquina izquierda del ojo izquierdo
+    (165.0, 170.0, -135.0),      # Esquina derecha del ojo derecho
+    (-150.0, -150.0, -125.0),    # Esquina izquierda de la boca
+    (150.0, -150.0, -125.0)      # Esquina derecha de la boca
+])
+
+# Índices de los landmarks (ojo izq, ojo der, nariz, boca izq, boca der, barbilla) en el orden de FACE_MODEL_POINTS
+FACE_MODEL_LANDMARK_ORDER = [2, 5, 0, 1, 3, 4]
+
+# get_face_angles_batch vuelve a resolver con cv2.solvePnP los rostros cuyo último paso de Levenberg-Marquardt
+# supera esta tolerancia (sin converger) o cuyo error de reproyección RMS supera estos píxeles
+BATCH_POSE_CONVERGENCE_TOLERANCE = 1e-6
+BATCH_POSE_MAX_REPROJECTION_ERROR = 10.0
+
+MEDIAPIPE_RUNNING_MODES = {
+    "image": vision.RunningMode.IMAGE,
+    "video": vision.RunningMode.VIDEO,
+    "live_stream": vision.RunningMode.LIVE_STREAM,
+}
+
+# Flags de cv2.imread que decodifican en escala de grises a 1/N del tamaño original
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Lado mínimo, en píxeles, del rostro más chico en la imagen usada para los landmarks cuando la detección es reducida
+LANDMARK_MIN_FACE_SIZE = 200
+
+IMAGE_EXTENSIONS = (".avif", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".flv", ".wmv")
+
+# Modelos de dlib ya cargados, indexados por ruta del shape predictor
+_dlib_models_cache = {}
+
+# FaceLandmarkers de MediaPipe en modo imagen, indexados por ruta del modelo
+_mediapipe_landmarkers_cache = {}
+
+# Configuración de los procesos del pool, asignada por init_worker
+_worker_detection_method = None
+_worker_model_path = None
+_worker_max_detection_size = None
+
 
 def crop_face(image, face):
     """
@@ -65,7 +122,7 @@ def classify_face_level(yaw_angle, pitch_angle):
         return ""
 
 
-def get_face_angles(frame, landmarks):
+def get_face_angles(frame, landmarks, image_size=None):
     """
     Calcula los ángulos de rotación, inclinación y giro (roll, pitch y yaw) de un rostro en un fotograma dado, 
     basado en puntos de referencia faciales.
@@ -73,13 +130,15 @@ def get_face_angles(frame, landmarks):
     Args:
         frame (numpy.ndarray): El fotograma de la imagen que contiene el rostro, representado como un array 3D (alto, ancho, canales de color).
         landmarks (list o numpy.ndarray): Una lista o array de 12 elementos que representa 6 puntos de referencia facial.
+        image_size (tuple, optional): Alto y ancho de la imagen. Si se indica, se usa en lugar de frame.shape
+            y frame puede ser None.
 
     Returns:
         roll (int): El ángulo de rotación del rostro.
         pitch (int): El ángulo de inclinación del rostro.
         yaw (int): El ángulo de giro del rostro.
     """
-    size = frame.shape
+    size = image_size if image_size is not None else frame.shape
 
     image_points = np.array([
         (landmarks[4], landmarks[5]),     # Punta de la nariz
@@ -90,15 +149,6 @@ def get_face_angles(frame, landmarks):
         (landmarks[8], landmarks[9])      # Esquina derecha de la boca
     ], dtype="double")
 
-    model_points = np.array([
-        (0.0, 0.0, 0.0),             # Punta de la nariz
-        (0.0, -330.0, -65.0),        # Barbilla
-        (-165.0, 170.0, -135.0),     # Esquina izquierda del ojo izquierdo
-        (165.0, 170.0, -135.0),      # Esquina derecha del ojo derecho
-        (-150.0, -150.0, -125.0),    # Esquina izquierda de la boca
-        (150.0, -150.0, -125.0)      # Esquina derecha de la boca
-    ])
- 
     center = (size[1]/2, size[0]/2)
     focal_length = center[0] / np.tan(60/2 * np.pi / 180)
     camera_matrix = np.array(
@@ -108,13 +158,8 @@ def get_face_angles(frame, landmarks):
                          )
 
     dist_coeffs = np.zeros((4,1))
-    (success, rotation_vector, translation_vector) = cv2.solvePnP(model_points, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_ITERATIVE)
+    (success, rotation_vector, translation_vector) = cv2.solvePnP(FACE_MODEL_POINTS, image_points, camera_matrix, dist_coeffs, flags=cv2.SOLVEPNP_ITERATIVE)
 
-    
-    axis = np.float32([[500,0,0], 
-                          [0,500,0], 
-                          [0,0,500]])
-                          
     rvec_matrix = cv2.Rodrigues(rotation_vector)[0]
 
     proj_matrix = np.hstack((rvec_matrix, translation_vector))
@@ -130,7 +175,328 @@ def get_face_angles(frame, landmarks):
     return roll, pitch, yaw
 
 
-def detect_frontal_face_dlib(image_path, model_path):
+@lru_cache(maxsize=None)
+def get_camera_intrinsics(height, width):
+    """
+    Calcula los parámetros de la cámara (distancia focal y centro óptico) para un tamaño de imagen,
+    con el mismo criterio que get_face_angles. El resultado se cachea por tamaño.
+
+    Args:
+        height (int): Alto de la imagen.
+        width (int): Ancho de la imagen.
+
+    Returns:
+        tuple: Distancia focal, centro x y centro y.
+    """
+    center_x, center_y = width / 2, height / 2
+    focal_length = center_x / np.tan(60/2 * np.pi / 180)
+    return focal_length, center_x, center_y
+
+
+def _skew_matrices(vectors):
+    """Devuelve las matrices antisimétricas (producto vectorial) de un array (..., 3)."""
+    skew = np.zeros(vectors.shape[:-1] + (3, 3))
+    skew[..., 0, 1], skew[..., 0, 2] = -vectors[..., 2], vectors[..., 1]
+    skew[..., 1, 0], skew[..., 1, 2] = vectors[..., 2], -vectors[..., 0]
+    skew[..., 2, 0], skew[..., 2, 1] = -vectors[..., 1], vectors[..., 0]
+    return skew
+
+
+def _rotations_from_vectors(rotation_vectors):
+    """Fórmula de Rodrigues vectorizada: (N, 3) vectores de rotación -> (N, 3, 3) matrices."""
+    theta = np.linalg.norm(rotation_vectors, axis=-1)[:, None, None]
+    skew = _skew_matrices(rotation_vectors / np.maximum(theta[:, 0], np.finfo(float).tiny))
+    return np.eye(3) + np.sin(theta) * skew + (1 - np.cos(theta)) * skew @ skew
+
+
+def _initial_poses_dlt(normalized_points):
+    """
+    Estimación inicial de la pose por DLT, igual que la usada por cv2.solvePnP (SOLVEPNP_ITERATIVE)
+    para puntos no coplanares.
+    """
+    count = normalized_points.shape[0]
+    homogeneous_model = np.hstack((FACE_MODEL_POINTS, np.ones((6, 1))))
+
+    system = np.zeros((count, 12, 12))
+    system[:, 0::2, 0:4] = homogeneous_model
+    system[:, 1::2, 4:8] = homogeneous_model
+    system[:, 0::2, 8:12] = -normalized_points[..., 0:1] * homogeneous_model
+    system[:, 1::2, 8:12] = -normalized_points[..., 1:2] * homogeneous_model
+
+    projections = np.linalg.eigh(system.transpose(0, 2, 1) @ system)[1][:, :, 0].reshape(count, 3, 4)
+    projections *= np.where(np.linalg.det(projections[:, :, :3]) < 0, -1.0, 1.0)[:, None, None]
+
+    u, _, vt = np.linalg.svd(projections[:, :, :3])
+    rotations = u @ vt
+    translations = projections[:, :, 3] * (np.sqrt(3) / np.linalg.norm(projections[:, :, :3], axis=(1, 2)))[:, None]
+    return rotations, translations
+
+
+def _reprojection_residuals(rotations, translations, normalized_points):
+    """Residuos de reproyección (N, 12) y su jacobiano (N, 12, 6) respecto de la rotación y la traslación."""
+    count = rotations.shape[0]
+    rotated_points = FACE_MODEL_POINTS @ rotations.transpose(0, 2, 1)
+    camera_points = rotated_points + translations[:, None, :]
+    x, y, z = camera_points[..., 0], camera_points[..., 1], camera_points[..., 2]
+
+    residuals = np.stack((x / z, y / z), axis=-1) - normalized_points
+
+    projection_jacobian = np.zeros((count, 6, 2, 3))
+    projection_jacobian[..., 0, 0] = projection_jacobian[..., 1, 1] = 1 / z
+    projection_jacobian[..., 0, 2] = -x / z ** 2
+    projection_jacobian[..., 1, 2] = -y / z ** 2
+    jacobian = np.concatenate((projection_jacobian @ -_skew_matrices(rotated_points), projection_jacobian), axis=-1)
+
+    return residuals.reshape(count, 12), jacobian.reshape(count, 12, 6)
+
+
+def solve_pnp_batch(normalized_points, iterations=20):
+    """
+    Resuelve la pose de N rostros a la vez: inicialización por DLT y refinamiento Levenberg-Marquardt
+    vectorizado sobre el error de reproyección, como cv2.solvePnP con SOLVEPNP_ITERATIVE.
+
+    Args:
+        normalized_points (numpy.ndarray): Array (N, 6, 2) con los puntos de FACE_MODEL_POINTS en
+            coordenadas normalizadas de cámara ((u - cx) / f, (v - cy) / f).
+        iterations (int): Cantidad de iteraciones de Levenberg-Marquardt.
+
+    Returns:
+        rotations (numpy.ndarray): Array (N, 3, 3) con las matrices de rotación.
+        translations (numpy.ndarray): Array (N, 3) con los vectores de traslación.
+        residuals (numpy.ndarray): Array (N, 12) con los residuos de reproyección finales.
+        converged (numpy.ndarray): Array booleano; False en los rostros cuyo último paso aceptado
+            todavía era mayor que BATCH_POSE_CONVERGENCE_TOLERANCE.
+    """
+    rotations, translations = _initial_poses_dlt(normalized_points)
+    damping = np.full(normalized_points.shape[0], 1e-3)
+    last_step = np.full(normalized_points.shape[0], np.inf)
+
+    residuals, jacobian = _reprojection_residuals(rotations, translations, normalized_points)
+
+    for _ in range(iterations):
+        jacobian_t = jacobian.transpose(0, 2, 1)
+        jtj = jacobian_t @ jacobian
+        jtr = jacobian_t @ residuals[..., None]
+        update = -np.linalg.solve(jtj + damping[:, None, None] * jtj * np.eye(6), jtr)[..., 0]
+
+        new_rotations = _rotations_from_vectors(update[:, :3]) @ rotations
+        new_translations = translations + update[:, 3:]
+        new_residuals, new_jacobian = _reprojection_residuals(new_rotations, new_translations, normalized_points)
+
+        # Tamaño del paso: ángulo de la rotación (radianes) y desplazamiento relativo a la traslación
+        step = np.sqrt((update[:, :3] ** 2).sum(axis=1) + (update[:, 3:] ** 2).sum(axis=1) / (translations ** 2).sum(axis=1))
+
+        improved = (new_residuals ** 2).sum(axis=1) < (residuals ** 2).sum(axis=1)
+        rotations = np.where(improved[:, None, None], new_rotations, rotations)
+        translations = np.where(improved[:, None], new_translations, translations)
+        residuals = np.where(improved[:, None], new_residuals, residuals)
+        jacobian = np.where(improved[:, None, None], new_jacobian, jacobian)
+        last_step = np.where(improved, step, last_step)
+        damping = np.clip(np.where(improved, damping / 10, damping * 10), 1e-16, 1e16)
+
+    return rotations, translations, residuals, last_step <= BATCH_POSE_CONVERGENCE_TOLERANCE
+
+
+def _euler_angles_batch(rotations):
+    """
+    Ángulos de Euler en grados de N matrices de rotación, replicando cv2.RQDecomp3x3
+    (usada por cv2.decomposeProjectionMatrix), incluida la resolución de su ambigüedad.
+    """
+    count = rotations.shape[0]
+    epsilon = np.finfo(float).eps
+
+    norm = np.sqrt(rotations[:, 2, 1] ** 2 + rotations[:, 2, 2] ** 2 + epsilon)
+    cos, sin = rotations[:, 2, 2] / norm, rotations[:, 2, 1] / norm
+    rotation_x = np.zeros((count, 3, 3))
+    rotation_x[:, 0, 0] = 1
+    rotation_x[:, 1, 1] = rotation_x[:, 2, 2] = cos
+    rotation_x[:, 1, 2], rotation_x[:, 2, 1] = sin, -sin
+    upper = rotations @ rotation_x
+
+    norm = np.sqrt(upper[:, 2, 0] ** 2 + upper[:, 2, 2] ** 2 + epsilon)
+    cos, sin = upper[:, 2, 2] / norm, -upper[:, 2, 0] / norm
+    rotation_y = np.zeros((count, 3, 3))
+    rotation_y[:, 1, 1] = 1
+    rotation_y[:, 0, 0] = rotation_y[:, 2, 2] = cos
+    rotation_y[:, 0, 2], rotation_y[:, 2, 0] = -sin, sin
+    upper = upper @ rotation_y
+
+    norm = np.sqrt(upper[:, 1, 0] ** 2 + upper[:, 1, 1] ** 2 + epsilon)
+    cos, sin = upper[:, 1, 1] / norm, upper[:, 1, 0] / norm
+    rotation_z = np.zeros((count, 3, 3))
+    rotation_z[:, 2, 2] = 1
+    rotation_z[:, 0, 0] = rotation_z[:, 1, 1] = cos
+    rotation_z[:, 0, 1], rotation_z[:, 1, 0] = sin, -sin
+    upper = upper @ rotation_z
+
+    # Las dos primeras entradas de la diagonal deben quedar positivas: se rota 180 grados si es necesario
+    flip_z = (upper[:, 0, 0] < 0) & (upper[:, 1, 1] < 0)
+    flip_y = (upper[:, 0, 0] < 0) & (upper[:, 1, 1] >= 0)
+    flip_x = (upper[:, 0, 0] >= 0) & (upper[:, 1, 1] < 0)
+
+    rotation_z[flip_z, :2, :2] *= -1
+    rotation_z[flip_y | flip_x] = rotation_z[flip_y | flip_x].transpose(0, 2, 1)
+    rotation_y[flip_y] *= np.array([[-1, 1, -1], [1, 1, 1], [-1, 1, -1]])
+    rotation_y[flip_x] = rotation_y[flip_x].transpose(0, 2, 1)
+    rotation_x[flip_x] *= np.array([[1, 1, 1], [1, -1, -1], [1, -1, -1]])
+
+    euler_x = np.degrees(np.arccos(np.clip(rotation_x[:, 1, 1], -1, 1))) * np.where(rotation_x[:, 1, 2] >= 0, 1, -1)
+    euler_y = np.degrees(np.arccos(np.clip(rotation_y[:, 0, 0], -1, 1))) * np.where(rotation_y[:, 2, 0] >= 0, 1, -1)
+    euler_z = np.degrees(np.arccos(np.clip(rotation_z[:, 0, 0], -1, 1))) * np.where(rotation_z[:, 0, 1] >= 0, 1, -1)
+    return euler_x, euler_y, euler_z
+
+
+def get_face_angles_batch(landmarks, image_sizes):
+    """
+    Versión vectorizada de get_face_angles: calcula roll, pitch y yaw de N rostros en una sola llamada.
+    Los rostros en los que el refinamiento no convergió, o cuyo error de reproyección supera
+    BATCH_POSE_MAX_REPROJECTION_ERROR píxeles, se resuelven de nuevo con get_face_angles (cv2.solvePnP);
+    en esos casos cv2.solvePnP y el solver vectorizado pueden terminar en mínimos distintos.
+
+    Args:
+        landmarks (numpy.ndarray): Array (N, 6, 2) con los puntos en el mismo orden que la lista de
+            12 elementos de get_face_angles (ojo izquierdo, ojo derecho, nariz, boca izquierda,
+            boca derecha, barbilla).
+        image_sizes (numpy.ndarray): Array (N, 2) con el alto y ancho de la imagen de cada rostro,
+            o un único (alto, ancho) compartido por todos.
+
+    Returns:
+        roll (numpy.ndarray): Ángulos de rotación de los rostros.
+        pitch (numpy.ndarray): Ángulos de inclinación de los rostros.
+        yaw (numpy.ndarray): Ángulos de giro de los rostros.
+    """
+    landmarks = np.asarray(landmarks, dtype="double").reshape(-1, 6, 2)
+    image_sizes = np.broadcast_to(np.asarray(image_sizes).reshape(-1, 2), (landmarks.shape[0], 2))
+
+    intrinsics = np.array([get_camera_intrinsics(int(height), int(width)) for height, width in image_sizes]).reshape(-1, 3)
+    image_points = landmarks[:, FACE_MODEL_LANDMARK_ORDER]
+    normalized_points = (image_points - intrinsics[:, None, 1:]) / intrinsics[:, None, :1]
+
+    rotations, _, residuals, converged = solve_pnp_batch(normalized_points)
+    euler_x, euler_y, euler_z = _euler_angles_batch(rotations)
+
+    pitch = np.degrees(np.arcsin(np.sin(np.radians(euler_x))))
+    yaw = np.degrees(np.arcsin(np.sin(np.radians(euler_y))))
+    roll = -np.degrees(np.arcsin(np.sin(np.radians(euler_z))))
+
+    reprojection_errors = np.sqrt((residuals ** 2).mean(axis=1)) * intrinsics[:, 0]
+    accepted = converged & (reprojection_errors <= BATCH_POSE_MAX_REPROJECTION_ERROR) & np.isfinite(roll + pitch + yaw)
+    for index in np.flatnonzero(~accepted):
+        roll[index], pitch[index], yaw[index] = get_face_angles(None, landmarks[index].ravel(), tuple(image_sizes[index]))
+
+    return roll, pitch, yaw
+
+
+def is_frontal_batch(roll_angles, pitch_angles, yaw_angles):
+    """
+    Versión vectorizada del criterio de rostro frontal (umbrales LOW).
+
+    Args:
+        roll_angles (numpy.ndarray): Ángulos roll de los rostros.
+        pitch_angles (numpy.ndarray): Ángulos pitch de los rostros.
+        yaw_angles (numpy.ndarray): Ángulos yaw de los rostros.
+
+    Returns:
+        numpy.ndarray: Array booleano que indica qué rostros son frontales.
+    """
+    return (np.abs(roll_angles) < LOW_ROLL_THRESHOLD) & (np.abs(pitch_angles) < LOW_PITCH_THRESHOLD) & (np.abs(yaw_angles) < LOW_YAW_THRESHOLD)
+
+
+def classify_face_levels(yaw_angles, pitch_angles):
+    """
+    Versión vectorizada de classify_face_level.
+
+    Args:
+        yaw_angles (numpy.ndarray): Ángulos yaw de los rostros.
+        pitch_angles (numpy.ndarray): Ángulos pitch de los rostros.
+
+    Returns:
+        numpy.ndarray: Nivel de rigurosidad de cada rostro ("high", "medium", "low" o "").
+    """
+    yaw_angles = np.abs(yaw_angles)
+    pitch_angles = np.abs(pitch_angles)
+
+    conditions = [
+        (yaw_angles <= HIGH_YAW_THRESHOLD) & (pitch_angles <= HIGH_PITCH_THRESHOLD),
+        (yaw_angles <= MEDIUM_YAW_THRESHOLD) & (pitch_angles <= MEDIUM_PITCH_THRESHOLD),
+        (yaw_angles <= LOW_YAW_THRESHOLD) & (pitch_angles <= LOW_PITCH_THRESHOLD),
+    ]
+    return np.select(conditions, ["high", "medium", "low"], default="")
+
+
+def load_dlib_models(model_path):
+    """
+    Devuelve el detector de rostros y el predictor de landmarks de dlib para un modelo dado.
+    Los modelos se cargan una única vez por proceso y se reutilizan en las siguientes llamadas.
+
+    Args:
+        model_path (str): Ruta al modelo de dlib.
+
+    Returns:
+        face_detector (dlib.fhog_object_detector): Detector de rostros frontales.
+        landmark_predictor (dlib.shape_predictor): Predictor de los 68 landmarks faciales.
+    """
+    models = _dlib_models_cache.get(model_path)
+
+    if models is None:
+        models = (dlib.get_frontal_face_detector(), dlib.shape_predictor(model_path))
+        _dlib_models_cache[model_path] = models
+
+    return models
+
+
+def detect_faces_downscaled(image_path, face_detector, max_detection_size):
+    """
+    Detecta rostros sobre una versión reducida de la imagen y devuelve las bounding boxes en la
+    resolución usada para los landmarks. Los JPEG se decodifican directamente a escala reducida
+    (escalado DCT de libjpeg) y, si se encontró algún rostro, la imagen para los landmarks se decodifica
+    a la mayor reducción que deja al rostro más chico con al menos LANDMARK_MIN_FACE_SIZE píxeles de lado.
+
+    Args:
+        image_path (str): Ruta a la imagen.
+        face_detector (dlib.fhog_object_detector): Detector de rostros de dlib.
+        max_detection_size (int): Tamaño máximo, en píxeles, del lado mayor de la imagen usada para detectar.
+
+    Returns:
+        detected_faces (list of dlib.rectangle): Bounding boxes en la resolución de grayscale_image.
+        grayscale_image (numpy.ndarray): La imagen en escala de grises para los landmarks, o None si no hay rostros.
+    """
+    with Image.open(image_path) as img:
+        long_edge = max(img.size)
+
+    reduction = next(factor for factor in (8, 4, 2, 1) if factor == 1 or long_edge / factor >= max_detection_size)
+    detection_image = cv2.imread(image_path, REDUCED_GRAYSCALE_FLAGS[reduction])
+    if detection_image is None:
+        raise ValueError(f"No se pudo decodificar la imagen {image_path}")
+
+    detection_long_edge = max(detection_image.shape[:2])
+    if detection_long_edge > max_detection_size:
+        resize_factor = max_detection_size / detection_long_edge
+        detection_image = cv2.resize(detection_image, None, fx=resize_factor, fy=resize_factor, interpolation=cv2.INTER_AREA)
+
+    detected_faces = face_detector(detection_image, 1)
+    if not detected_faces:
+        return [], None
+
+    # Lado del rostro más chico en la resolución original
+    smallest_face = min(min(face.width(), face.height()) for face in detected_faces) * long_edge / max(detection_image.shape[:2])
+    landmark_reduction = next(factor for factor in (8, 4, 2, 1) if factor == 1 or smallest_face / factor >= LANDMARK_MIN_FACE_SIZE)
+
+    if landmark_reduction == reduction and detection_long_edge <= max_detection_size:
+        # La imagen de detección no se redimensionó: sirve también para los landmarks
+        grayscale_image = detection_image
+    else:
+        grayscale_image = cv2.imread(image_path, REDUCED_GRAYSCALE_FLAGS[landmark_reduction])
+    scale = max(grayscale_image.shape[:2]) / max(detection_image.shape[:2])
+
+    landmark_faces = [
+        dlib.rectangle(round(face.left() * scale), round(face.top() * scale), round(face.right() * scale), round(face.bottom() * scale))
+        for face in detected_faces
+    ]
+    return landmark_faces, grayscale_image
+
+
+def detect_frontal_face_dlib(image_path, model_path, max_detection_size=None):
     """
     Detecta si hay al menos un rostro frontal en una imagen usando dlib y estimación de pose.
     Se considera un rostro frontal si los ángulos de rotación (roll, pitch, yaw) están dentro
@@ -139,42 +505,90 @@ def detect_frontal_face_dlib(image_path, model_path):
     Args:
         image_path (str): Ruta a la imagen.
         model_path (str): Ruta al modelo de dlib.
+        max_detection_size (int, optional): Si se indica, la detección se hace sobre la imagen reducida a este
+            tamaño máximo de lado mayor y los landmarks se calculan sobre una decodificación reducida según el tamaño
+            de los rostros (ver detect_faces_downscaled). Default es None (detección en resolución original).
 
     Returns:
         is_frontal (bool): True si se detecta al menos un rostro frontal, False de lo contrario.
         angle_data (dict): Información sobre los ángulos row, pitch y yaw encontrados.
     """
-    is_frontal = False
-    
-    face_detector = dlib.get_frontal_face_detector()
-    landmark_predictor = dlib.shape_predictor(model_path)
+    face_detector, landmark_predictor = load_dlib_models(model_path)
 
-    image = cv2.imread(image_path)
-    grayscale_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if max_detection_size:
+        # El shape predictor sólo lee píxeles dentro de la bounding box, por lo que alcanza con la imagen en grises
+        detected_faces, grayscale_image = detect_faces_downscaled(image_path, face_detector, max_detection_size)
+        image = grayscale_image
+    else:
+        image = cv2.imread(image_path)
+        grayscale_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        detected_faces = face_detector(grayscale_image, 1)
+
+    return analyze_dlib_faces(image, grayscale_image, detected_faces, landmark_predictor)
+
+
+def detect_frontal_face_dlib_frame(frame, model_path):
+    """
+    Igual que detect_frontal_face_dlib, pero sobre un frame BGR ya decodificado.
+
+    Args:
+        frame (numpy.ndarray): Frame BGR.
+        model_path (str): Ruta al modelo de dlib.
+
+    Returns:
+        is_frontal (bool): True si se detecta al menos un rostro frontal, False de lo contrario.
+        angle_data (dict): Información sobre los ángulos row, pitch y yaw encontrados.
+    """
+    face_detector, landmark_predictor = load_dlib_models(model_path)
+
+    grayscale_image = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
     detected_faces = face_detector(grayscale_image, 1)
-    
+
+    return analyze_dlib_faces(frame, grayscale_image, detected_faces, landmark_predictor)
+
+
+def analyze_dlib_faces(image, grayscale_image, detected_faces, landmark_predictor):
+    """
+    Calcula los landmarks y ángulos de los rostros detectados por dlib y define si alguno es frontal.
+
+    Args:
+        image (numpy.ndarray): La imagen analizada (sólo se usan sus dimensiones).
+        grayscale_image (numpy.ndarray): La imagen en escala de grises.
+        detected_faces (list of dlib.rectangle): Bounding boxes de los rostros detectados.
+        landmark_predictor (dlib.shape_predictor): Predictor de landmarks.
+
+    Returns:
+        is_frontal (bool): True si se detecta al menos un rostro frontal, False de lo contrario.
+        angle_data (dict): Información sobre los ángulos row, pitch y yaw encontrados.
+    """
+    is_frontal = False
     roll_angle, pitch_angle, yaw_angle = "Null", "Null", "Null"
 
+    faces_landmarks, face_sizes = [], []
     for face in detected_faces:
         facial_landmarks = landmark_predictor(grayscale_image, face)
         
         if facial_landmarks:
-            landmarks = [
+            faces_landmarks.append([
                 facial_landmarks.part(36).x - face.left(), facial_landmarks.part(36).y - face.top(),  # Ojo izq
                 facial_landmarks.part(45).x - face.left(), facial_landmarks.part(45).y - face.top(),  # Ojo der
                 facial_landmarks.part(30).x - face.left(), facial_landmarks.part(30).y - face.top(),  # Nariz
                 facial_landmarks.part(48).x - face.left(), facial_landmarks.part(48).y - face.top(),  # Boca izq
                 facial_landmarks.part(54).x - face.left(), facial_landmarks.part(54).y - face.top(),  # Boca der
                 facial_landmarks.part(8).x - face.left(), facial_landmarks.part(8).y - face.top()     # Mentón
-            ]
-
-            cropped_face = crop_face(image, face)
+            ])
+            # Sólo se usan las dimensiones del recorte
+            face_sizes.append(crop_face(image, face).shape[:2])
 
-            roll_angle, pitch_angle, yaw_angle = get_face_angles(cropped_face, landmarks)
+    if faces_landmarks:
+        # Pose de todos los rostros en una sola llamada (los que no convergen se resuelven con cv2.solvePnP)
+        roll_angles, pitch_angles, yaw_angles = get_face_angles_batch(faces_landmarks, face_sizes)
+        frontal_faces = is_frontal_batch(roll_angles, pitch_angles, yaw_angles)
 
-            if abs(roll_angle) < LOW_ROLL_THRESHOLD and abs(pitch_angle) < LOW_PITCH_THRESHOLD and abs(yaw_angle) < LOW_YAW_THRESHOLD:
-                is_frontal = True
-                break
+        # Ángulos del primer rostro frontal o, si no hay ninguno, del último rostro
+        index = int(np.argmax(frontal_faces)) if frontal_faces.any() else len(faces_landmarks) - 1
+        is_frontal = bool(frontal_faces[index])
+        roll_angle, pitch_angle, yaw_angle = float(roll_angles[index]), float(pitch_angles[index]), float(yaw_angles[index])
 
     angle_data = {
         "image_info": {
@@ -210,51 +624,111 @@ def detect_frontal_face_dlib(image_path, model_path):
     return is_frontal, angle_data
 
 
-def detect_frontal_face_mediapipe(image_path, model_path):
+def limit_process_threads(num_threads, worker_index=0):
     """
-    Detecta si hay un rostro frontal en la imagen usando MediaPipe y estima los ángulos
-    de rotación (roll, pitch, yaw). Se considera un rostro frontal si los ángulos están
-    dentro de ciertos umbrales.
+    Limita la cantidad de hilos que usa el proceso actual. La API de Python de MediaPipe no expone
+    la cantidad de hilos del intérprete, por lo que además de OpenCV se restringe la afinidad de CPU
+    del proceso a num_threads núcleos, distintos para cada worker del pool.
+
+    Args:
+        num_threads (int): Cantidad de hilos (núcleos) a utilizar.
+        worker_index (int): Índice del worker, usado para repartir los núcleos entre procesos.
+    """
+    cv2.setNumThreads(num_threads)
+
+    if hasattr(os, "sched_setaffinity"):
+        available_cpus = sorted(os.sched_getaffinity(0))
+        first_cpu = (worker_index * num_threads) % len(available_cpus)
+        cpus = {available_cpus[(first_cpu + i) % len(available_cpus)] for i in range(min(num_threads, len(available_cpus)))}
+        os.sched_setaffinity(0, cpus)
+
+
+def to_mediapipe_image(frame):
+    """
+    Convierte un frame BGR de OpenCV en una imagen de MediaPipe.
+
+    Args:
+        frame (numpy.ndarray): Frame BGR.
+
+    Returns:
+        mp.Image: Imagen SRGB de MediaPipe.
+    """
+    return mp.Image(image_format=mp.ImageFormat.SRGB, data=cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+
+
+def create_mediapipe_landmarker(model_path, running_mode="image", result_callback=None):
+    """
+    Crea un FaceLandmarker de MediaPipe en el modo indicado. El llamador es responsable de cerrarlo.
 
     Args:
-        image_path (str): Ruta a la imagen.
         model_path (str): Ruta al modelo de MediaPipe.
+        running_mode (str): Modo de ejecución ('image', 'video' o 'live_stream').
+        result_callback (callable, optional): Función que recibe los resultados en modo 'live_stream'.
 
     Returns:
-        is_frontal (bool): True si se detecta al menos un rostro frontal, False de lo contrario.
-        angle_data (dict): Información sobre los ángulos row, pitch y yaw encontrados.
+        vision.FaceLandmarker: El landmarker creado.
     """
-    is_frontal = False
-    
     base_options = python.BaseOptions(model_asset_path=model_path)
     face_landmarker_options = vision.FaceLandmarkerOptions(
         base_options=base_options,
+        running_mode=MEDIAPIPE_RUNNING_MODES[running_mode],
         num_faces=1,
+        result_callback=result_callback,
     )
-    
-    roll_angle, pitch_angle, yaw_angle = "Null", "Null", "Null"
+    return vision.FaceLandmarker.create_from_options(face_landmarker_options)
+
+
+def get_mediapipe_landmarker(model_path):
+    """
+    Devuelve un FaceLandmarker en modo imagen para el modelo dado. Se crea una única vez por proceso
+    y se reutiliza en las siguientes llamadas.
 
-    with vision.FaceLandmarker.create_from_options(face_landmarker_options) as face_landmarker:
-        mediapipe_image = mp.Image.create_from_file(image_path)
-        face_landmarker_result = face_landmarker.detect(mediapipe_image)
+    Args:
+        model_path (str): Ruta al modelo de MediaPipe.
 
-        if face_landmarker_result and face_landmarker_result.face_landmarks:
-            facial_landmarks = face_landmarker_result.face_landmarks[0]
+    Returns:
+        vision.FaceLandmarker: El landmarker en modo imagen.
+    """
+    face_landmarker = _mediapipe_landmarkers_cache.get(model_path)
+
+    if face_landmarker is None:
+        face_landmarker = create_mediapipe_landmarker(model_path)
+        _mediapipe_landmarkers_cache[model_path] = face_landmarker
 
-            landmarks = [
-                facial_landmarks[33].x, facial_landmarks[33].y,   # Esquina izquierda del ojo izquierdo
-                facial_landmarks[263].x, facial_landmarks[263].y, # Esquina derecha del ojo derecho
-                facial_landmarks[1].x, facial_landmarks[1].y,     # Punta de la nariz
-                facial_landmarks[61].x, facial_landmarks[61].y,   # Esquina izquierda de la boca
-                facial_landmarks[291].x, facial_landmarks[291].y, # Esquina derecha de la boca
-                facial_landmarks[152].x, facial_landmarks[152].y  # Barbilla
-            ]
+    return face_landmarker
 
-            image = cv2.imread(image_path)
-            roll_angle, pitch_angle, yaw_angle = get_face_angles(image, landmarks)
 
-            if abs(roll_angle) < LOW_ROLL_THRESHOLD and abs(pitch_angle) < LOW_PITCH_THRESHOLD and abs(yaw_angle) < LOW_YAW_THRESHOLD:
-                is_frontal = True
+def analyze_mediapipe_result(face_landmarker_result, image_size):
+    """
+    Estima los ángulos del rostro detectado por MediaPipe y define si es frontal.
+
+    Args:
+        face_landmarker_result (vision.FaceLandmarkerResult): Resultado del FaceLandmarker.
+        image_size (tuple): Alto y ancho de la imagen analizada.
+
+    Returns:
+        is_frontal (bool): True si se detecta al menos un rostro frontal, False de lo contrario.
+        angle_data (dict): Información sobre los ángulos row, pitch y yaw encontrados.
+    """
+    is_frontal = False
+    roll_angle, pitch_angle, yaw_angle = "Null", "Null", "Null"
+
+    if face_landmarker_result and face_landmarker_result.face_landmarks:
+        facial_landmarks = face_landmarker_result.face_landmarks[0]
+
+        landmarks = [
+            facial_landmarks[33].x, facial_landmarks[33].y,   # Esquina izquierda del ojo izquierdo
+            facial_landmarks[263].x, facial_landmarks[263].y, # Esquina derecha del ojo derecho
+            facial_landmarks[1].x, facial_landmarks[1].y,     # Punta de la nariz
+            facial_landmarks[61].x, facial_landmarks[61].y,   # Esquina izquierda de la boca
+            facial_landmarks[291].x, facial_landmarks[291].y, # Esquina derecha de la boca
+            facial_landmarks[152].x, facial_landmarks[152].y  # Barbilla
+        ]
+
+        roll_angle, pitch_angle, yaw_angle = get_face_angles(None, landmarks, image_size)
+
+        if abs(roll_angle) < LOW_ROLL_THRESHOLD and abs(pitch_angle) < LOW_PITCH_THRESHOLD and abs(yaw_angle) < LOW_YAW_THRESHOLD:
+            is_frontal = True
     
     angle_data = {
         "image_info": {
@@ -290,7 +764,83 @@ def detect_frontal_face_mediapipe(image_path, model_path):
     return is_frontal, angle_data
 
 
-def process_image(image_path, detection_method, model_path):
+def detect_frontal_face_mediapipe(image_path, model_path):
+    """
+    Detecta si hay un rostro frontal en la imagen usando MediaPipe y estima los ángulos
+    de rotación (roll, pitch, yaw). Se considera un rostro frontal si los ángulos están
+    dentro de ciertos umbrales.
+
+    Args:
+        image_path (str): Ruta a la imagen.
+        model_path (str): Ruta al modelo de MediaPipe.
+
+    Returns:
+        is_frontal (bool): True si se detecta al menos un rostro frontal, False de lo contrario.
+        angle_data (dict): Información sobre los ángulos row, pitch y yaw encontrados.
+    """
+    face_landmarker = get_mediapipe_landmarker(model_path)
+
+    # Se decodifica una única vez y se convierte a RGB sobre el mismo buffer, que MediaPipe usa sin copiarlo
+    image = cv2.imread(image_path)
+    if image is None:
+        raise ValueError(f"No se pudo decodificar la imagen {image_path}")
+    cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+
+    mediapipe_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image)
+    face_landmarker_result = face_landmarker.detect(mediapipe_image)
+
+    return analyze_mediapipe_result(face_landmarker_result, image.shape[:2])
+
+
+def detect_frontal_face_mediapipe_frames(frames, model_path, running_mode="video"):
+    """
+    Detecta rostros frontales en una secuencia de frames reutilizando un único FaceLandmarker
+    en modo 'video' o 'live_stream'. En modo 'live_stream' MediaPipe puede descartar frames si
+    el modelo está ocupado, por lo que sólo se devuelven los frames efectivamente analizados.
+
+    Args:
+        frames (iterable of tuple): Pares (timestamp_ms, frame) con frames BGR y timestamps crecientes.
+        model_path (str): Ruta al modelo de MediaPipe.
+        running_mode (str): Modo de ejecución ('video' o 'live_stream').
+
+    Yields:
+        tuple: Timestamp del frame en ms, indicador de rostro frontal y ángulos detectados.
+    """
+    if running_mode == "video":
+        with create_mediapipe_landmarker(model_path, "video") as face_landmarker:
+            for timestamp_ms, frame in frames:
+                face_landmarker_result = face_landmarker.detect_for_video(to_mediapipe_image(frame), timestamp_ms)
+                yield (timestamp_ms, *analyze_mediapipe_result(face_landmarker_result, frame.shape[:2]))
+
+    elif running_mode == "live_stream":
+        pending_results = queue.Queue()
+        pending_frames = {}
+
+        def on_result(face_landmarker_result, output_image, timestamp_ms):
+            pending_results.put((face_landmarker_result, timestamp_ms))
+
+        def drain_results():
+            while not pending_results.empty():
+                face_landmarker_result, timestamp_ms = pending_results.get()
+                frame_size = pending_frames.pop(timestamp_ms, None)
+                for dropped_timestamp in [t for t in pending_frames if t < timestamp_ms]:
+                    del pending_frames[dropped_timestamp]
+                if frame_size is not None:
+                    yield (timestamp_ms, *analyze_mediapipe_result(face_landmarker_result, frame_size))
+
+        with create_mediapipe_landmarker(model_path, "live_stream", on_result) as face_landmarker:
+            for timestamp_ms, frame in frames:
+                pending_frames[timestamp_ms] = frame.shape[:2]
+                face_landmarker.detect_async(to_mediapipe_image(frame), timestamp_ms)
+                yield from drain_results()
+
+        yield from drain_results()
+
+    else:
+        raise ValueError(f"Modo inválido: {running_mode}. Use 'video' o 'live_stream'.")
+
+
+def process_image(image_path, detection_method, model_path, max_detection_size=None):
     """
     Procesa una imagen para detectar si tiene un rostro frontal.
     
@@ -298,13 +848,15 @@ def process_image(image_path, detection_method, model_path):
         image_path (str): Ruta de la imagen.
         detection_method (str): Método de detección a utilizar ('dlib' o 'mediapipe').
         model_path (str): Ruta al modelo a utilizar.
+        max_detection_size (int, optional): Lado mayor máximo de la imagen usada para detectar con dlib.
+            MediaPipe ya redimensiona internamente la entrada de su modelo, por lo que lo ignora.
 
     Returns:
         bool: Indicador de si hay algún rostro frontal y ángulos detectados.
     """
     try:
         if detection_method == "dlib":
-            is_frontal, angle_data = detect_frontal_face_dlib(image_path, model_path)
+            is_frontal, angle_data = detect_frontal_face_dlib(image_path, model_path, max_detection_size)
             return is_frontal, angle_data
         elif detection_method == "mediapipe":
             is_frontal, angle_data = detect_frontal_face_mediapipe(image_path, model_path)
@@ -317,17 +869,318 @@ def process_image(image_path, detection_method, model_path):
         return None, None
 
 
-def process_folder(parent_folder_path, detection_method, model_path):
+class ResultsManifest:
+    """
+    Registro en SQLite de los resultados de process_folder, indexado por ruta, tamaño y fecha de modificación.
+    Permite retomar una ejecución interrumpida sin volver a analizar las imágenes ya resueltas.
+
+    Cada imagen se registra como pendiente antes de moverla y se marca como terminada después de escribir
+    su JSON, de modo que una ejecución posterior puede completar los pasos que hayan quedado a medias.
+    Las rutas se guardan absolutas, para que una ejecución desde otro directorio encuentre los mismos registros.
+    """
+
+    def __init__(self, manifest_path):
+        self.connection = sqlite3.connect(manifest_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS results (
+                path TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                is_frontal INTEGER NOT NULL,
+                angle_data TEXT NOT NULL,
+                destination_folder TEXT NOT NULL,
+                done INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self.connection.commit()
+
+    def get_result(self, image_path):
+        """
+        Devuelve el resultado registrado para una imagen si su tamaño y fecha de modificación no cambiaron.
+
+        Args:
+            image_path (str): Ruta de la imagen.
+
+        Returns:
+            tuple: Indicador de rostro frontal y ángulos detectados, o None si no hay un resultado válido.
+        """
+        row = self.connection.execute(
+            "SELECT size, mtime_ns, is_frontal, angle_data FROM results WHERE path = ?", (os.path.abspath(image_path),)
+        ).fetchone()
+        if row is None:
+            return None
+
+        file_stat = os.stat(image_path)
+        if (row[0], row[1]) != (file_stat.st_size, file_stat.st_mtime_ns):
+            return None
+
+        return bool(row[2]), json.loads(row[3])
+
+    def add_pending(self, image_path, is_frontal, angle_data, destination_folder):
+        """
+        Registra el resultado de una imagen antes de moverla.
+
+        Args:
+            image_path (str): Ruta de la imagen.
+            is_frontal (bool): Indicador de rostro frontal.
+            angle_data (dict): Ángulos detectados.
+            destination_folder (str): Carpeta a la que se moverá la imagen.
+        """
+        file_stat = os.stat(image_path)
+        self.connection.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (os.path.abspath(image_path), file_stat.st_size, file_stat.st_mtime_ns, int(is_frontal), json.dumps(angle_data),
+             os.path.abspath(destination_folder))
+        )
+        self.connection.commit()
+
+    def mark_done(self, image_path):
+        """
+        Marca una imagen como movida y con su JSON escrito.
+
+        Args:
+            image_path (str): Ruta de la imagen.
+        """
+        self.connection.execute("UPDATE results SET done = 1 WHERE path = ?", (os.path.abspath(image_path),))
+        self.connection.commit()
+
+    def iter_unfinished_moves(self):
+        """
+        Devuelve las imágenes registradas como pendientes que ya no están en su ruta original y sí en su
+        carpeta de destino, es decir, que fueron movidas pero cuyo JSON puede no haberse escrito. Los registros
+        de imágenes que no están en ninguna de las dos rutas (p. ej. borradas) se descartan.
+
+        Yields:
+            tuple: Ruta original, ángulos detectados y carpeta de destino.
+        """
+        rows = self.connection.execute("SELECT path, angle_data, destination_folder FROM results WHERE done = 0").fetchall()
+        for image_path, angle_data, destination_folder in rows:
+            if os.path.exists(image_path):
+                continue
+
+            if os.path.exists(os.path.join(destination_folder, os.path.basename(image_path))):
+                yield image_path, json.loads(angle_data), destination_folder
+            else:
+                logging.warning(f"{image_path} is missing from its original and destination folders; discarding its pending result")
+                self.connection.execute("DELETE FROM results WHERE path = ?", (image_path,))
+                self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+
+def get_sidecar_filename(image_path):
+    """Devuelve el nombre del JSON de resultados de una imagen ('<nombre>.json')."""
+    return os.path.splitext(os.path.basename(image_path))[0] + '.json'
+
+
+class SidecarResultSink:
+    """
+    Escribe el JSON de resultados de cada imagen como un archivo junto a la imagen movida.
+    Si se indica un ResultsManifest, marca cada imagen como terminada una vez escrito su JSON.
+    """
+
+    def __init__(self, manifest=None):
+        self.manifest = manifest
+
+    def write(self, image_path, angle_data, destination_folder):
+        download_json(angle_data, destination_folder, get_sidecar_filename(image_path))
+        if self.manifest:
+            self.manifest.mark_done(image_path)
+
+    def close(self):
+        pass
+
+
+class JsonlResultSink:
+    """
+    Acumula los resultados de todas las imágenes en un único archivo JSONL escrito en lotes por un hilo
+    en segundo plano, en lugar de crear un archivo por imagen. Si se indica un ResultsManifest, cada imagen
+    se marca como terminada sólo cuando su registro ya fue sincronizado a disco.
+    """
+
+    def __init__(self, results_path, manifest=None):
+        self.writer = BackgroundJsonlWriter(results_path)
+        self.manifest = manifest
+        self._unconfirmed_paths = deque()
+        self._confirmed_count = 0
+
+    def write(self, image_path, angle_data, destination_folder):
+        self.writer.write({
+            "path": image_path,
+            "destination_folder": destination_folder,
+            "json_filename": get_sidecar_filename(image_path),
+            "angle_data": angle_data,
+        })
+        self._unconfirmed_paths.append(image_path)
+        self._confirm_flushed()
+
+    def close(self):
+        self.writer.close()
+        self._confirm_flushed()
+
+    def _confirm_flushed(self):
+        while self._confirmed_count < self.writer.flushed_count:
+            image_path = self._unconfirmed_paths.popleft()
+            if self.manifest:
+                self.manifest.mark_done(image_path)
+            self._confirmed_count += 1
+
+
+def export_results_to_sidecars(results_path):
+    """
+    Genera los JSON por imagen a partir de un archivo JSONL escrito por JsonlResultSink. Si una imagen
+    aparece más de una vez (por ejemplo, tras retomar una ejecución), se usa su último registro.
+
+    Args:
+        results_path (str): Ruta al archivo JSONL de resultados.
+
+    Returns:
+        int: Cantidad de JSON escritos.
+    """
+    records = {record["path"]: record for record in read_jsonl_records(results_path)}
+
+    for record in records.values():
+        download_json(record["angle_data"], record["destination_folder"], record["json_filename"])
+
+    logging.info(f"{len(records)} JSON files exported from {results_path}")
+    return len(records)
+
+
+def init_worker(detection_method, model_path, max_detection_size, num_threads, worker_counter):
+    """
+    Inicializa un proceso del pool: limita sus hilos y carga el modelo una única vez,
+    de modo que cada tarea sólo recibe la ruta de la imagen.
+
+    Args:
+        detection_method (str): Método de detección a utilizar ('dlib' o 'mediapipe').
+        model_path (str): Ruta al modelo a utilizar.
+        max_detection_size (int): Lado mayor máximo de la imagen usada para detectar con dlib.
+        num_threads (int): Cantidad de hilos por proceso.
+        worker_counter (multiprocessing.Value): Contador compartido para asignar un índice a cada worker.
+    """
+    global _worker_detection_method, _worker_model_path, _worker_max_detection_size
+
+    _worker_detection_method = detection_method
+    _worker_model_path = model_path
+    _worker_max_detection_size = max_detection_size
+
+    with worker_counter.get_lock():
+        worker_index = worker_counter.value
+        worker_counter.value += 1
+
+    limit_process_threads(num_threads, worker_index)
+
+    if detection_method == "dlib":
+        load_dlib_models(model_path)
+    elif detection_method == "mediapipe":
+        get_mediapipe_landmarker(model_path)
+
+
+def process_image_in_worker(image_path):
+    """
+    Procesa una imagen dentro de un proceso del pool inicializado con init_worker.
+
+    Args:
+        image_path (str): Ruta de la imagen.
+
+    Returns:
+        tuple: Ruta de la imagen, indicador de rostro frontal y ángulos detectados.
+    """
+    is_frontal, angle_data = process_image(image_path, _worker_detection_method, _worker_model_path, _worker_max_detection_size)
+    return image_path, is_frontal, angle_data
+
+
+def process_images_in_pool(image_paths, detection_method, model_path, workers, threads=None, max_in_flight=None, max_detection_size=None, get_cached_result=None):
+    """
+    Procesa imágenes en un pool de procesos y devuelve los resultados en el mismo orden en que
+    fueron recibidas las rutas. La cantidad de tareas pendientes se limita para acotar la memoria.
+
+    Args:
+        image_paths (iterable of str): Rutas de las imágenes a procesar.
+        detection_method (str): Método de detección a utilizar ('dlib' o 'mediapipe').
+        model_path (str): Ruta al modelo a utilizar.
+        workers (int): Cantidad de procesos.
+        threads (int, optional): Hilos por proceso. Default es repartir los núcleos disponibles entre los procesos.
+        max_in_flight (int, optional): Máximo de imágenes pendientes. Default es 4 por proceso.
+        max_detection_size (int, optional): Lado mayor máximo de la imagen usada para detectar con dlib.
+        get_cached_result (callable, optional): Función que recibe una ruta y devuelve un resultado ya conocido
+            o None. Las imágenes con resultado conocido no se envían al pool.
+
+    Yields:
+        tuple: Ruta de la imagen, indicador de rostro frontal y ángulos detectados.
+    """
+    max_in_flight = max_in_flight or workers * 4
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    worker_counter = multiprocessing.Value("i", 0)
+    pending = deque()
+
+    initargs = (detection_method, model_path, max_detection_size, threads, worker_counter)
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs) as executor:
+        for image_path in image_paths:
+            cached_result = get_cached_result(image_path) if get_cached_result else None
+
+            if cached_result is not None:
+                future = Future()
+                future.set_result((image_path, *cached_result))
+                pending.append(future)
+            else:
+                pending.append(executor.submit(process_image_in_worker, image_path))
+
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_image_paths(parent_folder_path, excluded_folders=(), extensions=IMAGE_EXTENSIONS):
+    """
+    Recorre una carpeta y sus subcarpetas devolviendo las rutas de las imágenes encontradas.
+
+    Args:
+        parent_folder_path (str): Ruta de la carpeta a analizar.
+        excluded_folders (iterable of str): Rutas de subcarpetas que no se recorren.
+        extensions (tuple of str): Extensiones a devolver (por defecto, las de imagen; VIDEO_EXTENSIONS para videos).
+
+    Yields:
+        str: Ruta de cada archivo.
+    """
+    excluded_folders = {os.path.normpath(folder) for folder in excluded_folders}
+
+    for root_dir, sub_dirs, file_names in os.walk(parent_folder_path):
+        sub_dirs[:] = [sub_dir for sub_dir in sub_dirs if os.path.normpath(os.path.join(root_dir, sub_dir)) not in excluded_folders]
+
+        for file_name in file_names:
+            if file_name.lower().endswith(extensions):
+                yield os.path.join(root_dir, file_name)
+
+
+def process_folder(parent_folder_path, detection_method, model_path, workers=1, threads=None, max_detection_size=None, manifest_path=None, results_path=None):
     """
     Procesa una carpeta para detectar y filtrar imágenes con rostros frontales.
+    El movimiento de las imágenes y la escritura de los JSON se hacen siempre en el proceso principal.
+    Las carpetas de salida True/ y False/ no se vuelven a recorrer.
     
     Args:
         parent_folder_path (str): Ruta de la carpeta a analizar.
         detection_method (str): Método de detección a utilizar ('dlib' o 'mediapipe').
         model_path (str): Ruta al modelo a utilizar.
+        workers (int): Cantidad de procesos para la detección. Default es 1 (ejecución secuencial).
+        threads (int, optional): Hilos por proceso para OpenCV y MediaPipe. Default es no limitarlos
+            en ejecución secuencial y repartir los núcleos entre procesos en paralelo.
+        max_detection_size (int, optional): Lado mayor máximo de la imagen usada para detectar con dlib.
+            Default es None (detección en resolución original).
+        manifest_path (str, optional): Ruta a un registro SQLite de resultados. Si se indica, una nueva ejecución
+            retoma la anterior: no vuelve a analizar imágenes ya resueltas y completa los movimientos interrumpidos.
+        results_path (str, optional): Ruta a un archivo JSONL donde acumular los resultados en lugar de escribir
+            un JSON por imagen. Los JSON individuales pueden generarse luego con export_results_to_sidecars.
     """
     setup_logging("program_logs", f"{os.path.basename(parent_folder_path)}-face_detection")
-    image_extensions = (".avif", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
     
     true_faces_folder = os.path.join(parent_folder_path, "True")
     false_faces_folder = os.path.join(parent_folder_path, "False") 
@@ -335,38 +1188,260 @@ def process_folder(parent_folder_path, detection_method, model_path):
     os.makedirs(true_faces_folder, exist_ok=True)
     os.makedirs(false_faces_folder, exist_ok=True)
 
-    for root_dir, sub_dirs, file_names in os.walk(parent_folder_path):
-        for file_name in file_names:
-            if file_name.lower().endswith(image_extensions):
-                image_file_path = os.path.join(root_dir, file_name)
-                
-                is_frontal_face, angle_data = process_image(image_file_path, detection_method, model_path)
-                
-                if is_frontal_face is None:
-                    continue
+    manifest = ResultsManifest(manifest_path) if manifest_path else None
+    get_cached_result = manifest.get_result if manifest else None
+    result_sink = JsonlResultSink(results_path, manifest) if results_path else SidecarResultSink(manifest)
+
+    if manifest:
+        for image_file_path, angle_data, destination_folder in manifest.iter_unfinished_moves():
+            logging.info(f"Completing interrupted move of {image_file_path}")
+            result_sink.write(image_file_path, angle_data, destination_folder)
+
+    image_paths = iter_image_paths(parent_folder_path, excluded_folders=(true_faces_folder, false_faces_folder))
+
+    if workers > 1:
+        results = process_images_in_pool(image_paths, detection_method, model_path, workers, threads, max_detection_size=max_detection_size, get_cached_result=get_cached_result)
+    else:
+        if threads:
+            limit_process_threads(threads)
+
+        def analyze_image(image_path):
+            cached_result = get_cached_result(image_path) if get_cached_result else None
+            return cached_result or process_image(image_path, detection_method, model_path, max_detection_size)
+
+        results = ((image_path, *analyze_image(image_path)) for image_path in image_paths)
+
+    try:
+        for image_file_path, is_frontal_face, angle_data in results:
+            if is_frontal_face is None:
+                continue
+
+            logging.info(f"{image_file_path} contains frontal face? {is_frontal_face}")
+
+            destination_folder = true_faces_folder if is_frontal_face else false_faces_folder
+
+            if manifest:
+                manifest.add_pending(image_file_path, is_frontal_face, angle_data, destination_folder)
+
+            shutil.move(image_file_path, os.path.join(destination_folder, os.path.basename(image_file_path)))
+
+            result_sink.write(image_file_path, angle_data, destination_folder)
+            logging.info("-------")
+    finally:
+        try:
+            result_sink.close()
+        finally:
+            if manifest:
+                manifest.close()
+
+
+def iter_video_frames(video_path, frame_stride=1, keyframes_only=True):
+    """
+    Recorre los frames de un video devolviendo uno de cada frame_stride. Con keyframes_only (por defecto) el
+    decodificador descarta los frames que no son keyframes sin decodificarlos, por lo que sólo se procesan
+    los keyframes. Sin keyframes_only se decodifican todos los frames, aunque sólo se devuelva uno de cada
+    frame_stride, porque los demás frames dependen de los anteriores.
+
+    Args:
+        video_path (str): Ruta al video.
+        frame_stride (int): Se devuelve un frame de cada frame_stride frames decodificados.
+        keyframes_only (bool): Si True, sólo se decodifican los keyframes.
+
+    Yields:
+        tuple: Timestamp del frame en ms (estrictamente creciente) y frame BGR.
+    """
+    # PyAV sólo es necesario para el análisis de videos
+    import av
+
+    with av.open(video_path) as container:
+        video_stream = container.streams.video[0]
+        video_stream.thread_type = "AUTO"
+        if keyframes_only:
+            video_stream.codec_context.skip_frame = "NONKEY"
+
+        last_timestamp_ms = -1
+        for frame_index, frame in enumerate(container.decode(video_stream)):
+            if frame_index % frame_stride:
+                continue
+
+            timestamp_ms = round(frame.time * 1000) if frame.time is not None else last_timestamp_ms + 1
+            timestamp_ms = max(timestamp_ms, last_timestamp_ms + 1)
+            last_timestamp_ms = timestamp_ms
+
+            yield timestamp_ms, frame.to_ndarray(format="bgr24")
+
+
+def process_video(video_path, detection_method, model_path, frame_stride=1, keyframes_only=True):
+    """
+    Analiza los frames muestreados de un video reutilizando un único detector y devuelve la serie de ángulos
+    por frame junto con el mejor frame frontal (el de menor |yaw| + |pitch|).
+
+    Args:
+        video_path (str): Ruta al video.
+        detection_method (str): Método de detección a utilizar ('dlib' o 'mediapipe').
+        model_path (str): Ruta al modelo a utilizar.
+        frame_stride (int): Se analiza un frame de cada frame_stride.
+        keyframes_only (bool): Si True, sólo se decodifican y analizan los keyframes.
+
+    Returns:
+        video_data (dict): Serie de ángulos por frame y datos del mejor frame frontal, o None si hubo un error.
+        best_frame_jpeg (bytes): El mejor frame frontal codificado en JPEG, o None si no hay frames frontales.
+    """
+    try:
+        frames = iter_video_frames(video_path, frame_stride, keyframes_only)
+        current_frame = {}
+
+        def remember_frames(frames):
+            for timestamp_ms, frame in frames:
+                current_frame["frame"] = frame
+                yield timestamp_ms, frame
+
+        if detection_method == "dlib":
+            results = ((timestamp_ms, *detect_frontal_face_dlib_frame(frame, model_path)) for timestamp_ms, frame in remember_frames(frames))
+        elif detection_method == "mediapipe":
+            results = detect_frontal_face_mediapipe_frames(remember_frames(frames), model_path, "video")
+        else:
+            logging.info("Método inválido. Use 'dlib' o 'mediapipe'.")
+            return None, None
+
+        frames_data = []
+        best_frame = None
+        best_frame_image = None
+
+        for timestamp_ms, is_frontal, angle_data in results:
+            face_angle_info = angle_data["image_info"]["face_angle_info"]
+            frame_data = {
+                "timestamp_ms": timestamp_ms,
+                "is_frontal": is_frontal,
+                "roll": face_angle_info["roll"],
+                "pitch": face_angle_info["pitch"],
+                "yaw": face_angle_info["yaw"],
+            }
+            frames_data.append(frame_data)
+
+            if is_frontal:
+                score = abs(frame_data["yaw"]) + abs(frame_data["pitch"])
+                if best_frame is None or score < best_frame["score"]:
+                    best_frame = dict(frame_data, score=score, face_level=classify_face_level(frame_data["yaw"], frame_data["pitch"]))
+                    best_frame_image = current_frame["frame"]
+
+        video_data = {
+            "video_info": {
+                "method": detection_method,
+                "frame_stride": frame_stride,
+                "keyframes_only": keyframes_only,
+                "contains_frontal_face": best_frame is not None,
+                "best_frame": best_frame,
+                "frames": frames_data,
+            }
+        }
+
+        best_frame_jpeg = cv2.imencode(".jpg", best_frame_image)[1].tobytes() if best_frame_image is not None else None
+        return video_data, best_frame_jpeg
+
+    except Exception as error:
+        logging.error(f"Error al procesar el video {video_path}: {error}", exc_info=True)
+        return None, None
 
-                logging.info(f"{image_file_path} contains frontal face? {is_frontal_face}")
 
-                destination_folder = true_faces_folder if is_frontal_face else false_faces_folder
-                shutil.move(image_file_path, os.path.join(destination_folder, file_name))
+def process_video_in_worker(video_path, frame_stride, keyframes_only):
+    """
+    Procesa un video dentro de un proceso del pool inicializado con init_worker.
 
-                json_filename = os.path.splitext(image_file_path)[0] + '.json'
-                download_json(angle_data, destination_folder, os.path.basename(json_filename))
-                logging.info("-------")
+    Args:
+        video_path (str): Ruta al video.
+        frame_stride (int): Se analiza un frame de cada frame_stride.
+        keyframes_only (bool): Si True, sólo se decodifican y analizan los keyframes.
+
+    Returns:
+        tuple: Ruta del video, datos del video y mejor frame en JPEG.
+    """
+    return (video_path, *process_video(video_path, _worker_detection_method, _worker_model_path, frame_stride, keyframes_only))
+
+
+def process_video_folder(parent_folder_path, detection_method, model_path, frame_stride=1, keyframes_only=True, workers=1, threads=None):
+    """
+    Procesa los videos de una carpeta y sus subcarpetas. Por cada video escribe, junto a él, un JSON con la serie
+    de ángulos por frame y el mejor frame frontal, y ese frame como '<video>_best_frame.jpg'.
+    Las carpetas de salida True/ y False/ de process_folder no se recorren.
+
+    Args:
+        parent_folder_path (str): Ruta de la carpeta a analizar.
+        detection_method (str): Método de detección a utilizar ('dlib' o 'mediapipe').
+        model_path (str): Ruta al modelo a utilizar.
+        frame_stride (int): Se analiza un frame de cada frame_stride.
+        keyframes_only (bool): Si True, sólo se decodifican y analizan los keyframes.
+        workers (int): Cantidad de procesos, cada uno analiza videos completos. Default es 1.
+        threads (int, optional): Hilos por proceso para OpenCV y MediaPipe.
+    """
+    setup_logging("program_logs", f"{os.path.basename(parent_folder_path)}-face_detection_videos")
+
+    output_folders = (os.path.join(parent_folder_path, "True"), os.path.join(parent_folder_path, "False"))
+    video_paths = iter_image_paths(parent_folder_path, excluded_folders=output_folders, extensions=VIDEO_EXTENSIONS)
+
+    if workers > 1:
+        threads = threads or max(1, (os.cpu_count() or 1) // workers)
+        initargs = (detection_method, model_path, None, threads, multiprocessing.Value("i", 0))
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=initargs)
+        results = executor.map(partial(process_video_in_worker, frame_stride=frame_stride, keyframes_only=keyframes_only), video_paths)
+    else:
+        executor = None
+        if threads:
+            limit_process_threads(threads)
+        results = ((video_path, *process_video(video_path, detection_method, model_path, frame_stride, keyframes_only)) for video_path in video_paths)
+
+    try:
+        for video_path, video_data, best_frame_jpeg in results:
+            if video_data is None:
+                continue
+
+            logging.info(f"{video_path} contains frontal face? {video_data['video_info']['contains_frontal_face']}")
+
+            video_folder = os.path.dirname(video_path)
+            video_name = os.path.splitext(os.path.basename(video_path))[0]
+            download_json(video_data, video_folder, f"{video_name}.json")
+
+            if best_frame_jpeg is not None:
+                with open(os.path.join(video_folder, f"{video_name}_best_frame.jpg"), "wb") as best_frame_file:
+                    best_frame_file.write(best_frame_jpeg)
+            logging.info("-------")
+    finally:
+        if executor:
+            executor.shutdown()
 
 
 if __name__ == "__main__":
     # Ejecución:
     # python3 src/main/python/crawlers/face_detection.py --method "dlib" --model src/main/resources/shape_predictor_68_face_landmarks_dlib.dat --folder 
     # python3 src/main/python/crawlers/face_detection.py --method "mediapipe" --model src/main/resources/face_landmarker_mediapipe.task --folder 
+    # python3 src/main/python/crawlers/face_detection.py --method "dlib" --model src/main/resources/shape_predictor_68_face_landmarks_dlib.dat --workers 32 --folder 
+    # python3 src/main/python/crawlers/face_detection.py --method "mediapipe" --model src/main/resources/face_landmarker_mediapipe.task --videos --folder 
+    # python3 src/main/python/crawlers/face_detection.py --method "dlib" --model src/main/resources/shape_predictor_68_face_landmarks_dlib.dat --results-jsonl resultados.jsonl --folder 
+    # python3 src/main/python/crawlers/face_detection.py --export-sidecars resultados.jsonl
     
     parser = ArgumentParser(description='Detectar rostros frontales en imágenes.')
 
-    parser.add_argument("--folder", type=str, required=True, help="Ruta a la carpeta que contiene las imágenes")
-    parser.add_argument("--model", type=str, required=True, help="Ruta al modelo a utilizar")
-    parser.add_argument("--method", type=str, choices=["dlib", "mediapipe"], required=True, help="Método de detección a utilizar ('dlib' o 'mediapipe')")
+    parser.add_argument("--folder", type=str, help="Ruta a la carpeta que contiene las imágenes")
+    parser.add_argument("--model", type=str, help="Ruta al modelo a utilizar")
+    parser.add_argument("--method", type=str, choices=["dlib", "mediapipe"], help="Método de detección a utilizar ('dlib' o 'mediapipe')")
+    parser.add_argument("--workers", type=int, default=1, help="Cantidad de procesos para la detección (default: 1)")
+    parser.add_argument("--threads", type=int, default=None, help="Hilos por proceso para OpenCV y MediaPipe")
+    parser.add_argument("--max-detection-size", type=int, default=None, help="Lado mayor máximo, en píxeles, de la imagen usada para detectar rostros con dlib")
+    parser.add_argument("--manifest", type=str, default=None, help="Ruta a un registro SQLite de resultados para retomar ejecuciones interrumpidas")
+    parser.add_argument("--videos", action="store_true", help="Analizar los videos de la carpeta en lugar de las imágenes")
+    parser.add_argument("--frame-stride", type=int, default=1, help="En modo videos, analizar un frame de cada N frames decodificados (default: 1)")
+    parser.add_argument("--all-frames", action="store_true", help="En modo videos, decodificar todos los frames en lugar de sólo los keyframes")
+    parser.add_argument("--results-jsonl", type=str, default=None, help="Acumular los resultados en este archivo JSONL en lugar de un JSON por imagen")
+    parser.add_argument("--export-sidecars", type=str, default=None, help="Generar los JSON por imagen a partir de un archivo JSONL de resultados y terminar")
 
     args = parser.parse_args()
     
-    process_folder(args.folder, args.method, args.model)
+    if args.export_sidecars:
+        export_results_to_sidecars(args.export_sidecars)
+    elif not (args.folder and args.model and args.method):
+        parser.error("--folder, --model y --method son obligatorios")
+    elif args.videos:
+        process_video_folder(args.folder, args.method, args.model, args.frame_stride, not args.all_frames, args.workers, args.threads)
+    else:
+        process_folder(args.folder, args.method, args.model, args.workers, args.threads, args.max_detection_size, args.manifest, args.results_jsonl)
     
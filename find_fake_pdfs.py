@@ -1,19 +1,187 @@
+"""
+  Detección de archivos cuya extensión no coincide con su contenido (p. ej. un HTML guardado como .pdf o
+  un PNG guardado como .jpg), leyendo sólo los primeros bytes de cada archivo. Cubre PDF, JPEG, PNG,
+  WebP, TIFF, AVIF, ZIP y gzip; las extensiones se comparan sin distinguir mayúsculas.
+
+  El recorrido se hace en el hilo principal y las lecturas, en lotes sobre un pool de hilos; los
+  resultados se emiten en el orden del recorrido a medida que se obtienen.
+"""
 import os
-from pathlib import Path
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import BackgroundJsonlWriter
+
+# Bytes leídos de cada archivo (la cabecera %PDF- puede estar precedida de basura hasta el byte 1024)
+HEADER_SIZE = 1024
+
+# Formato esperado para cada extensión
+EXTENSION_FORMATS = {
+    ".pdf": "pdf",
+    ".jpg": "jpeg", ".jpeg": "jpeg", ".jpe": "jpeg", ".jfif": "jpeg",
+    ".png": "png",
+    ".webp": "webp",
+    ".tif": "tiff", ".tiff": "tiff",
+    ".avif": "avif",
+    ".zip": "zip",
+    ".gz": "gzip", ".tgz": "gzip",
+}
+
+# Marcas ISO-BMFF (caja ftyp) de AVIF
+AVIF_BRANDS = (b"avif", b"avis")
+
+
+def detect_file_format(header):
+    """
+    Detecta el formato de un archivo a partir de sus primeros bytes.
+
+    Args:
+        header (bytes): Primeros bytes del archivo (hasta HEADER_SIZE).
+
+    Returns:
+        str: Uno de los formatos de EXTENSION_FORMATS, o None si no se reconoce.
+    """
+    if header[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if header[:8] == b"\x89PNG\r\n\x1a\n":
+        return "png"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    if header[:4] in (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+"):
+        return "tiff"
+    if header[:2] == b"\x1f\x8b":
+        return "gzip"
+    if header[:4] in (b"PK\x03\x04", b"PK\x05\x06", b"PK\x07\x08"):
+        return "zip"
+    if header[4:8] == b"ftyp":
+        # Marca principal y marcas compatibles de la caja ftyp
+        box_size = int.from_bytes(header[:4], "big")
+        brands = header[8:12] + header[16:min(box_size, len(header))]
+        if any(brands[i:i + 4] in AVIF_BRANDS for i in range(0, len(brands), 4)):
+            return "avif"
+    if b"%PDF-" in header:
+        return "pdf"
+    return None
+
+
+def read_header(file_path):
+    """Lee los primeros HEADER_SIZE bytes de un archivo."""
+    with open(file_path, "rb") as f:
+        return f.read(HEADER_SIZE)
+
+
+def is_real_pdf(file_path):
+    """
+    Verifica si un archivo es realmente un PDF, por su cabecera %PDF-.
+
+    Args:
+        file_path (str or Path): Ruta del archivo.
+
+    Returns:
+        bool: True si el archivo empieza (o casi) con %PDF-.
+    """
+    return detect_file_format(read_header(file_path)) == "pdf"
+
 
-def find_fake_pdfs(directory):
+def check_extension(file_path):
     """
-    Finds all files with a .pdf extension that are not real PDF files
+    Compara el formato esperado por la extensión con el detectado en el contenido.
+
+    Returns:
+        dict: 'path', 'extension', 'expected', 'detected' (None si no se reconoce) y 'error' (None si el
+        archivo se pudo leer), o None si la extensión no está cubierta o coincide con el contenido.
+    """
+    extension = os.path.splitext(file_path)[1].lower()
+    expected_format = EXTENSION_FORMATS.get(extension)
+    if expected_format is None:
+        return None
+
+    try:
+        detected_format, error = detect_file_format(read_header(file_path)), None
+    except OSError as e:
+        detected_format, error = None, str(e)
+
+    if detected_format == expected_format:
+        return None
+    return {"path": file_path, "extension": extension, "expected": expected_format, "detected": detected_format, "error": error}
+
+
+def check_extensions_batch(file_paths):
+    """Verifica un lote de archivos; devuelve sólo las discrepancias."""
+    return [mismatch for mismatch in map(check_extension, file_paths) if mismatch]
+
+
+def iter_candidate_files(directory, formats=None):
+    """Recorre directory y devuelve las rutas cuya extensión (sin distinguir mayúsculas) está cubierta."""
+    for root, _, files in os.walk(directory):
+        for file_name in files:
+            expected_format = EXTENSION_FORMATS.get(os.path.splitext(file_name)[1].lower())
+            if expected_format and (formats is None or expected_format in formats):
+                yield os.path.join(root, file_name)
+
+
+def find_extension_mismatches(directory, formats=None, threads=16, batch_size=256):
     """
-    fake_pdfs = []
-    
-    for file in Path(directory).rglob("*.pdf"):
-        if not is_real_pdf(file):
-            fake_pdfs.append(str(file))
-    
-    return fake_pdfs
+    Busca los archivos cuya extensión no coincide con su contenido.
+
+    Args:
+        directory (str): Carpeta a recorrer (con subcarpetas).
+        formats (iterable of str, optional): Formatos esperados a verificar (p. ej. {'pdf'}). Por defecto, todos.
+        threads (int): Hilos de lectura.
+        batch_size (int): Archivos por tarea del pool.
+
+    Yields:
+        dict: Una discrepancia por archivo (ver check_extension), en el orden del recorrido.
+    """
+    formats = set(formats) if formats else None
+    max_in_flight = threads * 4
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        pending, batch = deque(), []
+        for file_path in iter_candidate_files(directory, formats):
+            batch.append(file_path)
+            if len(batch) == batch_size:
+                pending.append(executor.submit(check_extensions_batch, batch))
+                batch = []
+                if len(pending) >= max_in_flight:
+                    yield from pending.popleft().result()
+        if batch:
+            pending.append(executor.submit(check_extensions_batch, batch))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def find_fake_pdfs(directory, threads=16):
+    """
+    Finds all files with a .pdf extension (any case) that are not real PDF files
+    """
+    return [mismatch["path"] for mismatch in find_extension_mismatches(directory, formats={"pdf"}, threads=threads)]
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 find_fake_pdfs.py /ruta/a/archivos --output discrepancias.jsonl
+    # python3 find_fake_pdfs.py /ruta/a/archivos --formats pdf
+    parser = ArgumentParser(description="Busca archivos cuya extensión no coincide con su contenido.")
+    parser.add_argument("directory", help="Carpeta a recorrer")
+    parser.add_argument("--formats", nargs="+", choices=sorted(set(EXTENSION_FORMATS.values())), default=None,
+                        help="Formatos a verificar (por defecto, todos)")
+    parser.add_argument("--output", default=None, help="Archivo JSONL donde se escribe cada discrepancia a medida que se encuentra")
+    parser.add_argument("--threads", type=int, default=16, help="Hilos de lectura")
+    parser.add_argument("--batch-size", type=int, default=256, help="Archivos por tarea")
+    args = parser.parse_args()
 
-fakes = find_fake_pdfs("/path/to/your/files")
+    writer = BackgroundJsonlWriter(args.output) if args.output else None
+    mismatch_count = 0
+    try:
+        for mismatch in find_extension_mismatches(args.directory, args.formats, args.threads, args.batch_size):
+            mismatch_count += 1
+            print(f"Fake {mismatch['expected'].upper()} file: {mismatch['path']} (detected: {mismatch['error'] or mismatch['detected'] or 'unknown'})")
+            if writer:
+                writer.write(mismatch)
+    finally:
+        if writer:
+            writer.close()
 
-for fake in fakes:
-    print(f"Fake PDF file: {fake}")
+    print(f"Total: {mismatch_count}")
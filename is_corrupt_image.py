@@ -1,31 +1,517 @@
+"""
+  Validación de imágenes por niveles, de menor a mayor costo:
+  - structure: firma y estructura del contenedor leídas con mmap, sin decodificar (segmentos JPEG hasta
+    el SOS, recorrido de chunks PNG con verificación de CRC, cabeceras de WebP, GIF y TIFF).
+  - truncation: que los datos terminen donde el contenedor indica (EOI de JPEG, IEND de PNG, trailer
+    de GIF, tamaño RIFF de WebP, strips/tiles de TIFF dentro del archivo).
+  - decode: una única decodificación completa con Pillow. Con un límite de memoria (max_memory), las
+    imágenes PNG y TIFF se decodifican por partes (filas, strips o tiles) sin cargar la imagen entera.
+    Si una imagen no se puede decodificar dentro del límite, queda verificada sólo hasta 'truncation' y
+    no se considera corrupta (motivo 'unverified_over_limit').
+"""
 import io
 import logging
-from PIL import Image
+import math
+import mmap
+import os
+import struct
+import zlib
 
-def is_corrupt_image(image_path):
+import numpy as np
+from PIL import Image, TiffImagePlugin
+
+VALIDATION_LEVELS = ("structure", "truncation", "decode")
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Marcadores JPEG sin longitud (TEM y RST0-RST7)
+JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+# Marcadores SOF (C0-CF salvo DHT, JPG y DAC)
+JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+# Tamaño de los bloques de entrada y salida en la decodificación por partes
+STREAM_CHUNK_SIZE = 1 << 20
+# Canales de cada tipo de color PNG
+PNG_COLOR_TYPE_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+# Pasadas Adam7 de PNG entrelazado: (x inicial, y inicial, paso en x, paso en y)
+PNG_ADAM7_PASSES = ((0, 0, 8, 8), (4, 0, 8, 8), (0, 4, 4, 8), (2, 0, 4, 4), (0, 2, 2, 4), (1, 0, 2, 2), (0, 1, 1, 2))
+# Tags TIFF que se copian a cada strip/tile para decodificarlo como una imagen independiente
+TIFF_DECODING_TAGS = (258, 259, 262, 266, 277, 284, 317, 338, 339, 347, 530, 531, 532, 320)
+TIFF_DEFLATE_COMPRESSIONS = (8, 32946)
+
+
+class ImageValidationError(Exception):
+    """Error de validación con un motivo estable (reason) y detalles legibles."""
+
+    def __init__(self, reason, details=""):
+        super().__init__(f"{reason}: {details}" if details else reason)
+        self.reason = reason
+        self.details = details
+
+
+class MemoryLimitExceeded(Exception):
+    """La decodificación necesita más memoria que max_memory: la imagen no se pudo verificar, no es un error."""
+
+
+def detect_image_format(data):
     """
-    Verifica si una imagen está corrupta, analizando la misma en tres puntos distintos (principio, mitad y final).
+    Detecta el formato de una imagen a partir de su firma.
 
     Args:
-        image_path (str): Ruta de la imagen a verificar.
+        data (bytes or mmap.mmap): Contenido (o al menos los primeros 12 bytes) del archivo.
 
     Returns:
-        bool: Booleano que indica si la imagen está corrupta.
+        str: 'jpeg', 'png', 'gif', 'webp', 'tiff' o None si no se reconoce.
+    """
+    if data[:3] == b"\xff\xd8\xff":
+        return "jpeg"
+    if data[:8] == PNG_SIGNATURE:
+        return "png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "webp"
+    if data[:4] in (b"II*\x00", b"MM\x00*"):
+        return "tiff"
+    return None
+
+
+def check_jpeg_structure(data):
+    """
+    Recorre los segmentos JPEG desde el SOI hasta el primer SOS.
+
+    Returns:
+        int: Posición donde empiezan los datos comprimidos del primer scan.
+    """
+    position, size, sof_found = 2, len(data), False
+
+    while True:
+        if position >= size or data[position] != 0xFF:
+            raise ImageValidationError("invalid_marker", f"expected marker at offset {position}")
+        while position < size and data[position] == 0xFF:
+            position += 1
+        if position >= size:
+            raise ImageValidationError("truncated_header", "file ends inside a marker")
+
+        marker = data[position]
+        position += 1
+
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xD9:
+            raise ImageValidationError("unexpected_eoi", f"EOI before any scan at offset {position - 2}")
+        if position + 2 > size:
+            raise ImageValidationError("truncated_header", f"segment 0x{marker:02X} length past end of file")
+
+        segment_length = struct.unpack(">H", data[position:position + 2])[0]
+        if segment_length < 2 or position + segment_length > size:
+            raise ImageValidationError("truncated_header", f"segment 0x{marker:02X} at offset {position - 2} exceeds the file")
+
+        sof_found |= marker in JPEG_SOF_MARKERS
+        position += segment_length
+
+        if marker == 0xDA:
+            if not sof_found:
+                raise ImageValidationError("missing_sof", "scan without frame header")
+            return position
+
+
+def check_png_structure(data):
+    """
+    Recorre los chunks PNG verificando longitudes y CRC, y que IHDR sea el primero.
+
+    Returns:
+        tuple: Si se encontró IEND y si se encontró al menos un IDAT.
+    """
+    position, size = len(PNG_SIGNATURE), len(data)
+    first_chunk, idat_found = True, False
+
+    with memoryview(data) as view:
+        while position + 8 <= size:
+            chunk_length, chunk_type = struct.unpack(">I4s", view[position:position + 8])
+            chunk_end = position + 12 + chunk_length
+            if chunk_end > size:
+                raise ImageValidationError("truncated_chunk", f"{chunk_type!r} at offset {position} exceeds the file")
+
+            if first_chunk and chunk_type != b"IHDR":
+                raise ImageValidationError("missing_ihdr", f"first chunk is {chunk_type!r}")
+            first_chunk = False
+
+            stored_crc = struct.unpack(">I", view[chunk_end - 4:chunk_end])[0]
+            if zlib.crc32(view[position + 4:chunk_end - 4]) != stored_crc:
+                raise ImageValidationError("crc_mismatch", f"{chunk_type!r} at offset {position}")
+
+            idat_found |= chunk_type == b"IDAT"
+            position = chunk_end
+            if chunk_type == b"IEND":
+                return True, idat_found
+
+    return False, idat_found
+
+
+def check_image_structure(data, image_format):
+    """
+    Nivel 'structure': valida la estructura del contenedor sin decodificar.
+
+    Returns:
+        object: Estado necesario para check_image_truncation (depende del formato).
+    """
+    if image_format == "jpeg":
+        return check_jpeg_structure(data)
+    if image_format == "png":
+        return check_png_structure(data)
+    if image_format == "gif" and len(data) < 13:
+        raise ImageValidationError("truncated_header", "GIF logical screen descriptor incomplete")
+    if image_format == "tiff":
+        if len(data) < 8:
+            raise ImageValidationError("truncated_header", "TIFF header incomplete")
+        ifd_offset = struct.unpack("<I" if data[:2] == b"II" else ">I", data[4:8])[0]
+        if ifd_offset < 8 or ifd_offset + 2 > len(data):
+            raise ImageValidationError("invalid_ifd_offset", f"first IFD at offset {ifd_offset}")
+    return None
+
+
+def check_image_truncation(image_path, data, image_format, structure_state):
+    """Nivel 'truncation': verifica que los datos no estén cortados."""
+    size = len(data)
+
+    if image_format == "jpeg":
+        if data.rfind(b"\xff\xd9", structure_state) == -1:
+            raise ImageValidationError("missing_eoi", "no EOI marker after the scan data")
+    elif image_format == "png":
+        iend_found, idat_found = structure_state
+        if not idat_found:
+            raise ImageValidationError("missing_idat", "no image data chunks")
+        if not iend_found:
+            raise ImageValidationError("missing_iend", "file ends before IEND")
+    elif image_format == "gif":
+        if data[size - 1] != 0x3B:
+            raise ImageValidationError("missing_trailer", "GIF does not end with the 0x3B trailer")
+    elif image_format == "webp":
+        riff_size = struct.unpack("<I", data[4:8])[0]
+        if riff_size + 8 > size:
+            raise ImageValidationError("truncated_data", f"RIFF declares {riff_size + 8} bytes, file has {size}")
+    elif image_format == "tiff":
+        # Pillow sólo lee las IFD al abrir; no decodifica los datos
+        with Image.open(image_path) as img:
+            offsets = img.tag_v2.get(273) or img.tag_v2.get(324) or ()
+            byte_counts = img.tag_v2.get(279) or img.tag_v2.get(325) or ()
+        if not offsets or len(offsets) != len(byte_counts):
+            raise ImageValidationError("missing_strips", "strip/tile offsets or byte counts missing")
+        data_end = max(offset + byte_count for offset, byte_count in zip(offsets, byte_counts))
+        if data_end > size:
+            raise ImageValidationError("truncated_data", f"strips/tiles end at {data_end}, file has {size} bytes")
+
+
+def decode_image(image_path):
+    """
+    Nivel 'decode': decodifica la imagen completa una sola vez.
+
+    Returns:
+        int: Memoria aproximada (bytes) de la imagen decodificada.
     """
     try:
-        with open(image_path, "rb") as f:
-            img = Image.open(io.BytesIO(f.read()))
+        with Image.open(image_path) as img:
             img.load()
+            if img.size[0] == 0 or img.size[1] == 0:
+                raise ImageValidationError("invalid_dimensions", f"{img.size[0]}x{img.size[1]}")
+            return get_decoded_size(img.mode, img.width, img.height)
+    except ImageValidationError:
+        raise
+    except Exception as e:
+        raise ImageValidationError("decode_error", str(e))
+
+
+def get_decoded_size(mode, width, height):
+    """Memoria aproximada, en bytes, que ocupa en Pillow una imagen decodificada del modo y tamaño indicados."""
+    if mode.startswith("I;16"):
+        pixel_size = 2
+    elif Image.getmodebands(mode) > 1 or mode in ("I", "F"):
+        pixel_size = 4
+    else:
+        pixel_size = 1
+    return width * height * pixel_size
+
+
+def inflate_stream(compressed_chunks, expected_size, row_stride=None):
+    """
+    Descomprime un stream zlib por bloques de STREAM_CHUNK_SIZE, sin acumular la salida, y verifica que
+    esté completo y tenga exactamente expected_size bytes.
+
+    Args:
+        compressed_chunks (iterable of bytes-like): Datos comprimidos.
+        expected_size (int): Tamaño esperado de los datos descomprimidos.
+        row_stride (int, optional): Si se indica, verifica el byte de filtro PNG (0-4) al inicio de cada fila.
+
+    Returns:
+        int: Pico de memoria (bytes) de los bloques de entrada y salida.
+    """
+    decompressor = zlib.decompressobj()
+    total_size, peak_memory = 0, 0
+
+    def check_output(output):
+        nonlocal total_size, peak_memory
+        if row_stride and output:
+            first_row = (-total_size) % row_stride
+            invalid_rows = np.flatnonzero(np.frombuffer(output, dtype=np.uint8)[first_row::row_stride] > 4)
+            if len(invalid_rows):
+                row = (total_size + first_row) // row_stride + int(invalid_rows[0])
+                raise ImageValidationError("invalid_filter", f"invalid PNG filter type in row {row}")
+        total_size += len(output)
+        if total_size > expected_size:
+            raise ImageValidationError("size_mismatch", f"more than {expected_size} bytes of image data")
+
+    try:
+        for chunk in compressed_chunks:
+            while chunk and not decompressor.eof:
+                output = decompressor.decompress(chunk, STREAM_CHUNK_SIZE)
+                peak_memory = max(peak_memory, len(chunk) + len(output))
+                check_output(output)
+                chunk = decompressor.unconsumed_tail
+        check_output(decompressor.flush())
+    except zlib.error as e:
+        raise ImageValidationError("corrupt_data", str(e))
+
+    if not decompressor.eof:
+        raise ImageValidationError("truncated_data", "compressed data ends before the end of the stream")
+    if total_size != expected_size:
+        raise ImageValidationError("size_mismatch", f"{total_size} bytes of image data, expected {expected_size}")
 
+    return peak_memory
+
+
+def iter_chunks(data, offset, length):
+    """Recorre data[offset:offset + length] en bloques de a lo sumo STREAM_CHUNK_SIZE bytes."""
+    for start in range(offset, offset + length, STREAM_CHUNK_SIZE):
+        yield data[start:min(start + STREAM_CHUNK_SIZE, offset + length)]
+
+
+def stream_decode_png(data):
+    """
+    Descomprime los IDAT de un PNG por bloques, verificando los filtros de cada fila y el tamaño total.
+
+    Returns:
+        int: Pico de memoria (bytes) usado.
+    """
+    width, height, bit_depth, color_type, _, _, interlace = struct.unpack(">IIBBBBB", data[16:29])
+    if color_type not in PNG_COLOR_TYPE_CHANNELS:
+        raise ImageValidationError("invalid_header", f"color type {color_type}")
+    bits_per_pixel = PNG_COLOR_TYPE_CHANNELS[color_type] * bit_depth
+
+    if interlace:
+        expected_size = 0
+        for x_start, y_start, x_step, y_step in PNG_ADAM7_PASSES:
+            pass_width = math.ceil((width - x_start) / x_step) if width > x_start else 0
+            pass_height = math.ceil((height - y_start) / y_step) if height > y_start else 0
+            if pass_width and pass_height:
+                expected_size += pass_height * (math.ceil(pass_width * bits_per_pixel / 8) + 1)
+        row_stride = None
+    else:
+        row_stride = math.ceil(width * bits_per_pixel / 8) + 1
+        expected_size = height * row_stride
+
+    def iter_idat_chunks():
+        position = len(PNG_SIGNATURE)
+        while position + 8 <= len(data):
+            chunk_length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+            if chunk_type == b"IDAT":
+                yield from iter_chunks(data, position + 8, chunk_length)
+            elif chunk_type == b"IEND":
+                return
+            position += 12 + chunk_length
+
+    return inflate_stream(iter_idat_chunks(), expected_size, row_stride)
+
+
+def build_single_strip_tiff(tags, width, rows, strip_data, single_plane):
+    """
+    Arma en memoria un TIFF de un único strip con los tags de decodificación de la imagen original,
+    para que libtiff decodifique ese strip (o tile) de forma independiente.
+    """
+    ifd = TiffImagePlugin.ImageFileDirectory_v2(prefix=tags.prefix)
+    for tag in TIFF_DECODING_TAGS:
+        if tag in tags:
+            ifd[tag] = tags[tag]
+            ifd.tagtype[tag] = tags.tagtype[tag]
+
+    if single_plane:
+        # Con PlanarConfiguration=2 cada strip tiene una sola muestra por píxel
+        for tag in (258, 339):
+            if tag in ifd:
+                ifd[tag] = ifd[tag][:1] if isinstance(ifd[tag], tuple) else ifd[tag]
+        ifd[277], ifd[284], ifd[262] = 1, 1, 1
+        if 338 in ifd:
+            del ifd[338]
+
+    ifd[256], ifd[257], ifd[278] = width, rows, rows
+    # tobytes suma a StripOffsets la posición donde termina el IFD, que es donde se agregan los datos
+    ifd[273], ifd[279] = (0,), (len(strip_data),)
+    ifd.tagtype[273] = ifd.tagtype[279] = 4
+
+    header = tags.prefix + (b"*\x00" if tags.prefix == b"II" else b"\x00*") + struct.pack("<I" if tags.prefix == b"II" else ">I", 8)
+    return header + ifd.tobytes(8) + strip_data
+
+
+def stream_decode_tiff(image_path, data, max_memory):
+    """
+    Decodifica el primer IFD de un TIFF strip por strip (o tile por tile), sin superar max_memory.
+    Los strips sin comprimir sólo se verifican por tamaño; los Deflate se descomprimen por bloques; el
+    resto se decodifica con libtiff como una imagen independiente por strip.
+
+    Returns:
+        int: Pico de memoria (bytes) usado.
+    """
+    with Image.open(image_path) as img:
+        tags = img.tag_v2
+        width, height, mode = img.width, img.height, img.mode
+
+    compression = tags.get(259, 1)
+    bits_per_sample = tags.get(258, (1,))
+    bits_per_sample = bits_per_sample if isinstance(bits_per_sample, tuple) else (bits_per_sample,)
+    samples_per_pixel = tags.get(277, 1)
+    single_plane = tags.get(284, 1) == 2 and samples_per_pixel > 1
+    pixel_bits = bits_per_sample[0] if single_plane else sum(bits_per_sample) if len(bits_per_sample) > 1 else bits_per_sample[0] * samples_per_pixel
+
+    if 324 in tags:
+        segment_width, segment_height = tags[322], tags[323]
+        offsets, byte_counts = tags[324], tags[325]
+        segment_sizes = [(segment_width, segment_height)] * len(offsets)
+    else:
+        rows_per_strip = min(tags.get(278, height), height)
+        offsets, byte_counts = tags[273], tags[279]
+        strips_per_plane = math.ceil(height / rows_per_strip)
+        segment_sizes = [(width, min(rows_per_strip, height - (index % strips_per_plane) * rows_per_strip)) for index in range(len(offsets))]
+
+    peak_memory = 0
+    strip_mode = "L" if single_plane else mode
+
+    for offset, byte_count, (segment_width, segment_height) in zip(offsets, byte_counts, segment_sizes):
+        expected_size = segment_height * math.ceil(segment_width * pixel_bits / 8)
+
+        if compression == 1:
+            if byte_count < expected_size:
+                raise ImageValidationError("size_mismatch", f"strip at offset {offset} has {byte_count} bytes, expected {expected_size}")
+        elif compression in TIFF_DEFLATE_COMPRESSIONS:
+            peak_memory = max(peak_memory, inflate_stream(iter_chunks(data, offset, byte_count), expected_size))
+        else:
+            strip_memory = byte_count + get_decoded_size(strip_mode, segment_width, segment_height)
+            if strip_memory > max_memory:
+                raise MemoryLimitExceeded(f"a {segment_width}x{segment_height} strip needs {strip_memory} bytes")
+            try:
+                with Image.open(io.BytesIO(build_single_strip_tiff(tags, segment_width, segment_height, data[offset:offset + byte_count], single_plane))) as strip:
+                    strip.load()
+            except Exception as e:
+                raise ImageValidationError("corrupt_data", f"strip at offset {offset}: {e}")
+            peak_memory = max(peak_memory, strip_memory)
+
+    return peak_memory
+
+
+def stream_decode_image(image_path, data, image_format, max_memory):
+    """
+    Nivel 'decode' con memoria acotada: PNG y TIFF se decodifican por partes; el resto se decodifica
+    completo sólo si entra en max_memory (los JPEG grandes se decodifican a escala 1/8, lo que igualmente
+    recorre todos los datos comprimidos).
+
+    Returns:
+        int: Pico de memoria (bytes) usado por los buffers de decodificación.
+
+    Raises:
+        MemoryLimitExceeded: Si la imagen (o un strip/tile de un TIFF comprimido) no entra en max_memory.
+    """
+    if image_format == "png":
+        return stream_decode_png(data)
+    if image_format == "tiff":
+        return stream_decode_tiff(image_path, data, max_memory)
+
+    try:
         with Image.open(image_path) as img:
-            width, height = img.size
-            img.crop((0, 0, width, height // 3)).verify()
-            img.crop((0, height // 3, width, 2 * height // 3)).verify()
-            img.crop((0, 2 * height // 3, width, height)).verify()
+            decoded_size = get_decoded_size(img.mode, img.width, img.height)
+            if decoded_size > max_memory and image_format == "jpeg":
+                img.draft(img.mode, (max(1, img.width // 8), max(1, img.height // 8)))
+                decoded_size = get_decoded_size(img.mode, img.width, img.height)
+            if decoded_size > max_memory:
+                raise MemoryLimitExceeded(f"decoding needs {decoded_size} bytes")
             img.load()
+            return decoded_size
+    except (ImageValidationError, MemoryLimitExceeded):
+        raise
+    except Exception as e:
+        raise ImageValidationError("decode_error", str(e))
+
+
+def validate_image(image_path, level="decode", max_memory=None):
+    """
+    Valida una imagen por niveles, deteniéndose en el primero que falla o en el nivel indicado.
+
+    Args:
+        image_path (str): Ruta de la imagen a verificar.
+        level (str): Último nivel a ejecutar: 'structure', 'truncation' o 'decode'.
+        max_memory (int, optional): Límite, en bytes, de memoria para decodificar. Si se indica, el nivel
+            'decode' usa stream_decode_image en lugar de cargar la imagen completa.
+
+    Returns:
+        dict: 'corrupt' (bool), 'level' (nivel en el que falló o último nivel ejecutado), 'reason'
+        (motivo estable, p. ej. 'crc_mismatch' o 'missing_eoi'; 'io_error' si el archivo no se pudo leer;
+        'unverified_over_limit', con 'corrupt' en False, si la decodificación no entra en max_memory; None si es
+        válida), 'details', 'format'
+        (formato detectado por la firma; None si no se reconoce, en cuyo caso sólo decide 'decode') y
+        'peak_memory' (bytes usados por los buffers de decodificación; None si no se decodificó).
+    """
+    if level not in VALIDATION_LEVELS:
+        raise ValueError(f"Unknown validation level: {level}")
+
+    result = {"corrupt": False, "level": "structure", "reason": None, "details": None, "format": None, "peak_memory": None}
+    try:
+        if os.path.getsize(image_path) == 0:
+            raise ImageValidationError("empty_file")
 
-        return False
-        
+        with open(image_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            image_format = result["format"] = detect_image_format(data)
+
+            structure_state = check_image_structure(data, image_format)
+            if level == "structure":
+                return result
+
+            result["level"] = "truncation"
+            check_image_truncation(image_path, data, image_format, structure_state)
+            if level == "truncation":
+                return result
+
+            result["level"] = "decode"
+            if max_memory:
+                result["peak_memory"] = stream_decode_image(image_path, data, image_format, max_memory)
+
+        if not max_memory:
+            result["peak_memory"] = decode_image(image_path)
+
+    except MemoryLimitExceeded as e:
+        # Estructura y truncamiento ya se verificaron; sólo falta la decodificación completa
+        result.update(reason="unverified_over_limit", details=str(e))
+    except ImageValidationError as e:
+        result.update(corrupt=True, reason=e.reason, details=e.details or None)
     except Exception as e:
-        logging.error(f"The image {image_path} is corrupted: {e}", exc_info=True)
-        return True
+        # Un OSError con errno (EIO, EACCES, ETIMEDOUT...) es una falla al leer el archivo, no de su contenido
+        io_error = isinstance(e, OSError) and e.errno is not None
+        result.update(corrupt=True, reason="io_error" if io_error else "read_error", details=str(e))
+
+    return result
+
+
+def is_corrupt_image(image_path, level="decode", max_memory=None):
+    """
+    Verifica si una imagen está corrupta (ver validate_image).
+
+    Args:
+        image_path (str): Ruta de la imagen a verificar.
+        level (str): Último nivel de validación a ejecutar: 'structure', 'truncation' o 'decode'.
+        max_memory (int, optional): Límite, en bytes, de memoria para decodificar por partes.
+
+    Returns:
+        bool: Booleano que indica si la imagen está corrupta.
+    """
+    result = validate_image(image_path, level, max_memory)
+    if result["corrupt"]:
+        logging.error(f"The image {image_path} is corrupted ({result['level']}): {result['reason']} {result['details'] or ''}".rstrip())
+    elif result["reason"] == "unverified_over_limit":
+        logging.warning(f"The image {image_path} was not fully decoded (over the memory limit): {result['details']}")
+    return result["corrupt"]
@@ -0,0 +1,594 @@
+"""
+  Validación estructural de PDF sin construir un PdfReader completo:
+  - El archivo se lee con mmap: cabecera %PDF-, marcador %%EOF, startxref y tabla xref (clásica, stream
+    xref o híbrida, siguiendo /Prev en las actualizaciones incrementales).
+  - Sólo se resuelven los objetos necesarios (catálogo /Root, nodo raíz /Pages e /Info), incluso dentro
+    de object streams; la cantidad de páginas se toma de /Pages /Count, sin cargar las páginas.
+  - Lo que no se puede decidir de forma segura (offsets incorrectos, cifrado, filtros o predictores no
+    soportados, /Count 0, errores de sintaxis) se delega a PyPDF2, con el mismo criterio que antes.
+  Sólo un archivo vacío, sin cabecera %PDF- o sin %%EOF se rechaza sin consultar a PyPDF2.
+"""
+import logging
+import mmap
+import os
+import re
+import zlib
+from collections import namedtuple
+
+import numpy as np
+from PyPDF2 import PdfReader
+
+# La cabecera puede estar precedida de basura; el estándar la busca en los primeros 1024 bytes
+PDF_HEADER_SEARCH_SIZE = 1024
+# Bytes antes de %%EOF en los que se busca startxref
+PDF_STARTXREF_SEARCH_SIZE = 4096
+
+PDF_WHITESPACE_RE = re.compile(rb"(?:[\x00\t\n\x0c\r ]+|%[^\r\n]*)*")
+PDF_NUMBER_RE = re.compile(rb"[+-]?(?:\d+\.?\d*|\.\d+)")
+PDF_REFERENCE_RE = re.compile(rb"(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+R(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])")
+PDF_NAME_RE = re.compile(rb"/([^\x00\t\n\x0c\r ()<>\[\]{}/%]*)")
+PDF_KEYWORD_RE = re.compile(rb"(true|false|null)(?![^\x00\t\n\x0c\r ()<>\[\]{}/%])")
+PDF_OBJECT_HEADER_RE = re.compile(rb"[\x00\t\n\x0c\r ]*(\d+)[\x00\t\n\x0c\r ]+(\d+)[\x00\t\n\x0c\r ]+obj")
+PDF_STREAM_START_RE = re.compile(rb"[\x00\t\n\x0c\r ]*stream(?:\r\n|\n|\r)")
+PDF_STREAM_END_RE = re.compile(rb"[\x00\t\n\x0c\r ]*endstream")
+PDF_STARTXREF_RE = re.compile(rb"startxref[\x00\t\n\x0c\r ]+(\d+)")
+PDF_XREF_SUBSECTION_RE = re.compile(rb"(\d+)[ ]+(\d+)[ ]*(?:\r\n|\n|\r)")
+# Las entradas xref miden 20 bytes; algunos generadores usan un fin de línea de un byte (19)
+PDF_XREF_ENTRY_SIZES = {b" \r": 20, b" \n": 20, b"\r\n": 20}
+PDF_XREF_ENTRY_RE = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+PDF_STRING_ESCAPES = {ord("n"): b"\n", ord("r"): b"\r", ord("t"): b"\t", ord("b"): b"\b", ord("f"): b"\f"}
+
+# Referencia indirecta (N G R)
+PdfReference = namedtuple("PdfReference", ["number", "generation"])
+# Stream: diccionario y datos sin decodificar
+PdfStream = namedtuple("PdfStream", ["dictionary", "data"])
+
+
+class PdfValidationError(Exception):
+    """Error de validación con un motivo estable (reason) y detalles legibles."""
+
+    def __init__(self, reason, details=""):
+        super().__init__(f"{reason}: {details}" if details else reason)
+        self.reason = reason
+        self.details = details
+
+
+class AmbiguousPdfStructure(PdfValidationError):
+    """La estructura no se puede validar sin un parser completo; la decisión se delega a PyPDF2."""
+
+
+def skip_whitespace(data, position):
+    """Devuelve la posición del siguiente token, salteando espacios y comentarios."""
+    return PDF_WHITESPACE_RE.match(data, position).end()
+
+
+def parse_literal_string(data, position):
+    """Lee un string literal (...) con paréntesis anidados y escapes, a partir del paréntesis de apertura."""
+    result, depth, position, size = bytearray(), 1, position + 1, len(data)
+    while position < size:
+        char = data[position]
+        position += 1
+        if char == 0x5C:  # \
+            if position >= size:
+                break
+            escaped = data[position]
+            position += 1
+            if escaped in PDF_STRING_ESCAPES:
+                result += PDF_STRING_ESCAPES[escaped]
+            elif 0x30 <= escaped <= 0x37:
+                octal = bytes([escaped])
+                while len(octal) < 3 and position < size and 0x30 <= data[position] <= 0x37:
+                    octal += bytes([data[position]])
+                    position += 1
+                result.append(int(octal, 8) & 0xFF)
+            elif escaped == 0x0D:
+                if position < size and data[position] == 0x0A:
+                    position += 1
+            elif escaped != 0x0A:
+                result.append(escaped)
+        elif char == 0x28:  # (
+            depth += 1
+            result.append(char)
+        elif char == 0x29:  # )
+            depth -= 1
+            if depth == 0:
+                return bytes(result), position
+            result.append(char)
+        else:
+            result.append(char)
+    raise AmbiguousPdfStructure("syntax_error", "unterminated string")
+
+
+def parse_object(data, position):
+    """
+    Lee un objeto PDF directo (diccionario, array, string, nombre, número, referencia o palabra clave).
+
+    Los diccionarios se devuelven como dict con las claves sin '/', los nombres como str, los strings como
+    bytes y las referencias como PdfReference.
+
+    Returns:
+        tuple: Objeto leído y posición siguiente.
+    """
+    position = skip_whitespace(data, position)
+    token = data[position:position + 2]
+
+    if token == b"<<":
+        dictionary, position = {}, position + 2
+        while True:
+            position = skip_whitespace(data, position)
+            if data[position:position + 2] == b">>":
+                return dictionary, position + 2
+            match = PDF_NAME_RE.match(data, position)
+            if not match:
+                raise AmbiguousPdfStructure("syntax_error", f"expected dictionary key at offset {position}")
+            dictionary[decode_name(match.group(1))], position = parse_object(data, match.end())
+
+    if token[:1] == b"[":
+        array, position = [], position + 1
+        while True:
+            position = skip_whitespace(data, position)
+            if data[position:position + 1] == b"]":
+                return array, position + 1
+            # Atajo para los arrays de referencias (/Kids de un árbol de páginas plano)
+            match = PDF_REFERENCE_RE.match(data, position)
+            if match:
+                array.append(PdfReference(int(match.group(1)), int(match.group(2))))
+                position = match.end()
+                continue
+            value, position = parse_object(data, position)
+            array.append(value)
+
+    if token[:1] == b"<":
+        end = data.find(b">", position)
+        if end == -1:
+            raise AmbiguousPdfStructure("syntax_error", "unterminated hex string")
+        hex_digits = re.sub(rb"[^0-9A-Fa-f]", b"", data[position + 1:end])
+        return bytes.fromhex((hex_digits + b"0" * (len(hex_digits) % 2)).decode()), end + 1
+
+    if token[:1] == b"(":
+        return parse_literal_string(data, position)
+
+    if token[:1] == b"/":
+        match = PDF_NAME_RE.match(data, position)
+        return decode_name(match.group(1)), match.end()
+
+    match = PDF_REFERENCE_RE.match(data, position)
+    if match:
+        return PdfReference(int(match.group(1)), int(match.group(2))), match.end()
+
+    match = PDF_NUMBER_RE.match(data, position)
+    if match:
+        number = match.group(0)
+        return (float(number) if b"." in number else int(number)), match.end()
+
+    match = PDF_KEYWORD_RE.match(data, position)
+    if match:
+        return {b"true": True, b"false": False, b"null": None}[match.group(1)], match.end()
+
+    raise AmbiguousPdfStructure("syntax_error", f"unexpected token {token!r} at offset {position}")
+
+
+def decode_name(raw_name):
+    """Decodifica un nombre PDF (sin la barra), resolviendo los escapes #xx."""
+    if b"#" in raw_name:
+        raw_name = re.sub(rb"#([0-9A-Fa-f]{2})", lambda match: bytes([int(match.group(1), 16)]), raw_name)
+    return raw_name.decode("latin-1")
+
+
+def apply_png_predictor(data, columns, bytes_per_pixel=1):
+    """Revierte el predictor PNG (Predictor >= 10) de un stream: cada fila empieza con su tipo de filtro."""
+    row_size = columns + 1
+    if len(data) % row_size:
+        raise AmbiguousPdfStructure("unsupported_predictor", f"data size {len(data)} is not a multiple of {row_size}")
+
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(-1, row_size)
+    if (rows[:, 0] == 2).all():
+        # Caso habitual en los streams xref (Predictor 12, filtro Up en todas las filas)
+        return np.cumsum(rows[:, 1:], axis=0, dtype=np.uint8).tobytes()
+
+    output, previous = bytearray(), bytearray(columns)
+    for row_start in range(0, len(data), row_size):
+        filter_type, row = data[row_start], bytearray(data[row_start + 1:row_start + row_size])
+        for i in range(columns):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up = previous[i]
+            if filter_type == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif filter_type == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif filter_type == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif filter_type == 4:
+                up_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                estimate = left + up - up_left
+                distances = (abs(estimate - left), abs(estimate - up), abs(estimate - up_left))
+                row[i] = (row[i] + (left, up, up_left)[distances.index(min(distances))]) & 0xFF
+            elif filter_type != 0:
+                raise AmbiguousPdfStructure("unsupported_predictor", f"PNG filter type {filter_type}")
+        output += row
+        previous = row
+    return bytes(output)
+
+
+class PdfStructureReader:
+    """
+    Lector mínimo de la estructura de un PDF sobre un buffer (mmap o bytes): localiza las tablas xref y
+    resuelve objetos individuales bajo demanda, sin recorrer el resto del documento.
+
+    Attributes:
+        trailer (dict): Trailer combinado (las entradas de la sección más reciente tienen prioridad).
+    """
+
+    def __init__(self, data):
+        """
+        Args:
+            data (mmap.mmap or bytes): Contenido completo del archivo.
+
+        Raises:
+            PdfValidationError: Si falta la cabecera o el marcador %%EOF.
+            AmbiguousPdfStructure: Si startxref o las tablas xref no se pueden leer.
+        """
+        self.data = data
+        self.size = len(data)
+        self._sections = []
+        self._objects = {}
+        self._object_streams = {}
+
+        self.header_offset = data.find(b"%PDF-", 0, PDF_HEADER_SEARCH_SIZE)
+        if self.header_offset == -1:
+            raise PdfValidationError("missing_header", "no %PDF- header in the first 1024 bytes")
+
+        eof_position = data.rfind(b"%%EOF")
+        if eof_position == -1:
+            raise PdfValidationError("missing_eof", "no %%EOF marker")
+
+        startxref_position = data.rfind(b"startxref", max(0, eof_position - PDF_STARTXREF_SEARCH_SIZE), eof_position)
+        match = PDF_STARTXREF_RE.match(data, startxref_position) if startxref_position != -1 else None
+        if not match:
+            raise AmbiguousPdfStructure("missing_startxref", "no startxref before the last %%EOF")
+
+        self.trailer = {}
+        self._read_xref_sections(int(match.group(1)))
+
+    def _read_xref_sections(self, offset):
+        """Lee la cadena de secciones xref desde la más reciente, siguiendo /Prev y /XRefStm."""
+        pending, visited = [(offset, False)], set()
+        while pending:
+            offset, from_hybrid_table = pending.pop(0)
+            if offset in visited:
+                raise AmbiguousPdfStructure("xref_loop", f"xref section at offset {offset} referenced twice")
+            visited.add(offset)
+            if not 0 <= offset < self.size:
+                raise AmbiguousPdfStructure("invalid_startxref", f"xref offset {offset} outside the file")
+
+            position = skip_whitespace(self.data, offset)
+            if self.data[position:position + 4] == b"xref":
+                trailer = self._read_xref_table(position + 4)
+                if isinstance(trailer.get("XRefStm"), int):
+                    # Archivos híbridos: el stream xref se consulta después de la tabla y antes de /Prev
+                    pending.insert(0, (trailer["XRefStm"], True))
+            else:
+                trailer = self._read_xref_stream(offset)
+                if from_hybrid_table:
+                    continue
+
+            for key, value in trailer.items():
+                self.trailer.setdefault(key, value)
+            if isinstance(trailer.get("Prev"), int):
+                pending.append((trailer["Prev"], False))
+
+    def _read_xref_table(self, position):
+        """
+        Registra las subsecciones de una tabla xref clásica sin leer sus entradas (se leen al resolver cada
+        objeto, a tamaño fijo por entrada) y devuelve el diccionario trailer.
+        """
+        subsections = []
+        while True:
+            position = skip_whitespace(self.data, position)
+            if self.data[position:position + 7] == b"trailer":
+                trailer, _ = parse_object(self.data, position + 7)
+                if not isinstance(trailer, dict):
+                    raise AmbiguousPdfStructure("invalid_trailer", "trailer is not a dictionary")
+                self._sections.append(("table", subsections))
+                return trailer
+
+            match = PDF_XREF_SUBSECTION_RE.match(self.data, position)
+            if not match:
+                raise AmbiguousPdfStructure("invalid_xref", f"unexpected data in xref table at offset {position}")
+            first, count, position = int(match.group(1)), int(match.group(2)), match.end()
+            line_end = self.data[position + 18:position + 20]
+            entry_size = PDF_XREF_ENTRY_SIZES.get(line_end, 19 if line_end[:1] in (b"\r", b"\n") else None)
+            if count and entry_size is None:
+                raise AmbiguousPdfStructure("invalid_xref", f"malformed xref entry at offset {position}")
+            subsections.append((first, count, position, entry_size))
+            position += count * (entry_size or 20)
+
+    def _read_xref_stream(self, offset):
+        """Decodifica un stream xref (PDF 1.5+) y devuelve su diccionario, que hace de trailer."""
+        xref_stream = self.read_object_at(offset)
+        if not isinstance(xref_stream, PdfStream) or xref_stream.dictionary.get("Type") != "XRef":
+            raise AmbiguousPdfStructure("invalid_xref", f"no xref table or stream at offset {offset}")
+
+        dictionary = xref_stream.dictionary
+        widths = dictionary.get("W")
+        if not (isinstance(widths, list) and len(widths) == 3 and all(isinstance(width, int) and width >= 0 for width in widths)):
+            raise AmbiguousPdfStructure("invalid_xref", f"invalid /W {widths!r}")
+        index = dictionary.get("Index", [0, dictionary.get("Size", 0)])
+        if not (isinstance(index, list) and len(index) % 2 == 0 and all(isinstance(value, int) for value in index)):
+            raise AmbiguousPdfStructure("invalid_xref", f"invalid /Index {index!r}")
+
+        entries = self.decode_stream(xref_stream)
+        if len(entries) < sum(widths) * sum(index[1::2]):
+            raise AmbiguousPdfStructure("invalid_xref", "xref stream shorter than its /Index")
+
+        subsections, row = [], 0
+        for first, count in zip(index[::2], index[1::2]):
+            subsections.append((first, count, row))
+            row += count
+        self._sections.append(("stream", (subsections, widths, entries)))
+        return dictionary
+
+    def find_object_location(self, number):
+        """
+        Busca un objeto en las secciones xref, de la más reciente a la más antigua.
+
+        Returns:
+            tuple: ('offset', posición) o ('compressed', número del object stream, índice), o None si el
+            objeto no existe o está libre.
+        """
+        for section_type, section in self._sections:
+            if section_type == "table":
+                for first, count, entries_offset, entry_size in section:
+                    if first <= number < first + count:
+                        entry_position = entries_offset + (number - first) * entry_size
+                        match = PDF_XREF_ENTRY_RE.match(self.data, entry_position)
+                        if not match:
+                            raise AmbiguousPdfStructure("invalid_xref", f"malformed xref entry for object {number}")
+                        return ("offset", int(match.group(1))) if match.group(3) == b"n" else None
+            else:
+                subsections, widths, entries = section
+                for first, count, first_row in subsections:
+                    if first <= number < first + count:
+                        row_start = (first_row + number - first) * sum(widths)
+                        fields, position = [], row_start
+                        for width in widths:
+                            fields.append(int.from_bytes(entries[position:position + width], "big"))
+                            position += width
+                        entry_type = fields[0] if widths[0] else 1
+                        if entry_type == 1:
+                            return "offset", fields[1]
+                        if entry_type == 2:
+                            return "compressed", fields[1], fields[2]
+                        return None
+        return None
+
+    def read_object_at(self, offset, expected_number=None):
+        """Lee el objeto indirecto 'N G obj' que empieza en offset (incluido su stream, si lo tiene)."""
+        match = PDF_OBJECT_HEADER_RE.match(self.data, offset)
+        if not match or (expected_number is not None and int(match.group(1)) != expected_number):
+            raise AmbiguousPdfStructure("invalid_offset", f"object {expected_number} not found at offset {offset}")
+
+        value, position = parse_object(self.data, match.end())
+        if isinstance(value, dict):
+            stream_match = PDF_STREAM_START_RE.match(self.data, position)
+            if stream_match:
+                length = self.resolve(value.get("Length"))
+                if not isinstance(length, int) or length < 0 or stream_match.end() + length > self.size:
+                    raise AmbiguousPdfStructure("invalid_stream_length", f"stream at offset {offset} has /Length {length!r}")
+                stream_end = stream_match.end() + length
+                if not PDF_STREAM_END_RE.match(self.data, stream_end):
+                    raise AmbiguousPdfStructure("invalid_stream_length", f"no endstream after stream at offset {offset}")
+                return PdfStream(value, self.data[stream_match.end():stream_end])
+        return value
+
+    def get_object(self, number):
+        """Devuelve el objeto indirecto número number, leyéndolo una sola vez."""
+        if number not in self._objects:
+            location = self.find_object_location(number)
+            if location is None:
+                self._objects[number] = None
+            elif location[0] == "offset":
+                self._objects[number] = self.read_object_at(location[1], number)
+            else:
+                self._objects[number] = self._read_compressed_object(number, location[1], location[2])
+        return self._objects[number]
+
+    def _read_compressed_object(self, number, stream_number, index):
+        """Lee un objeto guardado dentro de un object stream (/Type /ObjStm)."""
+        if stream_number not in self._object_streams:
+            object_stream = self.get_object(stream_number)
+            if not isinstance(object_stream, PdfStream) or object_stream.dictionary.get("Type") != "ObjStm":
+                raise AmbiguousPdfStructure("invalid_object_stream", f"object {stream_number} is not an object stream")
+            decoded = self.decode_stream(object_stream)
+            object_count, first_offset = object_stream.dictionary.get("N"), object_stream.dictionary.get("First")
+            if not isinstance(object_count, int) or not isinstance(first_offset, int):
+                raise AmbiguousPdfStructure("invalid_object_stream", f"object stream {stream_number} without /N or /First")
+            header = [int(value) for value in decoded[:first_offset].split()]
+            if len(header) < object_count * 2:
+                raise AmbiguousPdfStructure("invalid_object_stream", f"object stream {stream_number} header is incomplete")
+            self._object_streams[stream_number] = (decoded, first_offset, header)
+
+        decoded, first_offset, header = self._object_streams[stream_number]
+        if index * 2 + 1 >= len(header) or header[index * 2] != number:
+            raise AmbiguousPdfStructure("invalid_object_stream", f"object {number} not at index {index} of object stream {stream_number}")
+        return parse_object(decoded, first_offset + header[index * 2 + 1])[0]
+
+    def resolve(self, value):
+        """Sigue las referencias indirectas hasta un objeto directo."""
+        depth = 0
+        while isinstance(value, PdfReference):
+            depth += 1
+            if depth > 32:
+                raise AmbiguousPdfStructure("reference_loop", f"reference chain through object {value.number}")
+            value = self.get_object(value.number)
+        return value
+
+    def decode_stream(self, stream):
+        """Decodifica un stream sin filtro o con /FlateDecode (con o sin predictor PNG)."""
+        filters = self.resolve(stream.dictionary.get("Filter"))
+        filters = filters if isinstance(filters, list) else [filters] if filters else []
+        if filters not in ([], ["FlateDecode"], ["Fl"]):
+            raise AmbiguousPdfStructure("unsupported_filter", f"filters {filters!r}")
+        if not filters:
+            return bytes(stream.data)
+
+        try:
+            data = zlib.decompress(stream.data)
+        except zlib.error as e:
+            raise AmbiguousPdfStructure("invalid_stream", str(e))
+
+        parameters = self.resolve(stream.dictionary.get("DecodeParms")) or {}
+        if isinstance(parameters, list):
+            parameters = self.resolve(parameters[0]) or {}
+        predictor = parameters.get("Predictor", 1)
+        if predictor >= 10:
+            if parameters.get("BitsPerComponent", 8) != 8:
+                raise AmbiguousPdfStructure("unsupported_predictor", "only 8 bits per component are supported")
+            colors = parameters.get("Colors", 1)
+            return apply_png_predictor(data, parameters.get("Columns", 1) * colors, colors)
+        if predictor != 1:
+            raise AmbiguousPdfStructure("unsupported_predictor", f"predictor {predictor}")
+        return data
+
+    def get_catalog(self):
+        """Diccionario del catálogo (/Root del trailer)."""
+        catalog = self.resolve(self.trailer.get("Root"))
+        if not isinstance(catalog, dict):
+            raise AmbiguousPdfStructure("missing_catalog", "trailer /Root does not resolve to a dictionary")
+        return catalog
+
+    def get_version(self):
+        """Versión declarada en la cabecera, o en /Version del catálogo si es posterior."""
+        header_version = re.match(rb"%PDF-(\d+\.\d+)", self.data[self.header_offset:self.header_offset + 16])
+        version = header_version.group(1).decode() if header_version else None
+        catalog_version = self.get_catalog().get("Version")
+        if isinstance(catalog_version, str) and (version is None or catalog_version > version):
+            version = catalog_version
+        return version
+
+    def get_page_count(self):
+        """Cantidad de páginas según /Count del nodo raíz del árbol de páginas."""
+        pages = self.resolve(self.get_catalog().get("Pages"))
+        if not isinstance(pages, dict):
+            raise AmbiguousPdfStructure("missing_pages", "catalog /Pages does not resolve to a dictionary")
+        count = self.resolve(pages.get("Count"))
+        if not isinstance(count, int) or isinstance(count, bool) or count < 0:
+            raise AmbiguousPdfStructure("invalid_page_count", f"/Count is {count!r}")
+        return count
+
+    def get_info(self):
+        """Diccionario /Info del trailer (None si no tiene)."""
+        info = self.resolve(self.trailer.get("Info"))
+        return info if isinstance(info, dict) else None
+
+    def get_xmp(self):
+        """Paquete XMP del catálogo (/Metadata), decodificado, o None si no tiene."""
+        metadata = self.resolve(self.get_catalog().get("Metadata"))
+        return self.decode_stream(metadata) if isinstance(metadata, PdfStream) else None
+
+
+def validate_pdf_structure(pdf_path):
+    """
+    Valida un PDF sólo a partir de su estructura (ver PdfStructureReader).
+
+    Returns:
+        tuple: Cantidad de páginas y si tiene metadatos (/Info no vacío).
+
+    Raises:
+        PdfValidationError: Si el archivo no es un PDF.
+        AmbiguousPdfStructure: Si la estructura no alcanza para decidir.
+    """
+    if os.path.getsize(pdf_path) == 0:
+        raise PdfValidationError("empty_file")
+
+    with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        reader = PdfStructureReader(data)
+        if "Encrypt" in reader.trailer:
+            raise AmbiguousPdfStructure("encrypted", "encrypted documents are validated by PyPDF2")
+        page_count = reader.get_page_count()
+        if page_count == 0:
+            raise AmbiguousPdfStructure("invalid_page_count", "/Count is 0")
+        return page_count, bool(reader.get_info())
+
+
+def validate_pdf_with_pypdf2(pdf_path):
+    """
+    Valida un PDF con PyPDF2, recorriendo el árbol de páginas.
+
+    Returns:
+        tuple: Cantidad de páginas y si tiene metadatos.
+    """
+    with open(pdf_path, "rb") as f:
+        try:
+            reader = PdfReader(f)
+            page_count = len(reader.pages)
+            has_metadata = bool(reader.metadata)
+        except OSError as e:
+            if e.errno is None:
+                raise PdfValidationError("pypdf2_error", str(e))
+            raise
+        except Exception as e:
+            raise PdfValidationError("pypdf2_error", str(e))
+    if page_count == 0:
+        raise PdfValidationError("no_pages", "PDF no contiene páginas")
+    return page_count, has_metadata
+
+
+def validate_pdf(pdf_path, fallback=True):
+    """
+    Valida un PDF con la lectura estructural y, si no alcanza para decidir, con PyPDF2.
+
+    Args:
+        pdf_path (str): Ruta del PDF a verificar.
+        fallback (bool): Si es False, los casos ambiguos no se delegan a PyPDF2 y se informan con
+            method='structure' y reason con el motivo de la ambigüedad.
+
+    Returns:
+        dict: 'corrupt' (bool), 'method' ('structure' o 'pypdf2'), 'reason' (motivo estable, p. ej.
+        'missing_eof' o 'pypdf2_error'; 'io_error' si el archivo no se pudo leer; None si es válido), 'details', 'page_count' y 'has_metadata'
+        (None si no se pudieron obtener).
+    """
+    result = {"corrupt": False, "method": "structure", "reason": None, "details": None, "page_count": None, "has_metadata": None}
+    try:
+        result["page_count"], result["has_metadata"] = validate_pdf_structure(pdf_path)
+        return result
+    except AmbiguousPdfStructure as e:
+        ambiguity = e
+    except PdfValidationError as e:
+        result.update(corrupt=True, reason=e.reason, details=e.details or None)
+        return result
+    except Exception as e:
+        # Cualquier otra sorpresa del parser mínimo también es un caso a decidir por PyPDF2
+        ambiguity = AmbiguousPdfStructure("structure_error", str(e))
+
+    if not fallback:
+        result.update(reason=ambiguity.reason, details=ambiguity.details or None)
+        return result
+
+    result["method"] = "pypdf2"
+    try:
+        result["page_count"], result["has_metadata"] = validate_pdf_with_pypdf2(pdf_path)
+    except PdfValidationError as e:
+        result.update(corrupt=True, reason=e.reason, details=e.details or None)
+    except Exception as e:
+        # Un OSError con errno (EIO, EACCES, ETIMEDOUT...) es una falla al leer el archivo, no de su contenido
+        io_error = isinstance(e, OSError) and e.errno is not None
+        result.update(corrupt=True, reason="io_error" if io_error else "read_error", details=str(e))
+
+    return result
+
+
+def is_corrupt_pdf(pdf_path):
+    """
+    Verifica si un PDF está corrupto (ver validate_pdf).
+
+    Args:
+        pdf_path (str): Ruta del PDF a verificar.
+
+    Returns:
+        bool: Booleano que indica si el PDF está corrupto.
+    """
+    result = validate_pdf(pdf_path)
+    if result["corrupt"]:
+        logging.error(f"The PDF {pdf_path} is corrupted ({result['method']}): {result['reason']} {result['details'] or ''}".rstrip())
+    return result["corrupt"]
@@ -1,34 +1,659 @@
 """
   Función para definir si una imagen es NSFW utilizando transformers.
+  Incluye un clasificador persistente que carga el modelo una sola vez, prepara las imágenes en hilos
+  en segundo plano y clasifica por lotes, para analizar carpetas completas.
+  Opcionalmente, reutiliza el resultado de imágenes casi duplicadas mediante una caché de hashes perceptuales.
+  El modelo puede ejecutarse con transformers (PyTorch) o con onnxruntime sobre una exportación ONNX,
+  opcionalmente cuantizada a int8.
 """
+import json
 import logging
+import os
+import sqlite3
+import time
+from argparse import ArgumentParser
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 from PIL import Image
-from transformers import pipeline
+
+from utils import BackgroundJsonlWriter, setup_logging
+
+# torch, transformers y onnxruntime se importan dentro de cada backend: importar transformers tarda
+# varios segundos y el backend ONNX no lo necesita
 
 NSFW_THRESHOLD = 0.9
+NSFW_MODEL_NAME = "Falconsai/nsfw_image_detection"
+
+BACKENDS = ("transformers", "onnx")
+ONNX_MODEL_FILENAME = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILENAME = "model.int8.onnx"
+
+IMAGE_EXTENSIONS = (".avif", ".bmp", ".gif", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+
+# Clasificadores ya cargados en el proceso, indexados por nombre del modelo
+_nsfw_classifiers_cache = {}
+
+HASH_METHODS = ("dhash", "phash")
+HASH_SIZE = 8
+PHASH_IMAGE_SIZE = 32
+
+# Matriz de la DCT-II ortonormal usada por el pHash
+_dct_matrix = np.cos(np.pi * np.outer(np.arange(PHASH_IMAGE_SIZE), 2 * np.arange(PHASH_IMAGE_SIZE) + 1) / (2 * PHASH_IMAGE_SIZE))
+_dct_matrix[0] /= np.sqrt(2)
+_dct_matrix *= np.sqrt(2 / PHASH_IMAGE_SIZE)
+
+
+def compute_perceptual_hash(img, hash_method="dhash"):
+    """
+    Calcula el hash perceptual de 64 bits de una imagen, estable ante recompresiones y cambios de tamaño.
+
+    Args:
+        img (PIL.Image.Image): Imagen ya decodificada (conviene que sea una decodificación reducida).
+        hash_method (str): 'dhash' (gradiente horizontal sobre 9x8) o 'phash' (DCT sobre 32x32).
+
+    Returns:
+        int: Hash como entero con signo de 64 bits (tal como se guarda en SQLite).
+    """
+    if hash_method == "dhash":
+        pixels = np.asarray(img.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR), dtype=np.int16)
+        bits = pixels[:, 1:] > pixels[:, :-1]
+    elif hash_method == "phash":
+        pixels = np.asarray(img.convert("L").resize((PHASH_IMAGE_SIZE, PHASH_IMAGE_SIZE), Image.BILINEAR), dtype=np.float64)
+        coefficients = (_dct_matrix @ pixels @ _dct_matrix.T)[:HASH_SIZE, :HASH_SIZE]
+        bits = coefficients > np.median(coefficients.flatten()[1:])
+    else:
+        raise ValueError(f"Unknown hash method: {hash_method}")
+
+    return int.from_bytes(np.packbits(bits).tobytes(), "big", signed=True)
+
+
+def hamming_distances(hashes, image_hash):
+    """Distancia de Hamming entre cada hash de un array int64 y image_hash."""
+    xor = np.bitwise_xor(hashes, np.int64(image_hash)).view(np.uint64)
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(xor)
+    return np.unpackbits(xor.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
 
-def is_nsfw_image(image_path):
+
+class PerceptualHashCache:
+    """
+    Caché en SQLite de las probabilidades NSFW, indexada por hash perceptual. Una imagen reutiliza el
+    resultado guardado si su hash está a una distancia de Hamming menor o igual a radius de alguno de
+    los hashes de la caché (se elige el más cercano).
+
+    Los hashes se mantienen además en memoria para buscar por distancia con NumPy. Los contadores de
+    aciertos los actualiza NsfwClassifier, que también reutiliza resultados entre casi duplicados de un
+    mismo lote (todavía no guardados en la caché). Cuando se supera
+    max_entries, se eliminan las entradas menos usadas recientemente (un 10% de la capacidad por vez).
+
+    Attributes:
+        hits (int): Imágenes resueltas desde la caché.
+        misses (int): Imágenes que requirieron inferencia.
+    """
+
+    def __init__(self, cache_path, model_name=NSFW_MODEL_NAME, hash_method="dhash", radius=4, max_entries=200000):
+        """
+        Args:
+            cache_path (str): Ruta al archivo SQLite de la caché.
+            model_name (str): Modelo cuyos resultados se guardan. Una caché sólo es válida para un modelo y método de hash.
+            hash_method (str): Método de hash perceptual ('dhash' o 'phash').
+            radius (int): Distancia de Hamming máxima para reutilizar un resultado.
+            max_entries (int): Cantidad máxima de hashes guardados.
+        """
+        if hash_method not in HASH_METHODS:
+            raise ValueError(f"Unknown hash method: {hash_method}")
+
+        self.hash_method = hash_method
+        self.radius = radius
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+        self.connection = sqlite3.connect(cache_path)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS metadata (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        self.connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hashes (
+                hash INTEGER PRIMARY KEY,
+                nsfw_score REAL NOT NULL,
+                last_used REAL NOT NULL
+            )
+            """
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS hashes_last_used ON hashes (last_used)")
+
+        for key, value in (("model_name", model_name), ("hash_method", hash_method)):
+            self.connection.execute("INSERT OR IGNORE INTO metadata (key, value) VALUES (?, ?)", (key, value))
+            stored_value = self.connection.execute("SELECT value FROM metadata WHERE key = ?", (key,)).fetchone()[0]
+            if stored_value != value:
+                raise ValueError(f"The cache {cache_path} was created with {key}={stored_value}, not {value}")
+        self.connection.commit()
+
+        self._load_hashes()
+
+    def _load_hashes(self):
+        rows = self.connection.execute("SELECT hash, nsfw_score FROM hashes").fetchall()
+        self._hashes = np.array([row[0] for row in rows], dtype=np.int64)
+        self._scores = np.array([row[1] for row in rows], dtype=np.float64)
+        self._new_hashes, self._new_scores = [], []
+
+    def lookup(self, image_hash):
+        """
+        Busca el resultado de la imagen más parecida dentro del radio configurado.
+
+        Args:
+            image_hash (int): Hash perceptual de la imagen.
+
+        Returns:
+            float: Probabilidad NSFW guardada, o None si no hay una imagen parecida.
+        """
+        if self._new_hashes:
+            self._hashes = np.concatenate([self._hashes, np.array(self._new_hashes, dtype=np.int64)])
+            self._scores = np.concatenate([self._scores, np.array(self._new_scores, dtype=np.float64)])
+            self._new_hashes, self._new_scores = [], []
+
+        if len(self._hashes):
+            distances = hamming_distances(self._hashes, image_hash)
+            closest = int(np.argmin(distances))
+            if distances[closest] <= self.radius:
+                self.connection.execute("UPDATE hashes SET last_used = ? WHERE hash = ?", (time.time(), int(self._hashes[closest])))
+                return float(self._scores[closest])
+
+        return None
+
+    def add(self, image_hash, nsfw_score):
+        """
+        Guarda la probabilidad NSFW de una imagen. Los cambios se confirman con commit().
+
+        Args:
+            image_hash (int): Hash perceptual de la imagen.
+            nsfw_score (float): Probabilidad NSFW calculada por el modelo.
+        """
+        inserted = self.connection.execute(
+            "INSERT OR IGNORE INTO hashes (hash, nsfw_score, last_used) VALUES (?, ?, ?)", (image_hash, nsfw_score, time.time())
+        ).rowcount
+        if inserted:
+            self._new_hashes.append(image_hash)
+            self._new_scores.append(nsfw_score)
+
+    def commit(self):
+        """Confirma los cambios pendientes y aplica el límite de tamaño."""
+        entries = len(self._hashes) + len(self._new_hashes)
+        if entries > self.max_entries:
+            evicted = entries - self.max_entries + self.max_entries // 10
+            self.connection.execute(
+                "DELETE FROM hashes WHERE hash IN (SELECT hash FROM hashes ORDER BY last_used LIMIT ?)", (evicted,)
+            )
+            self.connection.commit()
+            self._load_hashes()
+            logging.info(f"NSFW cache: {evicted} entries evicted")
+        else:
+            self.connection.commit()
+
+    @property
+    def hit_rate(self):
+        """Proporción de imágenes resueltas desde la caché."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def close(self):
+        """Confirma los cambios pendientes y cierra la conexión."""
+        self.commit()
+        self.connection.close()
+
+
+class TransformersBackend:
+    """
+    Ejecuta el modelo con transformers (PyTorch en modo eager).
+
+    Attributes:
+        preprocessor_config (dict): Configuración del image processor del modelo.
+        id2label (dict): Etiqueta de cada índice de salida.
+    """
+
+    def __init__(self, model_name, intra_op_threads=None, inter_op_threads=None):
+        """
+        Args:
+            model_name (str): Nombre o ruta del modelo de clasificación.
+            intra_op_threads (int, optional): Hilos de torch dentro de cada operación.
+            inter_op_threads (int, optional): Hilos de torch entre operaciones independientes.
+        """
+        import torch
+        from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+        if intra_op_threads:
+            torch.set_num_threads(intra_op_threads)
+        if inter_op_threads:
+            try:
+                torch.set_num_interop_threads(inter_op_threads)
+            except RuntimeError as e:
+                # Sólo se puede configurar una vez por proceso, antes de la primera inferencia
+                logging.warning(f"Could not set torch inter-op threads: {e}")
+
+        self.torch = torch
+        self.preprocessor_config = AutoImageProcessor.from_pretrained(model_name).to_dict()
+        self.model = AutoModelForImageClassification.from_pretrained(model_name)
+        self.model.eval()
+        self.id2label = {int(index): label for index, label in self.model.config.id2label.items()}
+
+    def predict_logits(self, pixel_values):
+        """
+        Args:
+            pixel_values (numpy.ndarray): Array float32 (N, 3, alto, ancho).
+
+        Returns:
+            numpy.ndarray: Logits (N, clases).
+        """
+        with self.torch.inference_mode():
+            return self.model(pixel_values=self.torch.from_numpy(pixel_values)).logits.numpy()
+
+
+class OnnxBackend:
+    """
+    Ejecuta una exportación ONNX del modelo (ver export_onnx_model) con onnxruntime en CPU.
+
+    Attributes:
+        preprocessor_config (dict): Configuración del image processor del modelo.
+        id2label (dict): Etiqueta de cada índice de salida.
+    """
+
+    def __init__(self, model_dir, quantized=False, intra_op_threads=None, inter_op_threads=None):
+        """
+        Args:
+            model_dir (str): Carpeta generada por export_onnx_model.
+            quantized (bool): Si se usa el modelo cuantizado a int8.
+            intra_op_threads (int, optional): Hilos dentro de cada operación. Por defecto, los de onnxruntime.
+            inter_op_threads (int, optional): Hilos entre operaciones independientes. Si se indica, el grafo
+                se ejecuta en modo paralelo.
+        """
+        import onnxruntime
+
+        session_options = onnxruntime.SessionOptions()
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            session_options.intra_op_num_threads = intra_op_threads
+        if inter_op_threads:
+            session_options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+            session_options.inter_op_num_threads = inter_op_threads
+
+        model_path = os.path.join(model_dir, ONNX_QUANTIZED_MODEL_FILENAME if quantized else ONNX_MODEL_FILENAME)
+        self.session = onnxruntime.InferenceSession(model_path, session_options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+        with open(os.path.join(model_dir, "preprocessor_config.json")) as f:
+            self.preprocessor_config = json.load(f)
+        with open(os.path.join(model_dir, "config.json")) as f:
+            self.id2label = {int(index): label for index, label in json.load(f)["id2label"].items()}
+
+    def predict_logits(self, pixel_values):
+        """
+        Args:
+            pixel_values (numpy.ndarray): Array float32 (N, 3, alto, ancho).
+
+        Returns:
+            numpy.ndarray: Logits (N, clases).
+        """
+        return self.session.run(None, {self.input_name: pixel_values})[0]
+
+
+def export_onnx_model(output_dir, model_name=NSFW_MODEL_NAME, quantize=True, opset_version=17):
+    """
+    Exporta el modelo de transformers a ONNX (con tamaño de lote dinámico) junto con su configuración
+    y, opcionalmente, una versión con pesos cuantizados dinámicamente a int8.
+
+    Args:
+        output_dir (str): Carpeta de salida.
+        model_name (str): Nombre o ruta del modelo de clasificación.
+        quantize (bool): Si también se genera el modelo cuantizado.
+        opset_version (int): Versión del opset de ONNX.
+    """
+    import torch
+    from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    image_processor = AutoImageProcessor.from_pretrained(model_name)
+    model = AutoModelForImageClassification.from_pretrained(model_name)
+    model.eval()
+    model.config.return_dict = False
+
+    size = image_processor.size
+    height, width = (size["height"], size["width"]) if "height" in size else (size["shortest_edge"], size["shortest_edge"])
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILENAME)
+
+    with torch.inference_mode():
+        torch.onnx.export(
+            model, (torch.zeros(1, 3, height, width),), model_path,
+            input_names=["pixel_values"], output_names=["logits"],
+            dynamic_axes={"pixel_values": {0: "batch"}, "logits": {0: "batch"}},
+            opset_version=opset_version
+        )
+
+    image_processor.save_pretrained(output_dir)
+    model.config.save_pretrained(output_dir)
+    logging.info(f"ONNX model exported to {model_path}")
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_model_path = os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILENAME)
+        quantize_dynamic(model_path, quantized_model_path, weight_type=QuantType.QInt8)
+        logging.info(f"Quantized ONNX model exported to {quantized_model_path}")
+
+
+class NsfwClassifier:
+    """
+    Clasificador NSFW que mantiene el modelo cargado entre imágenes.
+
+    La decodificación, el redimensionado y la normalización se hacen en un pool de hilos (PIL y NumPy
+    liberan el GIL), mientras el hilo principal ejecuta el modelo sobre lotes de batch_size imágenes.
+    El preprocesamiento replica el del image processor del modelo (resize, rescale y normalize), pero
+    las imágenes JPEG se decodifican directamente a escala reducida (Image.draft), por lo que las
+    probabilidades pueden diferir mínimamente de las de transformers.pipeline.
+    """
+
+    def __init__(self, model_name=NSFW_MODEL_NAME, batch_size=16, prefetch_workers=4, threshold=NSFW_THRESHOLD, threads=None,
+                 backend="transformers", inter_op_threads=None, quantized=False):
+        """
+        Args:
+            model_name (str): Nombre o ruta del modelo de clasificación, o carpeta de export_onnx_model si backend es 'onnx'.
+            batch_size (int): Cantidad de imágenes por inferencia.
+            prefetch_workers (int): Hilos que decodifican y preparan imágenes.
+            threshold (float): Probabilidad mínima de la clase NSFW para considerar la imagen NSFW.
+            threads (int, optional): Hilos dentro de cada operación (intra-op) para la inferencia.
+            backend (str): 'transformers' o 'onnx'.
+            inter_op_threads (int, optional): Hilos entre operaciones independientes (inter-op).
+            quantized (bool): Con backend 'onnx', si se usa el modelo cuantizado a int8.
+        """
+        if backend == "transformers":
+            self.backend = TransformersBackend(model_name, threads, inter_op_threads)
+        elif backend == "onnx":
+            self.backend = OnnxBackend(model_name, quantized, threads, inter_op_threads)
+        else:
+            raise ValueError(f"Unknown backend: {backend}")
+
+        self.model_name = model_name
+        # Identifica el modelo efectivamente usado (p. ej. para no mezclar resultados en la caché)
+        self.model_id = model_name if backend == "transformers" else f"{model_name}#onnx{'-int8' if quantized else ''}"
+        self.batch_size = batch_size
+        self.prefetch_workers = prefetch_workers
+        self.threshold = threshold
+
+        config = self.backend.preprocessor_config
+        size = config["size"] if isinstance(config["size"], dict) else {"shortest_edge": config["size"]}
+        self.image_size = (size["width"], size["height"]) if "width" in size else (size["shortest_edge"], size["shortest_edge"])
+        self.resample = config.get("resample", Image.BILINEAR)
+        self.rescale_factor = config["rescale_factor"] if config.get("do_rescale", True) else 1.0
+        self.image_mean = np.array(config["image_mean"] if config.get("do_normalize", True) else [0.0, 0.0, 0.0], dtype=np.float32).reshape(3, 1, 1)
+        self.image_std = np.array(config["image_std"] if config.get("do_normalize", True) else [1.0, 1.0, 1.0], dtype=np.float32).reshape(3, 1, 1)
+
+        labels = {label.lower(): index for index, label in self.backend.id2label.items()}
+        self.nsfw_index = labels["nsfw"]
+
+    def preprocess_image(self, image_path, hash_method=None):
+        """
+        Decodifica una imagen y la convierte en el tensor de entrada del modelo.
+
+        Args:
+            image_path (str): La ruta al archivo de imagen.
+            hash_method (str, optional): Si se indica, también calcula el hash perceptual sobre la misma decodificación reducida.
+
+        Returns:
+            tuple: Array float32 (3, alto, ancho) normalizado y hash perceptual (None si no se pidió).
+        """
+        with Image.open(image_path) as img:
+            img.draft("RGB", self.image_size)
+            img = img.convert("RGB")
+
+        image_hash = compute_perceptual_hash(img, hash_method) if hash_method else None
+        img = img.resize(self.image_size, self.resample)
+
+        pixel_values = np.asarray(img, dtype=np.float32).transpose(2, 0, 1) * self.rescale_factor
+        return (pixel_values - self.image_mean) / self.image_std, image_hash
+
+    def iter_preprocessed_images(self, image_paths, hash_method=None):
+        """
+        Prepara las imágenes en el pool de hilos manteniendo un número acotado de imágenes en memoria.
+
+        Args:
+            image_paths (iterable of str): Rutas de las imágenes.
+            hash_method (str, optional): Método de hash perceptual a calcular para cada imagen.
+
+        Yields:
+            tuple: Ruta de la imagen, array preprocesado (None si falló), hash perceptual y el error, si lo hubo.
+        """
+        max_in_flight = self.batch_size * 2 + self.prefetch_workers
+
+        with ThreadPoolExecutor(self.prefetch_workers, thread_name_prefix="nsfw-prefetch") as executor:
+            pending = deque()
+
+            for image_path in image_paths:
+                pending.append((image_path, executor.submit(self.preprocess_image, image_path, hash_method)))
+
+                if len(pending) >= max_in_flight:
+                    yield self._get_preprocessed(*pending.popleft())
+
+            while pending:
+                yield self._get_preprocessed(*pending.popleft())
+
+    def _get_preprocessed(self, image_path, future):
+        try:
+            return (image_path, *future.result(), None)
+        except Exception as e:
+            logging.error(f"Error analyzing whether it is a NSFW image: {image_path}. Details: {e}")
+            return image_path, None, None, str(e)
+
+    def classify_batch(self, pixel_values):
+        """
+        Ejecuta el modelo sobre un lote de imágenes preprocesadas.
+
+        Args:
+            pixel_values (list of numpy.ndarray): Arrays devueltos por preprocess_image.
+
+        Returns:
+            numpy.ndarray: Probabilidad de la clase NSFW de cada imagen.
+        """
+        logits = self.backend.predict_logits(np.stack(pixel_values)).astype(np.float64)
+        probabilities = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return probabilities[:, self.nsfw_index] / probabilities.sum(axis=1)
+
+    def classify_images(self, image_paths, cache=None):
+        """
+        Clasifica las imágenes por lotes. Los resultados se devuelven a medida que se procesa cada lote,
+        en el mismo orden que image_paths.
+
+        Args:
+            image_paths (iterable of str): Rutas de las imágenes.
+            cache (PerceptualHashCache, optional): Caché de resultados de imágenes casi duplicadas.
+
+        Yields:
+            dict: Ruta ('path'), indicador NSFW ('is_nsfw'), probabilidad NSFW ('nsfw_score'), error ('error')
+            y si el resultado vino de la caché ('cached').
+        """
+        batch = []
+        hash_method = cache.hash_method if cache else None
+
+        for preprocessed in self.iter_preprocessed_images(image_paths, hash_method):
+            batch.append(preprocessed)
+
+            if len(batch) >= self.batch_size:
+                yield from self._classify_pending(batch, cache)
+                batch = []
+
+        if batch:
+            yield from self._classify_pending(batch, cache)
+
+    def _classify_pending(self, batch, cache):
+        # Cada imagen válida se resuelve desde la caché, desde una imagen casi idéntica del mismo lote o,
+        # si no hay ninguna, con el modelo. sources guarda el puntaje en caché o la posición de la inferencia.
+        valid_images, inferred_hashes, sources = [], [], []
+
+        for _, pixel_values, image_hash, _ in batch:
+            source = None
+            if pixel_values is not None:
+                cached_score = cache.lookup(image_hash) if cache else None
+                if cached_score is not None:
+                    source = ("cache", cached_score)
+                else:
+                    if cache and inferred_hashes:
+                        distances = hamming_distances(np.array(inferred_hashes, dtype=np.int64), image_hash)
+                        closest = int(np.argmin(distances))
+                        if distances[closest] <= cache.radius:
+                            source = ("batch", closest)
+
+                    if source is None:
+                        source = ("model", len(valid_images))
+                        valid_images.append(pixel_values)
+                        inferred_hashes.append(image_hash)
+
+                if cache:
+                    cache.hits += source[0] != "model"
+                    cache.misses += source[0] == "model"
+            sources.append(source)
+
+        nsfw_scores = self.classify_batch(valid_images) if valid_images else []
+
+        for (image_path, _, image_hash, error), source in zip(batch, sources):
+            nsfw_score = None
+            if source is not None:
+                nsfw_score = source[1] if source[0] == "cache" else float(nsfw_scores[source[1]])
+                if cache and source[0] == "model":
+                    cache.add(image_hash, nsfw_score)
+
+            is_nsfw = nsfw_score is not None and nsfw_score > self.threshold
+
+            if is_nsfw:
+                logging.info(f"The image {image_path} is NSFW")
+
+            yield {"path": image_path, "is_nsfw": is_nsfw, "nsfw_score": nsfw_score, "error": error, "cached": source is not None and source[0] != "model"}
+
+        if cache:
+            cache.commit()
+
+    def scan_folder(self, folder_path, cache=None):
+        """
+        Clasifica todas las imágenes de una carpeta y sus subcarpetas.
+
+        Args:
+            folder_path (str): Ruta a la carpeta.
+            cache (PerceptualHashCache, optional): Caché de resultados de imágenes casi duplicadas.
+
+        Yields:
+            dict: Resultado de cada imagen (ver classify_images).
+        """
+        yield from self.classify_images(iter_image_paths(folder_path), cache)
+
+
+def iter_image_paths(folder_path):
+    """
+    Recorre una carpeta y sus subcarpetas devolviendo las rutas de las imágenes.
+
+    Args:
+        folder_path (str): Ruta a la carpeta.
+
+    Yields:
+        str: Ruta de cada imagen.
+    """
+    for root_dir, dirs, files in os.walk(folder_path):
+        dirs.sort()
+        for file_name in sorted(files):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                yield os.path.join(root_dir, file_name)
+
+
+def get_nsfw_classifier(model_name=NSFW_MODEL_NAME, backend="transformers", quantized=False):
+    """
+    Devuelve el clasificador del modelo indicado, cargándolo sólo la primera vez en el proceso.
+
+    Args:
+        model_name (str): Nombre o ruta del modelo de clasificación, o carpeta de export_onnx_model si backend es 'onnx'.
+        backend (str): 'transformers' o 'onnx'.
+        quantized (bool): Con backend 'onnx', si se usa el modelo cuantizado a int8.
+
+    Returns:
+        NsfwClassifier: Clasificador cacheado.
+    """
+    key = (model_name, backend, quantized)
+    if key not in _nsfw_classifiers_cache:
+        _nsfw_classifiers_cache[key] = NsfwClassifier(model_name, backend=backend, quantized=quantized)
+    return _nsfw_classifiers_cache[key]
+
+
+def is_nsfw_image(image_path, cache=None, model_name=NSFW_MODEL_NAME, backend="transformers", quantized=False):
     """
     Determina si una imagen es NSFW (Not Safe For Work).
-    
+
     Args:
         image_path (str): La ruta al archivo de imagen.
-    
+        cache (PerceptualHashCache, optional): Caché de resultados de imágenes casi duplicadas.
+        model_name (str): Nombre o ruta del modelo de clasificación, o carpeta de export_onnx_model si backend es 'onnx'.
+        backend (str): 'transformers' o 'onnx'.
+        quantized (bool): Con backend 'onnx', si se usa el modelo cuantizado a int8.
+
     Returns:
         bool: True si la imagen es NSFW, False en caso contrario.
     """
     try:
-        img = Image.open(image_path)
+        classifier = get_nsfw_classifier(model_name, backend, quantized)
+        return next(classifier.classify_images([image_path], cache))["is_nsfw"]
 
-        classifier = pipeline("image-classification", model="Falconsai/nsfw_image_detection")
-        results = classifier(img)
-        
-        for result in results:
-            if result["label"].lower() == "nsfw" and result["score"] > NSFW_THRESHOLD:
-                logging.info(f"The image {image_path} is NSFW")
-                return True
-        
     except Exception as e:
         logging.error(f"Error analyzing whether it is a NSFW image: {image_path}. Details: {e}")
-    
+
     return False
+
+
+if __name__ == "__main__":
+    # Ejecución:
+    # python3 is_nsfw_image.py --folder /ruta/a/imagenes --output nsfw_results.jsonl --batch-size 32 --prefetch-workers 4
+    # python3 is_nsfw_image.py --folder /ruta/a/imagenes --output nsfw_results.jsonl --cache nsfw_cache.sqlite --cache-radius 4
+    # python3 is_nsfw_image.py --export-onnx nsfw_onnx
+    # python3 is_nsfw_image.py --folder /ruta/a/imagenes --output nsfw_results.jsonl --backend onnx --model nsfw_onnx --quantized --threads 4 --inter-op-threads 1
+    parser = ArgumentParser(description="Clasifica como NSFW o no las imágenes de una carpeta.")
+    parser.add_argument("--folder", type=str, default=None, help="Carpeta con las imágenes a analizar")
+    parser.add_argument("--output", type=str, default=None, help="Archivo JSONL donde se guardan los resultados")
+    parser.add_argument("--model", type=str, default=NSFW_MODEL_NAME, help="Nombre o ruta del modelo (con --backend onnx, carpeta exportada)")
+    parser.add_argument("--backend", choices=BACKENDS, default="transformers", help="Motor de inferencia")
+    parser.add_argument("--quantized", action="store_true", help="Con --backend onnx, usa el modelo cuantizado a int8")
+    parser.add_argument("--export-onnx", type=str, default=None, help="Exporta el modelo a ONNX (fp32 e int8) en esta carpeta y termina")
+    parser.add_argument("--batch-size", type=int, default=16, help="Cantidad de imágenes por inferencia")
+    parser.add_argument("--prefetch-workers", type=int, default=4, help="Hilos que decodifican las imágenes")
+    parser.add_argument("--threads", type=int, default=None, help="Hilos dentro de cada operación (intra-op) para la inferencia")
+    parser.add_argument("--inter-op-threads", type=int, default=None, help="Hilos entre operaciones independientes (inter-op)")
+    parser.add_argument("--cache", type=str, default=None, help="Archivo SQLite de la caché de hashes perceptuales")
+    parser.add_argument("--cache-radius", type=int, default=4, help="Distancia de Hamming máxima para reutilizar un resultado")
+    parser.add_argument("--cache-max-entries", type=int, default=200000, help="Cantidad máxima de hashes en la caché")
+    parser.add_argument("--hash-method", choices=HASH_METHODS, default="dhash", help="Hash perceptual de la caché")
+    args = parser.parse_args()
+
+    if args.export_onnx:
+        setup_logging("program_logs", "nsfw-export_onnx")
+        export_onnx_model(args.export_onnx, args.model)
+        raise SystemExit(0)
+
+    if not args.folder or not args.output:
+        parser.error("--folder y --output son obligatorios")
+
+    setup_logging("program_logs", f"{os.path.basename(os.path.normpath(args.folder))}-nsfw")
+
+    classifier = NsfwClassifier(args.model, args.batch_size, args.prefetch_workers, threads=args.threads, backend=args.backend,
+                                inter_op_threads=args.inter_op_threads, quantized=args.quantized)
+    cache = PerceptualHashCache(args.cache, classifier.model_id, args.hash_method, args.cache_radius, args.cache_max_entries) if args.cache else None
+
+    total_images, nsfw_images, failed_images = 0, 0, 0
+    with BackgroundJsonlWriter(args.output) as writer:
+        for result in classifier.scan_folder(args.folder, cache):
+            writer.write(result)
+            total_images += 1
+            nsfw_images += result["is_nsfw"]
+            failed_images += result["error"] is not None
+
+    logging.info(f"Imágenes analizadas: {total_images} | NSFW: {nsfw_images} | Con error: {failed_images}")
+
+    if cache:
+        logging.info(f"NSFW cache: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate:.1%} hit rate)")
+        cache.close()
@@ -1,12 +1,15 @@
 import os
+import json
+import queue
 import logging
-from typing import Any, Dict, Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
 
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.webdriver import WebDriver
-from webdriver_manager.chrome import ChromeDriverManager
+# Selenium y webdriver_manager se importan en get_driver, para que los scripts que sólo usan el logging
+# o BackgroundJsonlWriter no dependan de ellos
+if TYPE_CHECKING:
+    from selenium.webdriver.chrome.webdriver import WebDriver
 
 
 def setup_logging(log_path: str, execution_id: str) -> None:
@@ -40,7 +43,132 @@ def setup_logging(log_path: str, execution_id: str) -> None:
     logger.addHandler(console_handler)
     
 
-def get_driver(options_configurations: Dict[str, Any], mode: str = "headless") -> Optional[WebDriver]:
+class BackgroundJsonlWriter:
+    """
+    Escribe registros en un archivo JSONL desde un hilo en segundo plano, agrupándolos en lotes.
+    Cada lote se escribe completo y se sincroniza a disco (fsync) antes de continuar, por lo que ante
+    una caída sólo se pierde el último lote y, a lo sumo, queda una última línea incompleta que
+    read_jsonl_records ignora.
+
+    Attributes:
+        flushed_count (int): Cantidad de registros ya sincronizados a disco.
+    """
+
+    _STOP = object()
+
+    def __init__(self, output_path: str, batch_size: int = 500, flush_interval: float = 2.0) -> None:
+        """
+        Args:
+            output_path (str): Ruta al archivo JSONL. Si existe, los registros se agregan al final.
+            batch_size (int): Cantidad máxima de registros por lote.
+            flush_interval (float): Segundos máximos que un registro espera antes de escribirse.
+        """
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flushed_count = 0
+
+        self._file = open(output_path, "a", encoding="utf-8")
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=batch_size * 4)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="jsonl-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """
+        Encola un registro para escribirlo en el próximo lote.
+
+        Args:
+            record (dict): Registro serializable a JSON.
+
+        Raises:
+            Exception: El error del hilo de escritura, si falló, o RuntimeError si el hilo ya no está corriendo.
+        """
+        self._put(record)
+
+    def close(self) -> None:
+        """Escribe los registros pendientes, espera al hilo de escritura y cierra el archivo."""
+        if self._thread.is_alive() and not self._error:
+            try:
+                self._put(self._STOP)
+            except Exception:
+                # El hilo terminó mientras se esperaba lugar en la cola; su error se lanza después del join
+                pass
+        self._thread.join()
+        self._file.close()
+        if self._error:
+            raise self._error
+
+    def __enter__(self) -> "BackgroundJsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def _put(self, item: Any) -> None:
+        # Con la cola llena se reintenta con timeout, para no bloquear para siempre si el hilo de escritura murió
+        while True:
+            if self._error:
+                raise self._error
+            if not self._thread.is_alive():
+                raise RuntimeError("JSONL writer thread is not running")
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def _run(self) -> None:
+        stopped = False
+        while not stopped:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+
+            while len(batch) < self.batch_size:
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if record is self._STOP:
+                    stopped = True
+                    break
+                batch.append(record)
+
+            if not batch:
+                continue
+
+            try:
+                self._file.write("".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch))
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self.flushed_count += len(batch)
+            except Exception as error:
+                logging.exception("Error writing JSONL batch")
+                self._error = error
+                return
+
+
+def read_jsonl_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Lee los registros de un archivo JSONL, ignorando las líneas incompletas que pueda haber dejado una caída.
+
+    Args:
+        path (str): Ruta al archivo JSONL.
+
+    Yields:
+        dict: Cada registro del archivo.
+    """
+    with open(path, "r", encoding="utf-8") as file:
+        for line_number, line in enumerate(file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping incomplete JSONL line {line_number} in {path}")
+
+
+def get_driver(options_configurations: Dict[str, Any], mode: str = "headless") -> Optional["WebDriver"]:
     """
     Inicializa y retorna un driver de Chrome con configuraciones específicas.
 
@@ -51,6 +179,11 @@ def get_driver(options_configurations: Dict[str, Any], mode: str = "headless") -
     Returns:
         webdriver: Una instancia del driver de Chrome con las opciones dadas.
     """
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
+
     try:
         options = Options()
         options.add_argument("--window-size=1920,1080")